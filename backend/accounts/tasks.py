@@ -0,0 +1,11 @@
+from importlib import import_module
+
+from django.conf import settings
+
+from jobs.queue import job
+
+
+@job(cron='15 3 * * *')
+def purge_expired_sessions():
+    """Delete expired sessions"""
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
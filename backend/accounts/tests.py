@@ -1,3 +1,67 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import OperationalError, connection
+
+from backend.testing import ClinicTestCase, PASSWORD
+
+
+class AccountEndpointQueryBudgetTests(ClinicTestCase):
+    """Every accounts route stays within its query budget on the seeded clinic"""
+
+    def signup_data(self, email, **extra):
+        return dict(name='New Person', email=email, password=PASSWORD, confirm_password=PASSWORD, **extra)
+
+    def test_api_root(self):
+        self.assertQueryBudget(2, 'GET', '/api/', user=self.admin)
+
+    def test_roles(self):
+        self.assertQueryBudget(2, 'GET', '/api/roles/')
+        role = self.clinic['roles']['Doctor']
+        self.assertQueryBudget(1, 'GET', f'/api/roles/{role.role_id}/')
+
+    def test_users(self):
+        self.assertQueryBudget(22, 'GET', '/api/users/')
+        self.assertQueryBudget(2, 'GET', f'/api/users/{self.doctor.user.user_id}/')
+
+    def test_patient_signup(self):
+        self.assertQueryBudget(13, 'POST', '/api/auth/signup/', self.signup_data('new.patient@clinic.test'), status_code=201)
+
+    def test_doctor_signup(self):
+        self.assertQueryBudget(
+            6, 'POST', '/api/auth/signup/doctor/',
+            self.signup_data('new.doctor@clinic.test', medical_license_number='LIC-NEW'), status_code=201,
+        )
+
+    def test_nurse_signup(self):
+        self.assertQueryBudget(5, 'POST', '/api/auth/signup/nurse/', self.signup_data('new.nurse@clinic.test'), status_code=201)
+
+    def test_login(self):
+        self.assertQueryBudget(6, 'POST', '/api/auth/login/', {'email': self.doctor.user.email, 'password': PASSWORD})
+        self.assertQueryBudget(6, 'POST', '/api/auth/login/', {'email': self.patient.email, 'password': PASSWORD})
+
+    def test_health(self):
+        response = self.assertQueryBudget(1, 'GET', '/api/health/')
+        self.assertTrue(response.data['database_connected'])
+
+
+class HealthCheckTests(ClinicTestCase):
+    """The health check queries the database and shows its details to staff only"""
+
+    def test_public_response_is_only_a_status(self):
+        response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'status', 'message', 'database_connected'})
+
+        response = self.client.get('/api/health/', HTTP_AUTHORIZATION=f'Token {self.token_for(self.patient.user)}')
+        self.assertNotIn('database', response.json())
+
+    def test_staff_get_database_and_cache_details(self):
+        response = self.client.get('/api/health/', HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}')
+        self.assertEqual(response.json()['database']['vendor'], connection.vendor)
+        self.assertIn('cache', response.json())
+
+    def test_failing_query_is_unhealthy(self):
+        with mock.patch.object(connection, 'cursor', side_effect=OperationalError('server closed the connection')):
+            response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'unhealthy')
@@ -2,7 +2,8 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.db import transaction
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
 from .models import Role, User, AuthToken
 from .serializers import RoleSerializer, UserSerializer, PatientSignupSerializer, DoctorSignupSerializer, NurseSignupSerializer, LoginSerializer
 
@@ -216,14 +217,43 @@ def login(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Roles shown the database and cache details of the health check
+HEALTH_DETAIL_ROLES = ('Admin', 'Doctor', 'Nurse', 'Dental Assistant')
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def api_health(request):
     """
-    Simple health check endpoint
+    Health check: runs SELECT 1 on the database. Authenticated staff also
+    get the connection reuse settings, the connection pool statistics (when
+    pooling is enabled) and the cache's hit/miss counters.
     """
-    return Response({
-        'status': 'healthy',
+    try:
+        # ensure_connection() alone can accept a dead persistent or pooled connection
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        connected = True
+    except DatabaseError:
+        connected = False
+
+    payload = {
+        'status': 'healthy' if connected else 'unhealthy',
         'message': 'DentAlign Backend API is running',
-        'database_connected': True
-    })
+        'database_connected': connected,
+    }
+    role = getattr(request.user, 'role', None)
+    if request.user.is_authenticated and role is not None and role.name in HEALTH_DETAIL_ROLES:
+        database = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'conn_health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+        }
+        # Only the PostgreSQL backend has a pool, and only with OPTIONS['pool']
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            database['pool'] = pool.get_stats()
+        payload['database'] = database
+        payload['cache'] = cache.stats() if hasattr(cache, 'stats') else None
+
+    return Response(payload, status=status.HTTP_200_OK if connected else status.HTTP_503_SERVICE_UNAVAILABLE)
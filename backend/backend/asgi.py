@@ -3,6 +3,11 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live appointment board (/api/staff/appointments/events/) streams
+server-sent events and is only served through this entry point, e.g.
+``uvicorn backend.asgi:application``. Events are published in-process, so
+run the whole API here rather than beside separate WSGI workers.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
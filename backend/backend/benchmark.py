@@ -0,0 +1,459 @@
+"""
+HTTP load benchmark for the API.
+
+Virtual users (threads) replay a weighted mix of portal, staff and admin
+scenarios against the real URLconf, either in-process through the Django
+test client or over HTTP to a local WSGI server (or any base URL). Every
+request is timed and its query count is read from the Server-Timing
+header added by QueryInstrumentationMiddleware.
+
+run() returns a JSON-serializable report with throughput and
+p50/p95/p99 latency overall and per endpoint, so runs can be saved and
+compared across commits. See `python manage.py benchmark --help`.
+"""
+import http.client
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+
+from accounts.models import AuthToken, User
+from staff.models import Service, Staff
+
+# Users of each role given tokens up front
+MAX_USERS = 200
+
+_QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+class Transport:
+    """Sends one request; returns (status, headers, body)"""
+
+    def request(self, method, path, data=None, token=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ClientTransport(Transport):
+    """In-process requests through django.test.Client, one client per thread"""
+
+    name = 'client'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @staticmethod
+    def host():
+        """A host name ALLOWED_HOSTS accepts; with DEBUG an empty list allows localhost"""
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+        if 'testserver' in hosts:
+            return 'testserver'
+        return hosts[0] if hosts else 'localhost'
+
+    def request(self, method, path, data=None, token=None):
+        from django.test import Client
+
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(raise_request_exception=False, SERVER_NAME=self.host())
+        extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        if method == 'GET':
+            response = client.get(path, **extra)
+        else:
+            body = json.dumps(data) if data is not None else ''
+            response = client.generic(method, path, body, content_type='application/json', **extra)
+        return response.status_code, dict(response.headers), response.content
+
+
+class HTTPTransport(Transport):
+    """Requests over HTTP to `base_url`, one keep-alive connection per thread"""
+
+    name = 'http'
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+
+        for attempt in (1, 2):
+            http_connection = getattr(self.local, 'connection', None)
+            if http_connection is None:
+                http_connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                http_connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = http_connection.getresponse()
+                content = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection
+                http_connection.close()
+                self.local.connection = None
+                if attempt == 2:
+                    raise
+                continue
+            if response.getheader('Connection', '').lower() == 'close':
+                http_connection.close()
+                self.local.connection = None
+            return response.status, dict(response.getheaders()), content
+
+    def close(self):
+        http_connection = getattr(self.local, 'connection', None)
+        if http_connection is not None:
+            http_connection.close()
+
+
+class LocalServer:
+    """The project's WSGI application on a threaded server at 127.0.0.1"""
+
+    def __init__(self, port=0):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadedWSGIServer(('127.0.0.1', port), QuietHandler, allow_reuse_address=False)
+        self.server.set_app(get_internal_wsgi_application())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Fixtures:
+    """Users, tokens and ids the scenarios draw from, loaded once before the run"""
+
+    def __init__(self, password):
+        self.password = password
+        self.patients = self._users('Patient')
+        self.doctors = self._users('Doctor')
+        self.admins = self._users('Admin')
+        self.doctor_ids = [
+            str(staff_id) for staff_id in Staff.objects.filter(
+                role_title='Doctor', is_active=True
+            ).values_list('staff_id', flat=True)[:MAX_USERS]
+        ]
+        self.service_ids = [
+            str(service_id) for service_id in Service.objects.filter(is_active=True).values_list('service_id', flat=True)
+        ]
+        self.last_names = sorted({
+            user['full_name'].split()[-1] for user in self.patients if user['full_name'].split()
+        })
+
+    def _users(self, role):
+        users = list(
+            User.objects.filter(role__name=role, is_verified=True).order_by('created_at', 'user_id').values(
+                'user_id', 'email', 'full_name'
+            )[:MAX_USERS]
+        )
+        for user in users:
+            user['token'] = AuthToken.objects.get_or_create(user_id=user['user_id'])[0].key
+        return users
+
+
+class Session:
+    """One virtual user: issues requests and records a sample for each"""
+
+    def __init__(self, transport, fixtures, rng, samples, writes):
+        self.transport = transport
+        self.fixtures = fixtures
+        self.rng = rng
+        self.samples = samples
+        self.writes = writes
+        self.token = None
+
+    def as_user(self, users):
+        user = self.rng.choice(users)
+        self.token = user['token']
+        return user
+
+    def get(self, name, path, **params):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        return self.send(name, 'GET', path)
+
+    def post(self, name, path, data):
+        return self.send(name, 'POST', path, data)
+
+    def send(self, name, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status, headers, content = self.transport.request(method, path, data, self.token)
+        except Exception:
+            status, headers, content = 0, {}, b''
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        match = _QUERY_COUNT.search(headers.get('Server-Timing', ''))
+        self.samples.append((name, status, elapsed_ms, int(match.group(1)) if match else None))
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+
+def _future_weekday(rng, days=14):
+    day = timezone.localdate() + timedelta(days=rng.randint(1, days))
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+# Scenarios: each is one visit by a user of its role
+
+def portal_login(session):
+    user = session.rng.choice(session.fixtures.patients)
+    session.token = None
+    session.post('login', '/api/auth/login/', {'email': user['email'], 'password': session.fixtures.password})
+
+
+def portal_dashboard(session):
+    session.as_user(session.fixtures.patients)
+    session.get('patient dashboard', '/api/patients/dashboard/stats/')
+    session.get('patient appointments', '/api/patients/appointments/')
+
+
+def portal_booking(session):
+    fixtures = session.fixtures
+    session.as_user(fixtures.patients)
+    if not fixtures.doctor_ids:
+        return
+    session.get('doctors', '/api/patients/doctors/')
+    doctor_id = session.rng.choice(fixtures.doctor_ids)
+    day = _future_weekday(session.rng)
+    status, body = session.get('slot search', '/api/patients/slots/', doctor_id=doctor_id, date=day.isoformat())
+    slots = (body or {}).get('slots') if status == 200 else None
+    if session.writes and slots and fixtures.service_ids:
+        session.post('book', '/api/patients/appointments/book/', {
+            'doctor_id': doctor_id,
+            'date': day.isoformat(),
+            'time': session.rng.choice(slots),
+            'service_ids': [session.rng.choice(fixtures.service_ids)],
+        })
+
+
+def portal_billing(session):
+    session.as_user(session.fixtures.patients)
+    session.get('patient invoices', '/api/patients/invoices/')
+
+
+def staff_dashboard(session):
+    session.as_user(session.fixtures.doctors)
+    session.get('staff dashboard', '/api/staff/dashboard/stats/')
+    session.get('staff appointments', '/api/staff/appointments/')
+
+
+def staff_calendar(session):
+    session.as_user(session.fixtures.doctors)
+    start = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+    session.get(
+        'staff calendar', '/api/staff/appointments/calendar/',
+        start=start.isoformat(), end=(start + timedelta(days=6)).isoformat(),
+    )
+
+
+def staff_search(session):
+    fixtures = session.fixtures
+    session.as_user(fixtures.doctors)
+    if fixtures.last_names:
+        session.get('patient search', '/api/staff/patients/search/', q=session.rng.choice(fixtures.last_names)[:4])
+
+
+def admin_dashboard(session):
+    session.as_user(session.fixtures.admins)
+    session.get('admin dashboard', '/api/admin/dashboard/stats/')
+
+
+def admin_billing(session):
+    session.as_user(session.fixtures.admins)
+    session.get('admin billing', '/api/admin/billing/')
+
+
+def admin_schedules(session):
+    session.as_user(session.fixtures.admins)
+    session.get('admin schedules', '/api/admin/schedules/')
+
+
+def admin_reports(session):
+    session.as_user(session.fixtures.admins)
+    session.get('admin reports', '/api/admin/reports/')
+
+
+# Role -> [(weight, scenario)]
+SCENARIOS = {
+    'portal': [(1, portal_login), (3, portal_dashboard), (3, portal_booking), (2, portal_billing)],
+    'staff': [(3, staff_dashboard), (2, staff_calendar), (2, staff_search)],
+    'admin': [(2, admin_dashboard), (2, admin_billing), (1, admin_schedules), (1, admin_reports)],
+}
+
+# Fixture users each role needs
+ROLE_USERS = {'portal': 'patients', 'staff': 'doctors', 'admin': 'admins'}
+
+
+def parse_mix(value):
+    """'portal=6,staff=3,admin=1' -> {'portal': 6, 'staff': 3, 'admin': 1}"""
+    mix = {}
+    for part in value.split(','):
+        role, _, weight = part.partition('=')
+        role = role.strip()
+        if role not in SCENARIOS:
+            raise ValueError(f'Unknown role "{role}"; choose from {", ".join(SCENARIOS)}')
+        try:
+            mix[role] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f'Invalid weight for "{role}": {weight}')
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one role with a positive weight')
+    return mix
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a sorted list"""
+    if not values:
+        return None
+    position = (len(values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample[2] for sample in samples)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    statuses = defaultdict(int)
+    for sample in samples:
+        statuses[str(sample[1])] += 1
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not 200 <= sample[1] < 400),
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            **{
+                f'p{pct}': round(percentile(latencies, pct), 2) if latencies else None
+                for pct in (50, 95, 99)
+            },
+            'max': round(latencies[-1], 2) if latencies else None,
+        },
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(transport, mix, concurrency=4, duration=30.0, warmup=5.0, seed=1, password='', writes=True):
+    """
+    Drive `concurrency` virtual users for `warmup` + `duration` seconds and
+    return the report. Samples taken during warm-up are discarded.
+    """
+    fixtures = Fixtures(password)
+    roles, weights = [], []
+    for role, weight in mix.items():
+        if weight > 0 and getattr(fixtures, ROLE_USERS[role]):
+            roles.append(role)
+            weights.append(weight)
+    skipped = sorted(role for role, weight in mix.items() if weight > 0 and role not in roles)
+    if not roles:
+        raise ValueError('No users for any role in the mix; seed the database first (manage.py seed_clinic)')
+
+    measured_from = time.perf_counter() + warmup
+    stop_at = measured_from + duration
+    samples = []
+    lock = threading.Lock()
+
+    def virtual_user(index):
+        rng = random.Random(f'{seed}:{index}')
+        local_samples = []
+        session = Session(transport, fixtures, rng, local_samples, writes)
+        try:
+            while time.perf_counter() < stop_at:
+                role = rng.choices(roles, weights)[0]
+                scenarios, scenario_weights = zip(*[(scenario, weight) for weight, scenario in SCENARIOS[role]])
+                started = time.perf_counter()
+                del local_samples[:]
+                rng.choices(scenarios, scenario_weights)[0](session)
+                if started >= measured_from:
+                    with lock:
+                        samples.extend(local_samples)
+        finally:
+            transport.close()
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    if concurrency == 1:
+        virtual_user(0)
+    else:
+        threads = [threading.Thread(target=virtual_user, args=(index,)) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - measured_from
+
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'started_at': timezone.now().isoformat(),
+            'transport': transport.name,
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 2),
+            'warmup_s': warmup,
+            'mix': mix,
+            'skipped_roles': skipped,
+            'seed': seed,
+            'writes': writes,
+        },
+        'summary': summarize(samples, elapsed),
+        'endpoints': {
+            name: summarize(endpoint_samples, elapsed)
+            for name, endpoint_samples in sorted(by_endpoint.items())
+        },
+    }
@@ -0,0 +1,121 @@
+"""
+Cache backends with least-recently-used eviction and hit/miss counters.
+
+LRULocMemCache and LRUFileBasedCache are drop-in replacements for Django's
+local-memory and file backends (select one with CACHE_BACKEND in
+settings.py). When MAX_ENTRIES is reached they evict the least recently
+read entries one at a time instead of a fraction of the cache (locmem)
+or a random sample (file). stats() reports hits, misses, evictions and
+the entry count; the counters are per process.
+"""
+import os
+import threading
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+
+# Counters shared by every thread's instance of a cache, keyed by location
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class CacheStatsMixin:
+    """
+    Count hits and misses of get() (and get_many(), which calls it).
+    Backends using it define entry_count() for stats().
+    """
+
+    stats_key = None
+
+    def _counters(self):
+        with _stats_lock:
+            return _stats.setdefault(self.stats_key, {'hits': 0, 'misses': 0, 'evictions': 0})
+
+    def _count(self, name, amount=1):
+        counters = self._counters()
+        with _stats_lock:
+            counters[name] += amount
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('hits')
+        self._touched(key, version)
+        return value
+
+    def _touched(self, key, version):
+        """Record a read of `key` for the eviction order"""
+
+    def stats(self):
+        counters = dict(self._counters())
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else None
+        counters['entries'] = self.entry_count()
+        counters['max_entries'] = self._max_entries
+        return counters
+
+    def reset_stats(self):
+        counters = self._counters()
+        with _stats_lock:
+            for name in counters:
+                counters[name] = 0
+
+
+class LRULocMemCache(CacheStatsMixin, LocMemCache):
+    """Local-memory cache (per process) evicting the least recently used entry"""
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.stats_key = f'locmem:{name}'
+
+    def _cull(self):
+        # Called with the lock held when the cache is full; LocMemCache moves
+        # every written or read key to the front, so the oldest is last
+        evicted = 0
+        while self._cache and len(self._cache) >= self._max_entries:
+            key, _ = self._cache.popitem()
+            self._expire_info.pop(key, None)
+            evicted += 1
+        self._count('evictions', evicted)
+
+    def entry_count(self):
+        with self._lock:
+            return len(self._cache)
+
+
+class LRUFileBasedCache(CacheStatsMixin, FileBasedCache):
+    """File cache shared by the processes of a host, evicting the least recently read files"""
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self.stats_key = f'file:{self._dir}'
+
+    def _touched(self, key, version):
+        # A hit refreshes the file's modification time, the recency used by _cull
+        try:
+            os.utime(self._key_to_file(key, version))
+        except OSError:
+            pass
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        excess = len(filelist) - self._max_entries + 1
+        if excess <= 0:
+            return
+
+        def last_used(fname):
+            try:
+                return os.path.getmtime(fname)
+            except OSError:
+                return 0
+
+        for fname in sorted(filelist, key=last_used)[:excess]:
+            self._delete(fname)
+        self._count('evictions', excess)
+
+    def entry_count(self):
+        return len(self._list_cache_files())
@@ -0,0 +1,112 @@
+"""
+Concurrent fan-out of independent database work.
+
+run_concurrently() calls a dict of functions on a shared thread pool. Django
+connections are per thread, so each worker queries over its own connection
+and independent aggregates overlap: a dashboard takes about as long as its
+slowest query instead of the sum of all of them.
+
+DB_FANOUT_CONCURRENCY caps the worker threads (and so the extra database
+connections) per process; 1 disables the fan-out. A call never waits for a
+worker: the caller runs its first task itself, and any task that finds
+every worker busy with other requests' fan-outs, so under load a request
+degrades to the serial path instead of queueing behind other requests.
+Workers close their connections after each task, so no connection outlives
+the request that opened it.
+
+Functions run in a copy of the caller's context, so replica routing
+(backend/db_routers.py) and the request's query recorder
+(backend/middleware.py) carry over.
+
+Inside a transaction the functions run serially on the caller's
+connection, since other connections cannot see its uncommitted rows.
+"""
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+
+def _concurrency():
+    return getattr(settings, 'DB_FANOUT_CONCURRENCY', 4)
+
+
+def _get_executor():
+    """The shared pool and the semaphore counting its idle workers"""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            _slots = threading.BoundedSemaphore(_concurrency())
+            _executor = ThreadPoolExecutor(max_workers=_concurrency(), thread_name_prefix='db-fanout')
+        return _executor, _slots
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def _call(func, slots):
+    """Run `func` on a worker thread, closing the connections it opened"""
+    from .middleware import current_recorder
+
+    _worker.active = True
+    try:
+        with ExitStack() as stack:
+            recorder = current_recorder()
+            if recorder is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+            return func()
+    finally:
+        connections.close_all()
+        _worker.active = False
+        slots.release()
+
+
+def _call_here(func):
+    future = Future()
+    try:
+        future.set_result(func())
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def run_concurrently(tasks):
+    """
+    Call every function of the `tasks` dict (name -> function without
+    arguments) and return a dict of their results under the same names.
+    The first exception raised is re-raised.
+    """
+    serial = (
+        _concurrency() <= 1
+        or len(tasks) <= 1
+        or getattr(_worker, 'active', False)  # no nested fan-out from a task
+        or _in_transaction()
+    )
+    if serial:
+        return {name: func() for name, func in tasks.items()}
+
+    executor, slots = _get_executor()
+    futures = {}
+    for name, func in list(tasks.items())[1:]:
+        if not slots.acquire(blocking=False):
+            break  # every worker is busy: the caller runs the rest
+        # A context can only be entered by one thread at a time: copy it per task
+        futures[name] = executor.submit(contextvars.copy_context().run, _call, func, slots)
+    _worker.active = True
+    try:
+        for name, func in tasks.items():
+            if name not in futures:
+                futures[name] = _call_here(func)
+    finally:
+        _worker.active = False
+    return {name: futures[name].result() for name in tasks}
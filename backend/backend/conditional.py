@@ -0,0 +1,126 @@
+"""
+Conditional GET (ETag / Last-Modified) for list and detail endpoints.
+
+Before running a view, ConditionalGetMixin (generic views) and
+@conditional_get(probe) (function views, above @cache_response) run one
+cheap aggregate over the rows the view reads: Count plus Max('updated_at').
+The ETag hashes that probe together with the response cache key (route,
+user, query parameters and the version stamps of the view's cache models,
+see backend/response_cache.py), so it changes when a row is added, edited
+or deleted, or when a related model the payload embeds changes. A request
+whose If-None-Match (or, without one, If-Modified-Since) still matches
+gets a 304 without the full query or serialization.
+
+Last-Modified is the latest of Max('updated_at') and the times the version
+stamps of the cache models were last bumped, so deletes and changes to
+related models move it forward too. Views whose cache_models do not include
+the probed model send no Last-Modified: a delete would not move it.
+
+The probe may cover more rows than the view returns (a filter it ignores
+only makes the ETag change more often), never fewer. Models without an
+`updated_at` field are probed with Count only.
+Detail views are probed by their lookup field, so views relying on
+object-level permissions must not use the mixin.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .response_cache import model_versions, response_cache_key, stamp_time
+
+LAST_MODIFIED_FIELD = 'updated_at'
+
+
+def collection_validators(queryset, models=(), request=None):
+    """(etag, last_modified timestamp or None) for the rows of `queryset`"""
+    model = queryset.model
+    try:
+        model._meta.get_field(LAST_MODIFIED_FIELD)
+        aggregates = {'count': Count('pk'), 'last_modified': Max(LAST_MODIFIED_FIELD)}
+    except FieldDoesNotExist:
+        aggregates = {'count': Count('pk')}
+    probe = queryset.order_by().aggregate(**aggregates)
+
+    updated_at = probe.get('last_modified')
+    versions = model_versions(models)
+    parts = [model._meta.label_lower, str(probe['count']), updated_at.isoformat() if updated_at else '']
+    if request is not None:
+        parts.append(response_cache_key(request, models, versions))
+    etag = hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+
+    last_modified = None
+    if model in models:
+        changed = [stamp_time(version) for version in versions]
+        if updated_at is not None:
+            changed.append(updated_at.timestamp())
+        last_modified = int(max(changed))
+    return etag, last_modified
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_response(request, queryset, models, build):
+    """A 304 when the client's validators still match `queryset`, otherwise build() with validators set"""
+    if request.method not in ('GET', 'HEAD') or queryset is None:
+        return build()
+
+    etag, last_modified = collection_validators(queryset, models, request)
+    not_modified = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+    if not_modified is not None:
+        return _set_validators(not_modified, etag, last_modified)
+
+    response = build()
+    if response.status_code == 200:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+def conditional_get(probe):
+    """
+    Answer a function view's GET with a 304 when its data is unchanged.
+    `probe(request)` returns a queryset covering every row the view reads.
+    """
+    def decorator(view):
+        models = getattr(view, 'cache_models', ())
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return conditional_response(request, probe(request), models, lambda: view(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    Answer a generic list or detail view's GET with a 304 when its data is
+    unchanged. `cache_models` (shared with CachedResponseMixin) lists the
+    models the payload reads; override conditional_queryset() when the
+    view queryset is too expensive to probe.
+    """
+
+    cache_models = ()
+
+    def conditional_queryset(self):
+        queryset = self.get_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            try:
+                return queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, ValidationError):
+                return None  # a malformed lookup: let get_object() answer 404
+        return self.filter_queryset(queryset)
+
+    def get(self, request, *args, **kwargs):
+        return conditional_response(
+            request, self.conditional_queryset(), self.cache_models,
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs),
+        )
@@ -0,0 +1,112 @@
+"""
+Read replica routing.
+
+Reads go to the primary unless a view opts in with @use_replica (function
+views, below @api_view) or ReplicaReadMixin (DRF generic views). Opted-in
+GET requests read from the `replica` alias, so heavy report, dashboard and
+list scans do not compete with bookings on the primary.
+
+Replicas lag. After a user changes something (any successful non-GET
+request, see ReplicaPinMiddleware) their reads stay on the primary for
+REPLICA_STICKY_SECONDS, so they see their own writes; the pins are kept in
+the 'shared' cache so every process honours them. Reads inside a
+transaction on the primary also stay there.
+
+Without a `replica` alias in DATABASES everything uses the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_DB_ALIAS = 'replica'
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def replica_available():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Keep `user`'s reads on the primary while the replica catches up"""
+    if user is not None and user.is_authenticated:
+        caches['shared'].set(_pin_key(user.pk), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and bool(caches['shared'].get(_pin_key(user.pk)))
+
+
+@contextmanager
+def read_from_replica():
+    """Route reads in this block (and this thread/task only) to the replica"""
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+def _replica_allowed(request):
+    return request.method in SAFE_METHODS and replica_available() and not is_pinned(request.user)
+
+
+def use_replica(view):
+    """Serve a function view's reads from the replica; place it below @api_view"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not _replica_allowed(request):
+            return view(request, *args, **kwargs)
+        with read_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaReadMixin:
+    """Serve a generic view's GET requests from the replica"""
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permission checks run on the primary
+        super().initial(request, *args, **kwargs)
+        if _replica_allowed(request):
+            self._replica_token = _reading_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _reading_from_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _reading_from_replica.get() or not replica_available():
+            return None
+        if model._meta.app_label == 'django_cache':
+            # A lagging copy of the database cache would serve old version stamps
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Within a transaction the primary is the consistent view (tests
+            # run each case inside one, so they always read the primary)
+            return None
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
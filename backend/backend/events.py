@@ -0,0 +1,157 @@
+"""
+In-process publish/subscribe for server-sent events.
+
+publish() may be called from any thread (model signals, usually after the
+transaction commits). Every subscription belongs to the event loop of one
+ASGI request and receives events through an asyncio queue; stream()
+formats them as a text/event-stream body with periodic keep-alive
+comments.
+
+The broker lives in the process that serves both the writes and the
+streams, so run the API under backend/asgi.py. With several worker
+processes a client only sees the events of writes handled by its own
+worker.
+
+Event ids are "<process>:<sequence>". A reconnecting EventSource sends the
+last id it saw (Last-Event-ID) and gets the events it missed from a backlog
+of EVENTS_BACKLOG events. When they are no longer available (another
+process, or too many missed) it gets a `resync` event and should refetch.
+A subscriber too slow to drain EVENTS_QUEUE_SIZE queued events is handled
+the same way.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MILLISECONDS = 3000
+
+
+class Event:
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self):
+        payload = json.dumps(self.data, cls=DjangoJSONEncoder)
+        return f'id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n'
+
+
+def _resync_event():
+    return Event('', 'resync', {})
+
+
+class Subscription:
+    """Events for one client, queued on its request's event loop"""
+
+    def __init__(self, broker, queue_size):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, event):
+        """Queue `event` from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The client's loop is gone; the request is being torn down
+            self.close()
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: drop what is queued and let the client refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_resync_event())
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, backlog=None, queue_size=None):
+        self.backlog_size = backlog or getattr(settings, 'EVENTS_BACKLOG', 500)
+        self.queue_size = queue_size or getattr(settings, 'EVENTS_QUEUE_SIZE', 100)
+        self.process = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._backlog = deque(maxlen=self.backlog_size)
+        self._sequence = 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._sequence += 1
+            event = Event(f'{self.process}:{self._sequence}', event_type, data)
+            self._backlog.append((self._sequence, event))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.deliver(event)
+        return event
+
+    def _missed(self, last_event_id):
+        """Backlog events after `last_event_id`, or None when some are gone"""
+        process, _, sequence = last_event_id.partition(':')
+        if process != self.process or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if sequence >= self._sequence:
+            return []
+        if not self._backlog or self._backlog[0][0] > sequence + 1:
+            return None
+        return [event for number, event in self._backlog if number > sequence]
+
+    def subscribe(self, last_event_id=None):
+        """A Subscription on the running event loop, primed with missed events"""
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            if last_event_id:
+                missed = self._missed(last_event_id)
+                for event in missed if missed is not None else [_resync_event()]:
+                    subscription._put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+broker = Broker()
+
+
+def publish(event_type, data):
+    """Send an event to every subscriber of the process-wide broker"""
+    return broker.publish(event_type, data)
+
+
+async def stream(last_event_id=None, heartbeat=None, source=None):
+    """
+    A text/event-stream body following `source` (the process-wide broker by
+    default). The subscription starts with the first chunk and ends when
+    the client goes away.
+    """
+    heartbeat = heartbeat or getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+    subscription = (source or broker).subscribe(last_event_id)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            yield event.encode()
+    finally:
+        subscription.close()
@@ -0,0 +1,201 @@
+"""
+Per-request SQL instrumentation.
+
+QueryInstrumentationMiddleware wraps every database connection with
+connection.execute_wrapper() while a request is handled and records the
+query count, total database time, the slowest statements and statements
+repeated with the same shape (the usual sign of an N+1 loop).
+
+Each response gets a Server-Timing header and one structured log line on
+the `backend.queries` logger. Queries that backend.concurrency workers run
+for the request are recorded too. Expensive requests are also kept in a small
+in-process ring buffer (see recent_samples()) that staff can inspect.
+
+ReplicaPinMiddleware supports the read replica router.
+"""
+import heapq
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .db_routers import pin_to_primary
+
+logger = logging.getLogger('backend.queries')
+
+# Longest SQL text kept per statement in samples and logs
+MAX_SQL_LENGTH = 1000
+
+_LITERAL_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    # IN lists of any length share one shape
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(sql):
+    """The shape of a statement: literals and placeholders collapsed"""
+    for pattern, replacement in _LITERAL_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+_current_recorder = ContextVar('query_recorder', default=None)
+
+
+def current_recorder():
+    """The QueryRecorder of the request being handled, if any"""
+    return _current_recorder.get()
+
+
+class QueryRecorder:
+    """execute_wrapper callable collecting the statements of one request"""
+
+    def __init__(self, keep_slowest=5):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []  # min-heap of (duration, sequence, alias, sql)
+        self.shapes = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(context['connection'].alias, sql, time.perf_counter() - start)
+
+    def record(self, alias, sql, duration):
+        with self.lock:
+            self.count += 1
+            self.duration += duration
+            entry = (duration, self.count, alias, sql)
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+            self.shapes[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes run at least `threshold` times, most frequent first"""
+        return [
+            {'fingerprint': shape[:MAX_SQL_LENGTH], 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def slowest_statements(self):
+        return [
+            {'alias': alias, 'ms': round(duration * 1000, 2), 'sql': sql[:MAX_SQL_LENGTH]}
+            for duration, _, alias, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+_samples = None
+_samples_lock = threading.Lock()
+
+
+def _sample_buffer():
+    global _samples
+    if _samples is None:
+        _samples = deque(maxlen=_setting('QUERY_INSPECTION_BUFFER_SIZE', 100))
+    return _samples
+
+
+def recent_samples():
+    """Expensive requests recorded by this process, newest first"""
+    with _samples_lock:
+        return list(reversed(_sample_buffer()))
+
+
+def clear_samples():
+    with _samples_lock:
+        _sample_buffer().clear()
+
+
+class QueryInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _setting('QUERY_INSPECTION_ENABLED', True):
+            return self.get_response(request)
+
+        recorder = QueryRecorder(keep_slowest=_setting('QUERY_INSPECTION_SLOWEST', 5))
+        start = time.perf_counter()
+        token = _current_recorder.set(recorder)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        total_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        db_ms = round(recorder.duration * 1000, 2)
+        timing = f'db;dur={db_ms};desc="{recorder.count} queries", app;dur={total_ms}'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        repeated = recorder.repeated(_setting('QUERY_INSPECTION_REPEAT_THRESHOLD', 5))
+        summary = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': db_ms,
+            'total_ms': total_ms,
+            'repeated': len(repeated),
+        }
+        expensive = (
+            total_ms >= _setting('QUERY_INSPECTION_SLOW_REQUEST_MS', 500)
+            or recorder.count >= _setting('QUERY_INSPECTION_MAX_QUERIES', 50)
+            or repeated
+        )
+        logger.log(logging.WARNING if expensive else logging.INFO, json.dumps(summary))
+
+        if expensive:
+            sample = dict(
+                summary,
+                timestamp=time.time(),
+                slowest=recorder.slowest_statements(),
+                repeated=repeated,
+            )
+            with _samples_lock:
+                _sample_buffer().append(sample)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    After a successful write request, keep the user's reads on the primary
+    for a few seconds (read-your-writes with a lagging replica, see
+    backend/db_routers.py)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            # DRF sets the token-authenticated user on the underlying request
+            pin_to_primary(getattr(request, 'user', None))
+        return response
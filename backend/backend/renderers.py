@@ -0,0 +1,41 @@
+"""
+JSON rendering for API responses.
+
+FastJSONRenderer is the default renderer (REST_FRAMEWORK in settings.py).
+It encodes with orjson when that package is installed and falls back to
+DRF's JSONRenderer otherwise. Both encode datetime, date, UUID and Decimal
+values natively, so views can put model values straight into a payload
+instead of calling str(), float() or strftime() on every row.
+
+The two encoders differ only in datetimes that reach them unformatted:
+orjson keeps microseconds, DRF truncates them to milliseconds. Serializer
+fields format their datetimes before rendering and are not affected.
+"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+_fallback_encoder = encoders.JSONEncoder()
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(obj):
+    # Decimal, lazy translations, timedelta, querysets... as DRF encodes them
+    return _fallback_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Indented output (e.g. `Accept: application/json; indent=4`) keeps DRF's formatting
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
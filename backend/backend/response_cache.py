@@ -0,0 +1,149 @@
+"""
+Response caching keyed on model versions.
+
+@cache_response(models) (function views, below @api_view) and
+CachedResponseMixin (generic views, `cache_models = [...]`) cache
+successful GET responses under a key built from the route, the user, the
+query parameters and the current version stamp of every model the view
+reads. A change to any of those models bumps its version (see
+connect_signals(), called from staff/signals.py), so the next request
+misses and rebuilds the payload. No explicit invalidation is needed.
+
+Writes that skip model signals (bulk_create, QuerySet.update) must call
+bump_model_versions() themselves.
+
+Responses live in the default cache, which may be per process. Version
+stamps live in the 'shared' cache, which every process reads, so a write in
+one web worker (or the job worker) invalidates the responses cached by all
+of them. An evicted stamp comes back as a fresh random value, so stale
+entries are never matched again. A stamp starts with the time it was set,
+which backend/conditional.py uses for Last-Modified. Entries also expire after
+RESPONSE_CACHE_SECONDS, to bound staleness from a lagging read replica.
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+CACHE_HEADER = 'X-Cache'
+
+
+def _stamps():
+    return caches['shared']
+
+
+def _version_key(model):
+    return f'model-version:{model._meta.label_lower}'
+
+
+def _new_stamp():
+    return f'{time.time():.6f}:{uuid.uuid4().hex}'
+
+
+def stamp_time(stamp):
+    """When `stamp` was set (a Unix timestamp); now for stamps written before they carried one"""
+    try:
+        return float(stamp.split(':', 1)[0]) if ':' in stamp else time.time()
+    except ValueError:
+        return time.time()
+
+
+def model_versions(models):
+    """Current version stamp of each model, creating missing stamps"""
+    keys = [_version_key(model) for model in models]
+    stamps = _stamps()
+    versions = stamps.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            stamps.add(key, _new_stamp(), None)
+            versions[key] = stamps.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_versions(*models):
+    """Invalidate every cached response that depends on one of `models`"""
+    def bump():
+        _stamps().set_many({_version_key(model): _new_stamp() for model in models}, None)
+
+    # Now, so this transaction's own reads miss, and again at commit, so a
+    # response cached by another request before the commit is not reused
+    bump()
+    transaction.on_commit(bump)
+
+
+def _principal(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return str(user.pk)
+    return 'anonymous'
+
+
+def response_cache_key(request, models, versions=None):
+    params = sorted(
+        (name, sorted(values)) for name, values in request.query_params.lists()
+    )
+    if versions is None:
+        versions = model_versions(models)
+    parts = [request.path, _principal(request), repr(params), *versions]
+    digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+    return f'response:{digest}'
+
+
+def cached_response(request, models, timeout, build):
+    """The cached response for `request`, or build() and cache it when it is a 200"""
+    if request.method not in ('GET', 'HEAD') or not getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+        return build()
+
+    key = response_cache_key(request, models)
+    data = cache.get(key)
+    if data is not None:
+        response = Response(data)
+        response[CACHE_HEADER] = 'HIT'
+        return response
+
+    response = build()
+    if response.status_code == 200 and isinstance(response, Response):
+        cache.set(key, response.data, timeout if timeout is not None else settings.RESPONSE_CACHE_SECONDS)
+        response[CACHE_HEADER] = 'MISS'
+    return response
+
+
+def cache_response(models, timeout=None):
+    """Cache a function view's successful GET responses until one of `models` changes"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return cached_response(request, models, timeout, lambda: view(request, *args, **kwargs))
+        wrapped.cache_models = models
+        return wrapped
+    return decorator
+
+
+class CachedResponseMixin:
+    """Cache a generic view's successful GET responses until one of `cache_models` changes"""
+
+    cache_models = ()
+    cache_timeout = None
+
+    def get(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_models, self.cache_timeout,
+            lambda: super(CachedResponseMixin, self).get(request, *args, **kwargs),
+        )
+
+
+def _model_changed(sender, **kwargs):
+    bump_model_versions(sender)
+
+
+def connect_signals(models):
+    """Bump the version of each of `models` whenever one of its rows is saved or deleted"""
+    for model in models:
+        post_save.connect(_model_changed, sender=model, dispatch_uid=f'response-cache:{model._meta.label}')
+        post_delete.connect(_model_changed, sender=model, dispatch_uid=f'response-cache:{model._meta.label}')
@@ -52,10 +52,13 @@ INSTALLED_APPS = [
     'appointments',
     'medical',
     'dentalign_admin',
+    'jobs',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'backend.middleware.QueryInstrumentationMiddleware',
+    'backend.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,10 +93,37 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Connection reuse for Postgres. Either a psycopg connection pool shared by
+# the threads of a process (DB_POOL=True), or one persistent connection per
+# thread kept for DB_CONN_MAX_AGE seconds (0 closes it after each request,
+# None keeps it forever). Django does not allow both at once.
+DB_POOL = os.getenv('DB_POOL', 'False').lower() == 'true'
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+# Seconds a request waits for a free pooled connection before failing
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '3600'))
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '600'))
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
+DB_CONN_MAX_AGE = None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL)
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
     }
+    if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_lifetime': DB_POOL_MAX_LIFETIME,
+            'max_idle': DB_POOL_MAX_IDLE,
+        }
 else:
     # Fallback to SQLite if no DATABASE_URL is provided
     DATABASES = {
@@ -103,6 +133,30 @@ else:
         }
     }
 
+# Read replica for reports, dashboards and lists (backend/db_routers.py).
+# Locally a second connection to the SQLite file stands in for it. Under
+# test the replica mirrors the test database.
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+elif not DATABASE_URL:
+    DATABASES['replica'] = dict(DATABASES['default'])
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['backend.db_routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+
+# Worker threads per process (each with its own connection, closed after each
+# task) that run a dashboard's independent queries concurrently; when all are
+# busy the request runs its queries itself (backend/concurrency.py). 1 runs
+# them serially
+DB_FANOUT_CONCURRENCY = int(os.getenv('DB_FANOUT_CONCURRENCY', '4'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -166,6 +220,115 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',  # orjson when installed, DRF's encoder otherwise
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
+
+# Patient search: minimum trigram word similarity for a fuzzy (typo-tolerant) match
+PATIENT_SEARCH_SIMILARITY = float(os.getenv('PATIENT_SEARCH_SIMILARITY', '0.3'))
+
+# Caches with LRU eviction and hit/miss counters (backend/cache_backends.py):
+# 'locmem' per process, or 'file' shared by the processes of a host
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': {
+            'locmem': 'backend.cache_backends.LRULocMemCache',
+            'file': 'backend.cache_backends.LRUFileBasedCache',
+        }[CACHE_BACKEND],
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache') if CACHE_BACKEND == 'file' else 'dentalign'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000')),
+        },
+    },
+}
+
+# Response cache version stamps, replica pins and the precomputed admin reports
+# must be seen by every process that writes or serves (each web worker and
+# run_worker), so they live in the 'shared' cache, never a per-process one:
+# 'file' is shared by the processes of one host; with several hosts use
+# 'database' (run `python manage.py createcachetable` once). 'locmem' is only
+# correct for a single process (runserver, tests).
+SHARED_CACHE_BACKEND = os.getenv('SHARED_CACHE_BACKEND', 'file')
+CACHES['shared'] = {
+    'BACKEND': {
+        'locmem': 'backend.cache_backends.LRULocMemCache',
+        'file': 'backend.cache_backends.LRUFileBasedCache',
+        'database': 'django.core.cache.backends.db.DatabaseCache',
+    }[SHARED_CACHE_BACKEND],
+    'LOCATION': os.getenv('SHARED_CACHE_LOCATION', {
+        'locmem': 'dentalign-shared',
+        'file': str(BASE_DIR / '.cache-shared'),
+        'database': 'shared_cache',
+    }[SHARED_CACHE_BACKEND]),
+    'TIMEOUT': 300,
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.getenv('SHARED_CACHE_MAX_ENTRIES', '5000')),
+    },
+}
+
+# Tests swap both caches for per-process ones (backend/testing.py)
+TEST_RUNNER = 'backend.testing.ClinicTestRunner'
+
+# Cached GET responses (backend/response_cache.py) are invalidated by model
+# changes, through version stamps in the 'shared' cache; the timeout only
+# bounds staleness from a lagging read replica
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+RESPONSE_CACHE_SECONDS = int(os.getenv('RESPONSE_CACHE_SECONDS', '300'))
+
+# Seconds a doctor's dashboard_stats snapshot is reused between polls (its
+# today/this-week counts change with the clock, not only with the data)
+STAFF_DASHBOARD_CACHE_SECONDS = int(os.getenv('STAFF_DASHBOARD_CACHE_SECONDS', '5'))
+
+# Changes feed (staff/sync.py): rows per collection and call, how far each
+# cursor steps back to catch late commits, and how long deletes are kept
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+SYNC_CURSOR_LAG_SECONDS = int(os.getenv('SYNC_CURSOR_LAG_SECONDS', '5'))
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', '30'))
+
+# Live appointment board (backend/events.py, served under ASGI): keep-alive
+# interval, events kept for reconnecting clients, and events queued per client
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', '15'))
+EVENTS_BACKLOG = int(os.getenv('EVENTS_BACKLOG', '500'))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '100'))
+
+# Background jobs (jobs app, `python manage.py run_worker`): jobs run at once per
+# worker, seconds between polls, first retry delay (doubled per attempt), seconds
+# before a running job is presumed lost, and days finished jobs are kept
+JOBS_WORKER_THREADS = int(os.getenv('JOBS_WORKER_THREADS', '4'))
+JOBS_POLL_SECONDS = float(os.getenv('JOBS_POLL_SECONDS', '1'))
+JOBS_RETRY_DELAY_SECONDS = int(os.getenv('JOBS_RETRY_DELAY_SECONDS', '30'))
+JOBS_LOCK_TIMEOUT_SECONDS = int(os.getenv('JOBS_LOCK_TIMEOUT_SECONDS', '1800'))
+JOBS_KEEP_DAYS = int(os.getenv('JOBS_KEEP_DAYS', '7'))
+
+# SQL instrumentation (backend/middleware.py): Server-Timing header, a log line
+# per request, and a ring buffer of expensive requests (staff/diagnostics/queries/)
+QUERY_INSPECTION_ENABLED = os.getenv('QUERY_INSPECTION_ENABLED', 'True').lower() == 'true'
+QUERY_INSPECTION_SLOW_REQUEST_MS = float(os.getenv('QUERY_INSPECTION_SLOW_REQUEST_MS', '500'))
+QUERY_INSPECTION_MAX_QUERIES = int(os.getenv('QUERY_INSPECTION_MAX_QUERIES', '50'))
+# Same statement shape run this many times in one request is reported as an N+1
+QUERY_INSPECTION_REPEAT_THRESHOLD = int(os.getenv('QUERY_INSPECTION_REPEAT_THRESHOLD', '5'))
+QUERY_INSPECTION_SLOWEST = 5
+QUERY_INSPECTION_BUFFER_SIZE = int(os.getenv('QUERY_INSPECTION_BUFFER_SIZE', '100'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'backend.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,258 @@
+"""
+Shared fixtures for the endpoint query-budget tests.
+
+ClinicTestCase seeds a small but realistic clinic once per test class and
+provides assertQueryBudget(), which calls an endpoint, fails when it runs
+more SQL queries than its budget, and records the wall time. Budgets are
+set for this dataset, so a new per-row query (an N+1 loop) pushes an
+endpoint over its budget.
+
+Run the suites by app label (the scripts at the top of backend/ are not
+tests):
+
+    python manage.py test accounts staff patients dentalign_admin
+
+Set QUERY_BUDGET_REPORT to a file path to append one JSON line per
+request with its query count and wall time.
+
+ClinicTestRunner (TEST_RUNNER) runs every suite against per-process
+TEST_CACHES, so clearing caches in tests never touches the configured
+'shared' cache (by default a directory that a dev server or run_worker in
+the same checkout is using).
+"""
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime, time as day_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import AuthToken, Role, User
+from staff import summaries
+from staff.models import (
+    Allergy, Appointment, ChronicCondition, Diagnosis, Invoice, MedicalRecord, PastSurgery,
+    Patient, Payment, Service, Staff, Treatment,
+)
+
+PASSWORD = 'clinic-password'
+
+TEST_CACHES = {
+    alias: {'BACKEND': 'backend.cache_backends.LRULocMemCache', 'LOCATION': f'dentalign-test-{alias}'}
+    for alias in ('default', 'shared')
+}
+
+SERVICES = [
+    ('Consultation', '50.00'),
+    ('Dental Cleaning', '90.00'),
+    ('Filling', '120.00'),
+    ('Root Canal', '650.00'),
+    ('Extraction', '180.00'),
+    ('Crown', '900.00'),
+    ('Whitening', '300.00'),
+    ('X-Ray', '60.00'),
+]
+
+
+def seed_clinic(doctors=3, nurses=2, patients=20, appointments_per_patient=5):
+    """
+    Create roles, staff, services and patients with a history of
+    appointments, treatments, records, diagnoses, invoices and payments
+    around today. Returns a dict of the main objects.
+    """
+    password_hash = make_password(PASSWORD)
+    roles = {
+        name: Role.objects.create(name=name)
+        for name in ('Admin', 'Doctor', 'Nurse', 'Patient')
+    }
+
+    def make_user(name, email, role, **extra):
+        return User.objects.create(
+            full_name=name, email=email, username=email, password_hash=password_hash,
+            role=roles[role], is_verified=True, is_approved=True, **extra
+        )
+
+    admin = make_user('Ada Admin', 'admin@clinic.test', 'Admin')
+    doctor_list = []
+    for index in range(doctors):
+        user = make_user(f'Doctor {index}', f'doctor{index}@clinic.test', 'Doctor')
+        doctor_list.append(Staff.objects.create(
+            user=user, first_name='Doctor', last_name=str(index), role_title='Doctor',
+            specialization='General Dentistry', license_number=f'LIC-{index}',
+        ))
+    nurse_list = []
+    for index in range(nurses):
+        user = make_user(f'Nurse {index}', f'nurse{index}@clinic.test', 'Nurse')
+        nurse_list.append(Staff.objects.create(
+            user=user, first_name='Nurse', last_name=str(index), role_title='Nurse',
+        ))
+    pending_doctor = User.objects.create(
+        full_name='Pending Doctor', email='pending@clinic.test', username='pending@clinic.test',
+        password_hash=password_hash, role=roles['Doctor'], is_verified=False,
+        medical_license_number='LIC-PENDING',
+    )
+
+    services = [
+        Service.objects.create(name=name, price=Decimal(price), description=f'{name} service')
+        for name, price in SERVICES
+    ]
+
+    today = timezone.localdate()
+    current_tz = timezone.get_current_timezone()
+    patient_list = []
+    for index in range(patients):
+        user = make_user(f'Patient {index}', f'patient{index}@clinic.test', 'Patient')
+        patient = Patient.objects.create(
+            user=user, first_name=f'Patient{index}', last_name=f'Family{index % 7}',
+            email=f'patient{index}@clinic.test', phone=f'555-01{index:02d}',
+            dob=date(1960 + index, 1 + index % 12, 1 + index % 28), gender='F' if index % 2 else 'M',
+        )
+        patient_list.append(patient)
+
+        if index % 3 == 0:
+            ChronicCondition.objects.create(condition_id=uuid.uuid4(), patient=patient, condition_name='Diabetes')
+            Allergy.objects.create(allergy_id=uuid.uuid4(), patient=patient, allergen_name='Penicillin', severity='severe')
+            PastSurgery.objects.create(
+                surgery_id=uuid.uuid4(), patient=patient, procedure_name='Wisdom tooth removal',
+                surgery_date=today - timedelta(days=400),
+            )
+
+        for visit in range(appointments_per_patient):
+            # Mostly past visits, the last one in the coming days
+            offset = (visit - appointments_per_patient + 2) * 9 + index % 5
+            day = today + timedelta(days=offset)
+            start = timezone.make_aware(datetime.combine(day, day_time(9 + (index + visit) % 8)), current_tz)
+            doctor = doctor_list[(index + visit) % doctors]
+            past = day < today
+            appointment = Appointment.objects.create(
+                patient=patient, staff=doctor, nurse=nurse_list[visit % nurses] if nurses else None,
+                start_time=start, end_time=start + timedelta(minutes=30),
+                status='completed' if past else 'scheduled', reason='Check-up',
+            )
+            if not past:
+                continue
+
+            record = MedicalRecord.objects.create(
+                patient=patient, staff=doctor, created_by=doctor, appointment=appointment,
+                record_date=day, chief_complaint='Tooth pain', outcome='Treated',
+            )
+            appointment.medical_record = record
+            appointment.save(update_fields=['medical_record'])
+            Diagnosis.objects.create(record=record, icd10_code='K02.9', notes='Caries')
+
+            visit_services = [services[(index + visit) % len(services)], services[0]]
+            for service in visit_services:
+                Treatment.objects.create(appointment=appointment, service=service)
+            total = sum(service.price for service in visit_services)
+            paid = total if visit % 2 else Decimal('0')
+            invoice = Invoice.objects.create(
+                patient=patient, appointment=appointment, total_amount=total, paid_amount=paid,
+                status='paid' if paid else 'pending', issued_date=day, due_date=day + timedelta(days=30),
+                is_approved=True if visit % 3 else None,
+            )
+            if paid:
+                Payment.objects.create(invoice=invoice, amount=paid, method='card')
+
+    # Summary refreshes wait for a commit that never comes inside a TestCase
+    summaries.refresh_patient_summaries()
+
+    return {
+        'roles': roles,
+        'admin': admin,
+        'doctors': doctor_list,
+        'nurses': nurse_list,
+        'pending_doctor': pending_doctor,
+        'services': services,
+        'patients': patient_list,
+    }
+
+
+class ClinicTestRunner(DiscoverRunner):
+    """DiscoverRunner with TEST_CACHES in place of the configured caches"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_caches = override_settings(CACHES=TEST_CACHES)
+        self.test_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_caches.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+# Hashing at full strength would dominate the timings of login and signup
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ClinicTestCase(TestCase):
+    """TestCase with a seeded clinic and per-endpoint query budgets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clinic = seed_clinic()
+        cls.doctor = cls.clinic['doctors'][0]
+        cls.nurse = cls.clinic['nurses'][0]
+        cls.patient = cls.clinic['patients'][0]
+        cls.admin = cls.clinic['admin']
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.timings = []
+
+    @classmethod
+    def tearDownClass(cls):
+        report = os.getenv('QUERY_BUDGET_REPORT')
+        if report and cls.timings:
+            with open(report, 'a') as handle:
+                for timing in cls.timings:
+                    handle.write(json.dumps(timing) + '\n')
+        super().tearDownClass()
+
+    def setUp(self):
+        # Cached dashboards would hide their queries from later tests
+        cache.clear()
+        caches['shared'].clear()
+
+    def token_for(self, user):
+        return AuthToken.objects.get_or_create(user=user)[0].key
+
+    def assertQueryBudget(self, budget, method, path, data=None, user=None, status_code=200):
+        """
+        Request `path` as `user` (anonymous when None) and assert the status
+        and that at most `budget` queries ran. Returns the response.
+        """
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Token {self.token_for(user)}'
+        send = getattr(self.client, method.lower())
+        kwargs = {'content_type': 'application/json'} if method.upper() != 'GET' else {}
+        if data is not None:
+            kwargs['data'] = json.dumps(data) if method.upper() != 'GET' else data
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = send(path, **kwargs, **headers)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.timings.append({
+            'test': self.id(),
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'queries': len(queries),
+            'budget': budget,
+            'ms': round(elapsed_ms, 2),
+        })
+        self.assertEqual(response.status_code, status_code, response.content[:500])
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {path} ran {len(queries)} queries (budget {budget}):\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
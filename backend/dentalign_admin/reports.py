@@ -0,0 +1,196 @@
+"""
+The admin reports payload (dentalign_admin/views.py reports_data).
+
+It takes a couple of dozen aggregate queries, so the job worker rebuilds it
+every few minutes (dentalign_admin.tasks.precompute_reports) and the view
+reads the precomputed copy. The copy is keyed on the day and the version
+stamps of the models it reads (backend/response_cache.py): any change to
+them, or midnight, makes the view build a fresh one itself. It is stored in
+the 'shared' cache, so the web processes see the copy the worker built.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Avg, Sum
+from django.utils import timezone
+
+from accounts.models import User
+from backend.response_cache import model_versions
+from staff.models import Appointment, Invoice, Staff
+
+REPORT_MODELS = [Staff, User, Appointment, Invoice]
+
+
+def _cache_key():
+    return ':'.join(['reports', timezone.now().date().isoformat(), *model_versions(REPORT_MODELS)])
+
+
+def precompute_reports():
+    """Build the reports payload and store it for the view"""
+    key = _cache_key()
+    data = build_reports()
+    caches['shared'].set(key, data, settings.RESPONSE_CACHE_SECONDS)
+    return data
+
+
+def current_reports():
+    """The precomputed reports payload, built now when it is missing or stale"""
+    data = caches['shared'].get(_cache_key())
+    return data if data is not None else precompute_reports()
+
+
+def build_reports():
+    """Clinic performance metrics for the admin reports page"""
+    today = timezone.now().date()
+    this_month_start = timezone.now().replace(day=1).date()
+    
+    # ===== METRICS =====
+    # Total Revenue: Sum of ALL paid_amount values from invoices table (includes partially paid)
+    total_revenue = Invoice.objects.aggregate(
+        total=Sum('paid_amount')
+    )['total'] or 0
+    total_revenue = float(total_revenue)
+    
+    # Paid Invoices: Count of invoices where status = 'paid'
+    paid_invoices = Invoice.objects.filter(status='paid').count()
+    
+    # Unpaid Invoices: Count of invoices where status != 'paid' (includes 'Partially', 'unpaid', etc.)
+    unpaid_invoices = Invoice.objects.exclude(status='paid').count()
+    
+    # Total Visits: Count of appointments where status = 'completed'
+    total_visits = Appointment.objects.filter(status='completed').count()
+    
+    # Active Doctors: Count of staff where role_title contains 'Doctor' or 'Dentist' AND is_active=True AND user.is_approved=True
+    active_doctors = Staff.objects.filter(
+        role_title__iregex=r'(Doctor|Dentist|Orthodontist)',
+        is_active=True,
+        user__is_approved=True
+    ).count()
+    
+    # Active Nurses: Count of staff where role_title contains 'Nurse' AND is_active=True AND user.is_approved=True
+    active_nurses = Staff.objects.filter(
+        role_title__iregex=r'Nurse',
+        is_active=True,
+        user__is_approved=True
+    ).count()
+    
+    # ===== REVENUE OVERVIEW =====
+    # Today Revenue: Sum of ALL paid_amount from invoices where issued_date = today
+    today_revenue = Invoice.objects.filter(
+        issued_date=today
+    ).aggregate(total=Sum('paid_amount'))['total'] or 0
+    today_revenue = float(today_revenue)
+    
+    # This Month Revenue: Sum of ALL paid_amount from invoices where issued_date >= this_month_start
+    month_revenue = Invoice.objects.filter(
+        issued_date__gte=this_month_start
+    ).aggregate(total=Sum('paid_amount'))['total'] or 0
+    month_revenue = float(month_revenue)
+    
+    # Average Invoice: Average of total_amount from all invoices
+    avg_invoice = Invoice.objects.aggregate(
+        avg=Avg('total_amount')
+    )['avg'] or 0
+    avg_invoice = round(float(avg_invoice), 2)
+    
+    # ===== INVOICE STATUS =====
+    # Pending: Count where is_approved IS NULL
+    pending_invoices = Invoice.objects.filter(is_approved__isnull=True).count()
+    
+    # Approved: Count where is_approved = True
+    approved_invoices = Invoice.objects.filter(is_approved=True).count()
+    
+    # Paid: Count where status = 'paid'
+    paid_invoices_count = Invoice.objects.filter(status='paid').count()
+    
+    # Unpaid: Count where status != 'paid' (includes 'Partially', 'unpaid', etc.)
+    unpaid_invoices_count = Invoice.objects.exclude(status='paid').count()
+    
+    # ===== DOCTOR PERFORMANCE =====
+    # Get all active, approved doctors
+    doctors = Staff.objects.filter(
+        role_title__iregex=r'(Doctor|Dentist|Orthodontist)',
+        is_active=True,
+        user__is_approved=True
+    ).select_related('user')
+    
+    doctor_stats = []
+    for doctor in doctors:
+        # Doctor name
+        doctor_name = f"Dr. {doctor.first_name or ''} {doctor.last_name or ''}".strip()
+        if not doctor_name or doctor_name == 'Dr.':
+            doctor_name = f"Dr. {doctor.user.full_name}" if doctor.user else f"Dr. {doctor.staff_id}"
+        
+        # Visits: Count of appointments where staff_id = doctor.staff_id AND status = 'completed'
+        visits = Appointment.objects.filter(
+            staff=doctor,
+            status='completed'
+        ).count()
+        
+        # Revenue: Sum of ALL invoice.paid_amount for invoices linked to appointments where staff_id = doctor.staff_id
+        doctor_appointments = Appointment.objects.filter(staff=doctor)
+        doctor_revenue = Invoice.objects.filter(
+            appointment__in=doctor_appointments
+        ).aggregate(total=Sum('paid_amount'))['total'] or 0
+        doctor_revenue = float(doctor_revenue)
+        
+        doctor_stats.append({
+            'name': doctor_name,
+            'visits': visits,
+            'revenue': doctor_revenue
+        })
+    
+    # ===== NURSE PERFORMANCE =====
+    # Get all active, approved nurses
+    nurses = Staff.objects.filter(
+        role_title__iregex=r'Nurse',
+        is_active=True,
+        user__is_approved=True
+    ).select_related('user')
+    
+    nurse_stats = []
+    for nurse in nurses:
+        # Nurse name
+        nurse_name = f"{nurse.first_name or ''} {nurse.last_name or ''}".strip()
+        if not nurse_name:
+            nurse_name = nurse.user.full_name if nurse.user else f"Nurse {nurse.staff_id}"
+        
+        # Visits: Count of ALL appointments where staff_id = nurse.staff_id (any status)
+        visits = Appointment.objects.filter(
+            staff=nurse
+        ).count()
+        
+        nurse_stats.append({
+            'name': nurse_name,
+            'visits': visits
+        })
+    
+    # Sort both by their respective metrics (doctors by revenue, nurses by visits)
+    doctor_stats.sort(key=lambda x: x['revenue'], reverse=True)
+    nurse_stats.sort(key=lambda x: x['visits'], reverse=True)
+    
+    # Build response
+    response_data = {
+        'metrics': {
+            'totalRevenue': total_revenue,
+            'paidInvoices': paid_invoices,
+            'unpaidInvoices': unpaid_invoices,
+            'totalVisits': total_visits,
+            'activeDoctors': active_doctors,
+            'activeNurses': active_nurses
+        },
+        'revenue': {
+            'today': today_revenue,
+            'month': month_revenue,
+            'avgInvoice': avg_invoice
+        },
+        'invoiceStats': [
+            {'label': 'Pending', 'value': pending_invoices},
+            {'label': 'Approved', 'value': approved_invoices},
+            {'label': 'Paid', 'value': paid_invoices_count},
+            {'label': 'Unpaid', 'value': unpaid_invoices_count}
+        ],
+        'doctorStats': doctor_stats,
+        'nurseStats': nurse_stats
+    }
+
+    return response_data
@@ -0,0 +1,9 @@
+from jobs.queue import job
+
+from . import reports
+
+
+@job(cron='*/5 * * * *', max_attempts=1)
+def precompute_reports():
+    """Rebuild the admin reports payload so the page does not compute it on request"""
+    reports.precompute_reports()
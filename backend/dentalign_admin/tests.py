@@ -1,3 +1,79 @@
-from django.test import TestCase
+from backend.testing import ClinicTestCase
+from staff.models import Invoice
 
-# Create your tests here.
\ No newline at end of file
+
+class AdminEndpointQueryBudgetTests(ClinicTestCase):
+    """
+    Every admin route stays within its query budget on the seeded clinic.
+
+    Several of these views still run queries per row; their budgets hold
+    today's counts so any further growth fails.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.invoice = Invoice.objects.filter(patient=cls.patient).first()
+
+    def test_dashboard_stats(self):
+        self.assertQueryBudget(8, 'GET', '/api/admin/dashboard/stats/', user=self.admin)
+
+    def test_services_list(self):
+        self.assertQueryBudget(3, 'GET', '/api/admin/services/', user=self.admin)
+
+    def test_add_service(self):
+        self.assertQueryBudget(
+            4, 'POST', '/api/admin/services/add/', {'name': 'Sealant', 'price': '45.00'},
+            user=self.admin, status_code=201,
+        )
+
+    def test_schedules_list(self):
+        self.assertQueryBudget(3, 'GET', '/api/admin/schedules/', user=self.admin)
+
+    def test_staff_list(self):
+        self.assertQueryBudget(3, 'GET', '/api/admin/staff/', user=self.admin)
+
+    def test_user_approvals_list(self):
+        self.assertQueryBudget(7, 'GET', '/api/admin/user-approvals/', user=self.admin)
+
+    def test_approve_user(self):
+        self.assertQueryBudget(
+            10, 'POST', f"/api/admin/user-approvals/{self.clinic['pending_doctor'].user_id}/approve/", user=self.admin
+        )
+
+    def test_reject_user(self):
+        self.assertQueryBudget(
+            4, 'POST', f"/api/admin/user-approvals/{self.clinic['pending_doctor'].user_id}/reject/", user=self.admin
+        )
+
+    def test_patients_list(self):
+        self.assertQueryBudget(3, 'GET', '/api/admin/patients/', user=self.admin)
+
+    def test_patient_details(self):
+        self.assertQueryBudget(25, 'GET', f'/api/admin/patients/{self.patient.patient_id}/', user=self.admin)
+
+    def test_invoices_list(self):
+        self.assertQueryBudget(3, 'GET', '/api/admin/invoices/', user=self.admin)
+
+    def test_billing_list(self):
+        self.assertQueryBudget(4, 'GET', '/api/admin/billing/', user=self.admin)
+
+    def test_approve_invoice(self):
+        self.assertQueryBudget(4, 'POST', f'/api/admin/invoices/{self.invoice.invoice_id}/approve/', user=self.admin)
+
+    def test_reject_invoice(self):
+        self.assertQueryBudget(4, 'POST', f'/api/admin/invoices/{self.invoice.invoice_id}/reject/', user=self.admin)
+
+    def test_update_payment_status(self):
+        self.assertQueryBudget(
+            4, 'POST', f'/api/admin/invoices/{self.invoice.invoice_id}/payment/', {'status': 'paid'}, user=self.admin
+        )
+
+    def test_reports_data(self):
+        self.assertQueryBudget(25, 'GET', '/api/admin/reports/', user=self.admin)
+
+    def test_staff_activation(self):
+        nurse_id = self.clinic['nurses'][1].staff_id
+        self.assertQueryBudget(4, 'POST', f'/api/admin/staff/{nurse_id}/deactivate/', user=self.admin)
+        self.assertQueryBudget(4, 'POST', f'/api/admin/staff/{nurse_id}/activate/', user=self.admin)
+        self.assertQueryBudget(6, 'POST', f'/api/admin/staff/{nurse_id}/delete/', user=self.admin)
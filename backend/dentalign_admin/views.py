@@ -5,17 +5,26 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django.http import JsonResponse
 from django.utils import timezone
-from django.db.models import Sum, Count, Q, Avg
-from datetime import datetime, timedelta
+from django.db.models import Sum, Count, Q, Case, CharField, F, OuterRef, Prefetch, Subquery, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, ExtractHour, ExtractMinute, LPad, NullIf, TruncDate
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 # Import models from staff app (where the real models are defined)
-from staff.models import Patient, Staff, Appointment, Treatment, Invoice, Payment, Service
+from staff.models import Patient, PatientSummary, Staff, Appointment, Treatment, Invoice, Payment, Service
+from staff.filters import on_date
+from backend.concurrency import run_concurrently
+from backend.db_routers import use_replica
+from backend.response_cache import cache_response
+from . import reports
+from accounts.models import User
 
 # Create your views here.
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # Use proper authentication like staff
+@use_replica
+@cache_response([Patient, Staff, Appointment, Invoice, Service])
 def dashboard_stats(request):
     """
     API endpoint for admin dashboard statistics - DEBUGGING VERSION
@@ -24,62 +33,57 @@ def dashboard_stats(request):
         today = timezone.now().date()
         this_month = timezone.now().replace(day=1).date()
         
-        # Start simple - test basic queries one by one
-        try:
-            total_patients = Patient.objects.count()
-        except Exception as e:
-            total_patients = f"Error: {str(e)}"
-            
-        try:
-            total_staff = Staff.objects.count()
-        except Exception as e:
-            total_staff = f"Error: {str(e)}"
-            
-        try:
-            today_appointments = Appointment.objects.filter(start_time__date=today).count()
-        except Exception as e:
-            today_appointments = f"Error: {str(e)}"
-            
-        try:
-            # Total revenue from all paid_amount in invoices table (exclude cancelled appointments)
-            total_revenue_query = Invoice.objects.all().select_related('appointment')
-            
-            # Calculate total revenue excluding cancelled appointments
-            total_revenue = 0
-            for invoice in total_revenue_query:
-                # Only count if appointment is not cancelled (or if no appointment linked)
-                if not invoice.appointment or invoice.appointment.status != 'cancelled':
-                    total_revenue += float(invoice.paid_amount or 0)
-                    
-        except Exception as e:
-            total_revenue = f"Error: {str(e)}"
-            
-        try:
-            # Number of available services
-            total_services = Service.objects.count()
-        except Exception as e:
-            total_services = f"Error: {str(e)}"
-            
-        try:
+        def or_error(query):
+            def run():
+                try:
+                    return query()
+                except Exception as e:
+                    return f"Error: {str(e)}"
+            return run
+
+        def revenue():
+            # Total paid_amount over all invoices, excluding cancelled appointments
+            total = Invoice.objects.exclude(appointment__status='cancelled').aggregate(
+                total=Sum('paid_amount')
+            )['total']
+            return float(total or 0)
+
+        def recent_appointments():
             # Recent appointments (last 5 appointments)
-            recent_appointments_query = Appointment.objects.select_related(
-                'patient', 'staff'
-            ).order_by('-start_time')[:5]
-            
-            recent_appointments = []
-            for appointment in recent_appointments_query:
-                appointment_data = {
-                    'appointment_id': str(appointment.appointment_id),
-                    'patientName': f"{appointment.patient.first_name} {appointment.patient.last_name}" if appointment.patient else "Unknown Patient",
-                    'doctorName': f"Dr. {appointment.staff.first_name} {appointment.staff.last_name}" if appointment.staff else "Unknown Doctor",
-                    'time': appointment.start_time.strftime('%b %d, %Y %I:%M %p') if appointment.start_time else "Unknown Time",
-                    'status': appointment.status,
-                    'reason': appointment.reason or "General Consultation"
-                }
-                recent_appointments.append(appointment_data)
-        except Exception as e:
-            recent_appointments = []
-        
+            try:
+                recent_appointments_query = Appointment.objects.select_related(
+                    'patient', 'staff'
+                ).order_by('-start_time')[:5]
+                return [
+                    {
+                        'appointment_id': str(appointment.appointment_id),
+                        'patientName': f"{appointment.patient.first_name} {appointment.patient.last_name}" if appointment.patient else "Unknown Patient",
+                        'doctorName': f"Dr. {appointment.staff.first_name} {appointment.staff.last_name}" if appointment.staff else "Unknown Doctor",
+                        'time': appointment.start_time.strftime('%b %d, %Y %I:%M %p') if appointment.start_time else "Unknown Time",
+                        'status': appointment.status,
+                        'reason': appointment.reason or "General Consultation"
+                    }
+                    for appointment in recent_appointments_query
+                ]
+            except Exception:
+                return []
+
+        # The queries are independent; run them concurrently
+        results = run_concurrently({
+            'total_patients': or_error(Patient.objects.count),
+            'total_staff': or_error(Staff.objects.count),
+            'today_appointments': or_error(lambda: Appointment.objects.filter(on_date('start_time', today)).count()),
+            'total_revenue': or_error(revenue),
+            'total_services': or_error(Service.objects.count),
+            'recent_appointments': recent_appointments,
+        })
+        total_patients = results['total_patients']
+        total_staff = results['total_staff']
+        today_appointments = results['today_appointments']
+        total_revenue = results['total_revenue']
+        total_services = results['total_services']
+        recent_appointments = results['recent_appointments']
+
         # Simple response to debug
         stats = {
             'patients': {
@@ -127,6 +131,8 @@ def dashboard_stats(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@cache_response([Service])
 def services_list(request):
     """
     API endpoint for admin services list - from services_available table (catalog of available services)
@@ -223,83 +229,64 @@ def add_service(request):
         )
 
 
+def _clock_time(field):
+    """'HH:MM' (UTC) of a datetime column, formatted by the database"""
+    def two_digits(part):
+        return LPad(Cast(part(field, tzinfo=dt_timezone.utc), CharField()), 2, Value('0'))
+    return Concat(two_digits(ExtractHour), Value(':'), two_digits(ExtractMinute))
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@cache_response([Patient, Staff, Appointment, Treatment, Invoice])
 def schedules_list(request):
     """
     API endpoint for admin schedules list - from appointments table
     Gets service name from related treatments and payment status from related invoices
     """
     try:
-        # Get all appointments with related data
-        appointments = Appointment.objects.select_related('patient', 'staff').order_by('-start_time')
-        
-        schedules_data = []
-        for appointment in appointments:
-            # Get service name from treatments - look for treatments for this patient
-            service_name = 'General Consultation'
-            try:
-                # Look for treatments for this patient around the appointment time
-                patient_treatments = Treatment.objects.filter(appointment__patient=appointment.patient).order_by('-created_at')
-                if patient_treatments.exists():
-                    # Use the most recent treatment for this patient
-                    service_name = patient_treatments.first().description or 'General Consultation'
-            except Exception:
-                service_name = 'General Consultation'
-            
-            # Get payment status from invoices linked to this appointment
-            payment_status = 'Pending'
-            try:
-                # Use the proper relationship - invoices have appointment foreign key
-                appointment_invoice = Invoice.objects.filter(appointment=appointment).first()
-                if appointment_invoice:
-                    # Map database status to display status
-                    status_mapping = {
-                        'pending': 'Pending',
-                        'paid': 'Paid',
-                        'overdue': 'Overdue', 
-                        'cancelled': 'Cancelled',
-                        'partially_paid': 'Pending',
-                        'partial': 'Pending',
-                        'unpaid': 'Unpaid'
-                    }
-                    payment_status = status_mapping.get(appointment_invoice.status, 'Pending')
-                    print(f"Appointment {appointment.appointment_id}: Found invoice {appointment_invoice.invoice_id} with status '{appointment_invoice.status}' -> mapped to '{payment_status}'")
-                elif appointment.status == 'completed':
-                    payment_status = 'Paid' 
-                elif appointment.status == 'cancelled':
-                    payment_status = 'Cancelled'
-                else:
-                    print(f"Appointment {appointment.appointment_id}: No linked invoice, status is '{appointment.status}' -> defaulting to 'Pending'")
-            except Exception as e:
-                print(f"Error getting payment status for appointment {appointment.appointment_id}: {str(e)}")
-                # Fallback to appointment status
-                if appointment.status == 'completed':
-                    payment_status = 'Paid' 
-                elif appointment.status == 'cancelled':
-                    payment_status = 'Cancelled'
-            except Exception:
-                payment_status = 'Pending'
-            
-            schedule = {
-                'id': str(appointment.appointment_id),
-                'patient_name': f"{appointment.patient.first_name} {appointment.patient.last_name}" if appointment.patient else 'Unknown Patient',
-                'staff_name': f"Dr. {appointment.staff.first_name} {appointment.staff.last_name}" if appointment.staff else 'Unknown Staff',
-                'service_name': service_name,  # From treatments table
-                'date': appointment.start_time.strftime('%Y-%m-%d') if appointment.start_time else 'Unknown Date',
-                'time': appointment.start_time.strftime('%H:%M') if appointment.start_time else 'Unknown Time',
-                'duration': '30 min',  # Default duration
-                'status': appointment.status or 'Scheduled',
-                'payment_status': payment_status,
-                'notes': appointment.reason or ''  # Using reason as notes for now
-            }
-            schedules_data.append(schedule)
-        
+        # Service name: description of the patient's most recent treatment
+        latest_service = Treatment.objects.filter(
+            appointment__patient=OuterRef('patient')
+        ).order_by('-created_at').values('service__description')[:1]
+        invoice_status = Invoice.objects.filter(appointment=OuterRef('pk')).order_by('pk').values('status')[:1]
+
+        # One query; the renderer encodes the UUIDs and dates as they are
+        schedules_data = list(
+            Appointment.objects.alias(invoice_status=Subquery(invoice_status)).order_by('-start_time').values(
+                'status',
+                id=F('appointment_id'),
+                patient_name=Concat('patient__first_name', Value(' '), 'patient__last_name'),
+                staff_name=Concat(Value('Dr. '), 'staff__first_name', Value(' '), 'staff__last_name'),
+                service_name=Coalesce(
+                    NullIf(Subquery(latest_service), Value('')), Value('General Consultation'),
+                    output_field=TextField(),
+                ),
+                date=TruncDate('start_time', tzinfo=dt_timezone.utc),
+                time=_clock_time('start_time'),
+                duration=Value('30 min'),  # Default duration
+                # Invoice status mapped to its display value, else derived from the appointment
+                payment_status=Case(
+                    When(invoice_status='paid', then=Value('Paid')),
+                    When(invoice_status='overdue', then=Value('Overdue')),
+                    When(invoice_status='cancelled', then=Value('Cancelled')),
+                    When(invoice_status='unpaid', then=Value('Unpaid')),
+                    When(invoice_status__isnull=False, then=Value('Pending')),
+                    When(status='completed', then=Value('Paid')),
+                    When(status='cancelled', then=Value('Cancelled')),
+                    default=Value('Pending'),
+                ),
+                notes=Coalesce('reason', Value(''), output_field=TextField()),  # Using reason as notes for now
+            )
+        )
+
         # Get some summary stats
+        today = timezone.now().date()
         total_appointments = len(schedules_data)
-        today_appointments = len([s for s in schedules_data if s['date'] == timezone.now().strftime('%Y-%m-%d')])
-        completed_appointments = len([s for s in schedules_data if s['status'] == 'completed'])
-        
+        today_appointments = sum(1 for s in schedules_data if s['date'] == today)
+        completed_appointments = sum(1 for s in schedules_data if s['status'] == 'completed')
+
         response_data = {
             'schedules': schedules_data,
             'summary': {
@@ -320,6 +307,8 @@ def schedules_list(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([Staff, User])
 def staff_list(request):
     """
     API endpoint for admin staff list - from staff table
@@ -371,6 +360,8 @@ def staff_list(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([User])
 def user_approvals_list(request):
     """
     API endpoint for admin user approvals - from users table
@@ -523,6 +514,8 @@ def reject_user(request, user_id):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([Patient, PatientSummary])
 def patients_list(request):
     """
     API endpoint for admin patients list - from patients table
@@ -530,10 +523,12 @@ def patients_list(request):
     """
     try:
         # Get all patients ordered by creation date (newest first)
-        patients = Patient.objects.all().order_by('-created_at')
+        patients = Patient.objects.select_related('summary').order_by('-created_at')
         
         patients_data = []
         for patient in patients:
+            # Visit, appointment, billing and allergy figures from the patient summary
+            summary = getattr(patient, 'summary', None) or PatientSummary(patient=patient)
             patient_item = {
                 'patient_id': str(patient.patient_id),
                 'full_name': patient.full_name,
@@ -544,7 +539,15 @@ def patients_list(request):
                 'dob': patient.dob.strftime('%Y-%m-%d') if patient.dob else 'N/A',
                 'gender': patient.gender or 'N/A',
                 'address': patient.address or 'N/A',
-                'created_at': patient.created_at.strftime('%Y-%m-%d') if patient.created_at else 'Unknown'
+                'created_at': patient.created_at.strftime('%Y-%m-%d') if patient.created_at else 'Unknown',
+                'visit_count': summary.visit_count,
+                'last_visit': summary.last_visit_at,
+                'next_appointment': summary.next_appointment_at,
+                'outstanding_balance': summary.outstanding_balance,
+                'open_invoices': summary.open_invoice_count,
+                'allergy_count': summary.allergy_count,
+                'has_severe_allergy': summary.has_severe_allergy,
+                'medical_records': summary.record_count,
             }
             patients_data.append(patient_item)
         
@@ -571,6 +574,8 @@ def patients_list(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([Patient, Staff, User, Appointment, Treatment, Invoice])
 def patient_details(request, patient_id):
     """
     API endpoint for admin patient details - from patients table with related data
@@ -665,6 +670,8 @@ def patient_details(request, patient_id):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([Patient, Staff, Appointment, Treatment, Invoice, Service])
 def invoices_list(request):
     """
     API endpoint for admin invoices - invoices pending approval (is_approved=False)
@@ -741,67 +748,44 @@ def invoices_list(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([Patient, Staff, Appointment, Treatment, Invoice, Service])
 def billing_list(request):
     """
     API endpoint for admin billing - approved invoices only (is_approved=True)
     """
     try:
-        # Get approved invoices with related data and prefetch treatments
+        # Approved invoices with their appointment's treatments (one prefetch for all)
         invoices = Invoice.objects.filter(is_approved=True).select_related(
-            'patient', 'appointment', 'appointment__patient', 'appointment__staff'
-        ).prefetch_related('appointment__treatments').order_by('-created_at')
-        
+            'patient', 'appointment__staff'
+        ).prefetch_related(
+            Prefetch(
+                'appointment__treatments',
+                queryset=Treatment.objects.select_related('service').order_by('created_at'),
+                to_attr='billed_treatments',
+            )
+        ).order_by('-created_at')
+
         invoices_data = []
         for invoice in invoices:
-            # Get services from appointment or default
-            services = []
-            calculated_total = 0.0
-            if invoice.appointment:
-                # IMPORTANT: Get treatments ONLY for this specific appointment
-                # Use explicit filter with select_related to get service details
-                appointment_treatments = list(Treatment.objects.filter(
-                    appointment_id=invoice.appointment.appointment_id
-                ).select_related('service').order_by('created_at'))
-                
-                # Debug: Log what we're getting
-                print(f"DEBUG Invoice {invoice.invoice_id}: Patient {invoice.patient.full_name}, Appointment {invoice.appointment.appointment_id}")
-                print(f"DEBUG Found {len(appointment_treatments)} treatments:")
-                for t in appointment_treatments:
-                    service_name = t.service.name if t.service else 'Unknown Service'
-                    cost = float(t.cost) if t.cost else 0
-                    print(f"  - {service_name} (cost: {cost}, appointment_id: {t.appointment.appointment_id})")
-                
-                if appointment_treatments:
-                    services = [
-                        {
-                            'name': t.service.name if t.service else 'Unknown Service',
-                            'price': float(t.cost) if t.cost else 0
-                        }
-                        for t in appointment_treatments
-                    ]
-                    # Calculate total from all treatments in the appointment
-                    calculated_total = sum(float(t.cost) if t.cost else 0 for t in appointment_treatments)
-                else:
-                    # No treatments found for this appointment - return empty services
-                    services = []
-                    calculated_total = 0.0
-            else:
-                # No appointment linked - return empty services
-                services = []
-                calculated_total = 0.0
-            
-            invoice_data = {
-                'id': str(invoice.invoice_id),
+            appointment = invoice.appointment
+            # No appointment linked - return empty services
+            treatments = appointment.billed_treatments if appointment else []
+            services = [
+                {'name': t.service.name if t.service else 'Unknown Service', 'price': t.cost or 0}
+                for t in treatments
+            ]
+            invoices_data.append({
+                'id': invoice.invoice_id,
                 'patient': invoice.patient.full_name,
-                'doctor': f"Dr. {invoice.appointment.staff.first_name} {invoice.appointment.staff.last_name}" if invoice.appointment and invoice.appointment.staff else 'N/A',
-                'date': invoice.issued_date.strftime('%Y-%m-%d'),
-                'total': calculated_total,  # Use calculated total from treatments
+                'doctor': f"Dr. {appointment.staff.first_name} {appointment.staff.last_name}" if appointment else 'N/A',
+                'date': invoice.issued_date,
+                'total': sum(service['price'] for service in services),  # Use calculated total from treatments
                 'status': 'approved',  # all billing items are approved
                 'paymentStatus': invoice.status,  # payment status
                 'services': services
-            }
-            invoices_data.append(invoice_data)
-        
+            })
+
         return Response(invoices_data, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -903,165 +887,14 @@ def update_payment_status(request, invoice_id):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@use_replica
+@cache_response([Staff, User, Appointment, Invoice])
 def reports_data(request):
     """
     API endpoint for admin reports - comprehensive clinic performance metrics
     """
     try:
-        today = timezone.now().date()
-        this_month_start = timezone.now().replace(day=1).date()
-        
-        # ===== METRICS =====
-        # Total Revenue: Sum of ALL paid_amount values from invoices table (includes partially paid)
-        total_revenue = Invoice.objects.aggregate(
-            total=Sum('paid_amount')
-        )['total'] or 0
-        total_revenue = float(total_revenue)
-        
-        # Paid Invoices: Count of invoices where status = 'paid'
-        paid_invoices = Invoice.objects.filter(status='paid').count()
-        
-        # Unpaid Invoices: Count of invoices where status != 'paid' (includes 'Partially', 'unpaid', etc.)
-        unpaid_invoices = Invoice.objects.exclude(status='paid').count()
-        
-        # Total Visits: Count of appointments where status = 'completed'
-        total_visits = Appointment.objects.filter(status='completed').count()
-        
-        # Active Doctors: Count of staff where role_title contains 'Doctor' or 'Dentist' AND is_active=True AND user.is_approved=True
-        active_doctors = Staff.objects.filter(
-            role_title__iregex=r'(Doctor|Dentist|Orthodontist)',
-            is_active=True,
-            user__is_approved=True
-        ).count()
-        
-        # Active Nurses: Count of staff where role_title contains 'Nurse' AND is_active=True AND user.is_approved=True
-        active_nurses = Staff.objects.filter(
-            role_title__iregex=r'Nurse',
-            is_active=True,
-            user__is_approved=True
-        ).count()
-        
-        # ===== REVENUE OVERVIEW =====
-        # Today Revenue: Sum of ALL paid_amount from invoices where issued_date = today
-        today_revenue = Invoice.objects.filter(
-            issued_date=today
-        ).aggregate(total=Sum('paid_amount'))['total'] or 0
-        today_revenue = float(today_revenue)
-        
-        # This Month Revenue: Sum of ALL paid_amount from invoices where issued_date >= this_month_start
-        month_revenue = Invoice.objects.filter(
-            issued_date__gte=this_month_start
-        ).aggregate(total=Sum('paid_amount'))['total'] or 0
-        month_revenue = float(month_revenue)
-        
-        # Average Invoice: Average of total_amount from all invoices
-        avg_invoice = Invoice.objects.aggregate(
-            avg=Avg('total_amount')
-        )['avg'] or 0
-        avg_invoice = round(float(avg_invoice), 2)
-        
-        # ===== INVOICE STATUS =====
-        # Pending: Count where is_approved IS NULL
-        pending_invoices = Invoice.objects.filter(is_approved__isnull=True).count()
-        
-        # Approved: Count where is_approved = True
-        approved_invoices = Invoice.objects.filter(is_approved=True).count()
-        
-        # Paid: Count where status = 'paid'
-        paid_invoices_count = Invoice.objects.filter(status='paid').count()
-        
-        # Unpaid: Count where status != 'paid' (includes 'Partially', 'unpaid', etc.)
-        unpaid_invoices_count = Invoice.objects.exclude(status='paid').count()
-        
-        # ===== DOCTOR PERFORMANCE =====
-        # Get all active, approved doctors
-        doctors = Staff.objects.filter(
-            role_title__iregex=r'(Doctor|Dentist|Orthodontist)',
-            is_active=True,
-            user__is_approved=True
-        ).select_related('user')
-        
-        doctor_stats = []
-        for doctor in doctors:
-            # Doctor name
-            doctor_name = f"Dr. {doctor.first_name or ''} {doctor.last_name or ''}".strip()
-            if not doctor_name or doctor_name == 'Dr.':
-                doctor_name = f"Dr. {doctor.user.full_name}" if doctor.user else f"Dr. {doctor.staff_id}"
-            
-            # Visits: Count of appointments where staff_id = doctor.staff_id AND status = 'completed'
-            visits = Appointment.objects.filter(
-                staff=doctor,
-                status='completed'
-            ).count()
-            
-            # Revenue: Sum of ALL invoice.paid_amount for invoices linked to appointments where staff_id = doctor.staff_id
-            doctor_appointments = Appointment.objects.filter(staff=doctor)
-            doctor_revenue = Invoice.objects.filter(
-                appointment__in=doctor_appointments
-            ).aggregate(total=Sum('paid_amount'))['total'] or 0
-            doctor_revenue = float(doctor_revenue)
-            
-            doctor_stats.append({
-                'name': doctor_name,
-                'visits': visits,
-                'revenue': doctor_revenue
-            })
-        
-        # ===== NURSE PERFORMANCE =====
-        # Get all active, approved nurses
-        nurses = Staff.objects.filter(
-            role_title__iregex=r'Nurse',
-            is_active=True,
-            user__is_approved=True
-        ).select_related('user')
-        
-        nurse_stats = []
-        for nurse in nurses:
-            # Nurse name
-            nurse_name = f"{nurse.first_name or ''} {nurse.last_name or ''}".strip()
-            if not nurse_name:
-                nurse_name = nurse.user.full_name if nurse.user else f"Nurse {nurse.staff_id}"
-            
-            # Visits: Count of ALL appointments where staff_id = nurse.staff_id (any status)
-            visits = Appointment.objects.filter(
-                staff=nurse
-            ).count()
-            
-            nurse_stats.append({
-                'name': nurse_name,
-                'visits': visits
-            })
-        
-        # Sort both by their respective metrics (doctors by revenue, nurses by visits)
-        doctor_stats.sort(key=lambda x: x['revenue'], reverse=True)
-        nurse_stats.sort(key=lambda x: x['visits'], reverse=True)
-        
-        # Build response
-        response_data = {
-            'metrics': {
-                'totalRevenue': total_revenue,
-                'paidInvoices': paid_invoices,
-                'unpaidInvoices': unpaid_invoices,
-                'totalVisits': total_visits,
-                'activeDoctors': active_doctors,
-                'activeNurses': active_nurses
-            },
-            'revenue': {
-                'today': today_revenue,
-                'month': month_revenue,
-                'avgInvoice': avg_invoice
-            },
-            'invoiceStats': [
-                {'label': 'Pending', 'value': pending_invoices},
-                {'label': 'Approved', 'value': approved_invoices},
-                {'label': 'Paid', 'value': paid_invoices_count},
-                {'label': 'Unpaid', 'value': unpaid_invoices_count}
-            ],
-            'doctorStats': doctor_stats,
-            'nurseStats': nurse_stats
-        }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(reports.current_reports(), status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response(
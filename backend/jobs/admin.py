@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job, Schedule
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key', 'last_error')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'result', 'created_at', 'finished_at')
+    date_hierarchy = 'created_at'
+    actions = ['retry_now']
+
+    @admin.action(description='Run the selected failed jobs again')
+    def retry_now(self, request, queryset):
+        # A failed job whose key is queued again is already covered
+        queued_keys = Job.objects.filter(status=Job.QUEUED, key__isnull=False).values('key')
+        retried = queryset.filter(status=Job.FAILED).exclude(key__in=queued_keys).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{retried} job(s) queued again.')
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'cron', 'next_run_at', 'last_run_at')
+    readonly_fields = ('name', 'cron', 'last_run_at')
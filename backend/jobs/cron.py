@@ -0,0 +1,107 @@
+"""
+Cron expressions for periodic jobs.
+
+Five fields, minute hour day-of-month month day-of-week, each `*`, a
+number, a range `a-b`, a step `*/n` or `a-b/n`, or a comma-separated list
+of those. Day-of-week runs from 0 (Sunday) to 6; 7 is Sunday too. As in
+cron, when both day fields are restricted a day matching either one
+qualifies. `@hourly`, `@daily`, `@weekly` and `@monthly` are accepted.
+
+Times are evaluated in the clinic time zone (TIME_ZONE).
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+)
+
+# How far ahead next_after() looks before deciding an expression never matches
+SEARCH_YEARS = 5
+
+
+class CronError(ValueError):
+    pass
+
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(','):
+        spec, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if spec == '*':
+                start, end = low, high
+            elif '-' in spec:
+                start, end = (int(bound) for bound in spec.split('-', 1))
+            else:
+                start = end = int(spec)
+                if step != 1:
+                    end = high
+        except ValueError:
+            raise CronError(f'Invalid {name} field "{text}".')
+        if step < 1 or not low <= start <= end <= high:
+            raise CronError(f'Invalid {name} field "{text}".')
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpression:
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != len(FIELDS):
+            raise CronError(f'Invalid cron expression "{expression}": expected {len(FIELDS)} fields.')
+        parsed = [_parse_field(text, *spec) for text, spec in zip(fields, FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.expression
+
+    def matches_day(self, day):
+        day_matches = day.day in self.days
+        weekday_matches = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+    def matches(self, moment):
+        moment = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+        return (
+            moment.month in self.months and self.matches_day(moment)
+            and moment.hour in self.hours and moment.minute in self.minutes
+        )
+
+    def next_after(self, moment):
+        """The first matching minute strictly after `moment` (aware)"""
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0)
+        candidate = local + timedelta(minutes=1)
+        horizon = local.year + SEARCH_YEARS
+        while candidate.year <= horizon:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = datetime(candidate.year + year, month + 1, 1)
+            elif not self.matches_day(candidate):
+                candidate = datetime.combine(candidate.date() + timedelta(days=1), datetime.min.time())
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(candidate)
+        raise CronError(f'Cron expression "{self.expression}" never matches.')
@@ -0,0 +1,54 @@
+"""
+Run background jobs (see jobs/queue.py) and enqueue periodic ones.
+
+    python manage.py run_worker --threads 4
+
+polls the jobs table until interrupted. Start one per host, or more: workers
+share the queue through the database and never run a job twice. Only one
+worker needs to schedule periodic jobs, but several doing so is harmless.
+
+    python manage.py run_worker --once
+
+runs the jobs that are due, including periodic ones, and exits; use it from
+cron where a long-running process is not wanted.
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import registry
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs and enqueue periodic ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, help='Jobs run concurrently (default JOBS_WORKER_THREADS)')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between polls (default JOBS_POLL_SECONDS)')
+        parser.add_argument('--once', action='store_true', help='Run the due jobs and exit')
+        parser.add_argument('--no-schedule', action='store_true', help='Do not enqueue periodic jobs')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            threads=options['threads'], poll_interval=options['poll_interval'],
+            schedule=not options['no_schedule'],
+        )
+        if options['once']:
+            ran = worker.work_off()
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} job(s)'))
+            return
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the running jobs finish...')
+            worker.stop()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        periodic = sorted(f'{name} [{job.cron}]' for name, job in registry.items() if job.cron)
+        self.stdout.write(
+            f'Worker {worker.name}: {worker.threads} thread(s), {len(registry)} job type(s)'
+            + (f', periodic: {", ".join(periodic)}' if periodic and worker.schedule else '')
+        )
+        worker.run()
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -0,0 +1,66 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A call of a registered job function, run by `manage.py run_worker`"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    # At most one queued job per key: enqueueing the same work twice coalesces
+    key = models.CharField(max_length=200, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'jobs'
+        indexes = [
+            # The worker's claim: due queued jobs, highest priority first
+            models.Index(
+                fields=['-priority', 'run_at'], condition=Q(status='queued'), name='jobs_queued_idx',
+            ),
+            # Lost-worker recovery and purging of finished jobs
+            models.Index(fields=['status', 'locked_at'], name='jobs_status_locked_idx'),
+            models.Index(fields=['status', 'finished_at'], name='jobs_status_finished_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(status='queued'), name='jobs_unique_queued_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class Schedule(models.Model):
+    """When a periodic job (@job(cron=...)) is next enqueued; shared by every worker"""
+    name = models.CharField(max_length=200, unique=True)
+    cron = models.CharField(max_length=100)
+    next_run_at = models.DateTimeField()
+    last_run_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'job_schedules'
+
+    def __str__(self):
+        return f"{self.name} ({self.cron})"
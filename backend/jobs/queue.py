@@ -0,0 +1,100 @@
+"""
+Background jobs stored in the database.
+
+Register a function with @job in an app's tasks.py (collected when the
+jobs app is ready) and enqueue calls to it:
+
+    @job(max_attempts=5)
+    def send_reminder(appointment_id): ...
+
+    send_reminder.enqueue(appointment_id=appointment.pk)
+
+enqueue() inserts a row into the jobs table in the caller's transaction, so
+a job whose transaction rolls back never runs, and `manage.py run_worker`
+picks it up after the commit. Keyword arguments are stored as JSON: UUIDs,
+dates and Decimals arrive as strings.
+
+A `key` coalesces repeated requests for the same work: while a job with
+that key is still queued, enqueueing it again returns the queued job.
+
+@job(cron='0 3 * * *') also runs the function on a schedule (see
+jobs/cron.py); the worker enqueues it when it comes due.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cron import CronExpression
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+registry = {}
+
+
+class UnknownJob(LookupError):
+    pass
+
+
+class RegisteredJob:
+    """A function that runs as a background job"""
+
+    def __init__(self, func, name, max_attempts, cron, priority):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.cron = CronExpression(cron) if cron else None
+        self.priority = priority
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, **kwargs):
+        return enqueue(self.name, **kwargs)
+
+
+def job(func=None, *, name=None, max_attempts=DEFAULT_MAX_ATTEMPTS, cron=None, priority=0):
+    """Register a function as a job, named `<module>.<function>` by default"""
+    def decorator(func):
+        registered = RegisteredJob(
+            func, name or f'{func.__module__}.{func.__name__}', max_attempts, cron, priority,
+        )
+        registry[registered.name] = registered
+        return registered
+    return decorator(func) if func is not None else decorator
+
+
+def get_job(name):
+    try:
+        return registry[name]
+    except KeyError:
+        raise UnknownJob(f'No job named "{name}" is registered.')
+
+
+def enqueue(name, *, key=None, delay=None, run_at=None, priority=None, **kwargs):
+    """Queue a call of the job `name` with `kwargs`; returns the Job row"""
+    from .models import Job
+
+    registered = get_job(name)
+    if run_at is None:
+        run_at = timezone.now() + (timedelta(seconds=delay) if delay else timedelta())
+    fields = dict(
+        name=registered.name,
+        kwargs=kwargs,
+        key=key,
+        run_at=run_at,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts,
+    )
+    if key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        queued = Job.objects.filter(key=key, status=Job.QUEUED).first()
+        if queued is None:
+            # Claimed by a worker in the meantime; this request still needs a run
+            return Job.objects.create(**fields)
+        return queued
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import job
+
+
+@job(cron='30 3 * * *')
+def purge_finished_jobs():
+    """Delete succeeded and failed jobs older than JOBS_KEEP_DAYS"""
+    horizon = timezone.now() - timedelta(days=settings.JOBS_KEEP_DAYS)
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.SUCCEEDED, Job.FAILED], finished_at__lt=horizon,
+    ).delete()
+    return deleted
@@ -0,0 +1,247 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from backend.testing import ClinicTestCase
+from dentalign_admin import reports
+from . import queue
+from .cron import CronError, CronExpression
+from .models import Job, Schedule
+from .tasks import purge_finished_jobs
+from .worker import Worker, enqueue_due_schedules, requeue_lost_jobs, retry_delay, sync_schedules
+
+calls = []
+
+
+@queue.job(name='tests.record')
+def record(value=None):
+    calls.append(value)
+    return value
+
+
+@queue.job(name='tests.flaky', max_attempts=2)
+def flaky():
+    calls.append('flaky')
+    raise RuntimeError('boom')
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+@override_settings(TIME_ZONE='UTC')
+class CronExpressionTests(SimpleTestCase):
+    def test_next_after(self):
+        start = utc(2026, 3, 14, 10, 7, 30)
+        self.assertEqual(CronExpression('*/15 * * * *').next_after(start), utc(2026, 3, 14, 10, 15))
+        self.assertEqual(CronExpression('0 3 * * *').next_after(start), utc(2026, 3, 15, 3, 0))
+        self.assertEqual(CronExpression('@monthly').next_after(start), utc(2026, 4, 1, 0, 0))
+        # 2026-03-14 is a Saturday; 0 and 7 are Sunday
+        self.assertEqual(CronExpression('30 9 * * 7').next_after(start), utc(2026, 3, 15, 9, 30))
+        self.assertEqual(CronExpression('0 0 1 1 *').next_after(start), utc(2027, 1, 1, 0, 0))
+
+    def test_next_is_strictly_after(self):
+        self.assertEqual(CronExpression('0 3 * * *').next_after(utc(2026, 3, 14, 3, 0)), utc(2026, 3, 15, 3, 0))
+
+    def test_day_fields_match_either(self):
+        # The 20th or any Monday, like cron
+        expression = CronExpression('0 0 20 * 1')
+        self.assertEqual(expression.next_after(utc(2026, 3, 14, 12, 0)), utc(2026, 3, 16, 0, 0))
+        self.assertEqual(expression.next_after(utc(2026, 3, 17, 12, 0)), utc(2026, 3, 20, 0, 0))
+
+    def test_invalid_expressions(self):
+        for expression in ['* * * *', '60 * * * *', '*/0 * * * *', '5-1 * * * *', 'a * * * *']:
+            with self.assertRaises(CronError, msg=expression):
+                CronExpression(expression)
+        with self.assertRaises(CronError):
+            CronExpression('0 0 30 2 *').next_after(utc(2026, 1, 1))
+
+
+@override_settings(JOBS_RETRY_DELAY_SECONDS=30)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(threads=2, schedule=False)
+
+    def test_enqueued_job_runs_and_records_its_result(self):
+        job = record.enqueue(value='a')
+        self.assertEqual(job.status, Job.QUEUED)
+
+        self.assertEqual(self.worker.work_off(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(calls, ['a'])
+        self.assertEqual((job.status, job.attempts, job.result), (Job.SUCCEEDED, 1, 'a'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.worker.work_off(), 0)
+
+    def test_delayed_and_prioritized_jobs(self):
+        queue.enqueue('tests.record', value='later', delay=60)
+        queue.enqueue('tests.record', value='low')
+        queue.enqueue('tests.record', value='high', priority=5)
+
+        self.worker.work_off()
+
+        self.assertEqual(calls, ['high', 'low'])
+
+    def test_rolled_back_enqueue_never_runs(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                record.enqueue(value='lost')
+                raise RuntimeError
+        self.assertFalse(Job.objects.exists())
+
+    def test_key_coalesces_queued_jobs(self):
+        first = queue.enqueue('tests.record', key='invoices', value=1)
+        second = queue.enqueue('tests.record', key='invoices', value=2)
+        self.assertEqual(first.pk, second.pk)
+
+        self.worker.work_off()
+        # Once the queued job has run, the key can be enqueued again
+        third = queue.enqueue('tests.record', key='invoices', value=3)
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_failing_job_is_retried_with_backoff_then_failed(self):
+        job = flaky.enqueue()
+        before = timezone.now()
+
+        with self.assertLogs('jobs', 'WARNING'):
+            self.worker.work_off()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=30))
+        # Not due yet
+        self.assertEqual(self.worker.work_off(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('jobs', 'WARNING'):
+            self.worker.work_off()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(calls, ['flaky', 'flaky'])
+        self.assertEqual(retry_delay(1), timedelta(seconds=30))
+        self.assertEqual(retry_delay(3), timedelta(seconds=120))
+
+    def test_unknown_job_fails_without_retry(self):
+        job = Job.objects.create(name='tests.removed', max_attempts=3)
+
+        with self.assertLogs('jobs', 'WARNING'):
+            self.worker.work_off()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn('tests.removed', job.last_error)
+        with self.assertRaises(queue.UnknownJob):
+            queue.enqueue('tests.removed')
+
+    def test_job_claimed_once(self):
+        record.enqueue(value='once')
+        other = Worker(threads=2, schedule=False)
+
+        claimed = self.worker.claim(5)
+
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(other.claim(5), [])
+        self.assertEqual(claimed[0].locked_by, self.worker.name)
+
+    @override_settings(JOBS_LOCK_TIMEOUT_SECONDS=60)
+    def test_jobs_of_a_lost_worker_are_requeued(self):
+        job = record.enqueue(value='x')
+        self.worker.claim(1)
+        self.assertEqual(requeue_lost_jobs(), 0)
+
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(requeue_lost_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ''))
+        Worker(schedule=False).work_off()
+        self.assertEqual(calls, ['x'])
+
+    @override_settings(JOBS_LOCK_TIMEOUT_SECONDS=60)
+    def test_lost_jobs_sharing_a_key_are_requeued_once(self):
+        # A keyed job re-enqueued and claimed while its first run was still going
+        first = queue.enqueue('tests.record', key='schedule:tests', value='first')
+        self.worker.claim(1)
+        second = queue.enqueue('tests.record', key='schedule:tests', value='second')
+        self.worker.claim(1)
+        Job.objects.filter(pk__in=[first.pk, second.pk]).update(locked_at=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual(requeue_lost_jobs(), 2)
+
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual((statuses[first.pk], statuses[second.pk]), (Job.FAILED, Job.QUEUED))
+        Worker(schedule=False).work_off()
+        self.assertEqual(calls, ['second'])
+
+    @override_settings(JOBS_KEEP_DAYS=7)
+    def test_purge_finished_jobs(self):
+        old = timezone.now() - timedelta(days=8)
+        Job.objects.create(name='tests.record', status=Job.SUCCEEDED, finished_at=old)
+        Job.objects.create(name='tests.record', status=Job.FAILED, finished_at=old)
+        recent = Job.objects.create(name='tests.record', status=Job.SUCCEEDED, finished_at=timezone.now())
+        queued = record.enqueue()
+
+        self.assertEqual(purge_finished_jobs(), 2)
+        self.assertCountEqual(Job.objects.values_list('pk', flat=True), [recent.pk, queued.pk])
+
+    def test_run_worker_once(self):
+        record.enqueue(value='cli')
+        call_command('run_worker', '--once', '--no-schedule', stdout=open('/dev/null', 'w'))
+        self.assertEqual(calls, ['cli'])
+
+
+class ScheduleTests(TestCase):
+    def test_registered_periodic_jobs_get_schedules(self):
+        Schedule.objects.create(name='tests.retired', cron='@daily', next_run_at=timezone.now())
+
+        sync_schedules()
+
+        names = set(Schedule.objects.values_list('name', flat=True))
+        self.assertIn('staff.tasks.prune_tombstones', names)
+        self.assertIn('jobs.tasks.purge_finished_jobs', names)
+        self.assertNotIn('tests.retired', names)
+
+    def test_due_schedule_is_enqueued_once(self):
+        sync_schedules()
+        now = timezone.now()
+        Schedule.objects.filter(name='staff.tasks.prune_tombstones').update(next_run_at=now - timedelta(days=2))
+
+        enqueued = enqueue_due_schedules(now)
+        self.assertEqual([job.name for job in enqueued], ['staff.tasks.prune_tombstones'])
+        self.assertEqual(enqueue_due_schedules(now), [])
+
+        schedule = Schedule.objects.get(name='staff.tasks.prune_tombstones')
+        self.assertGreater(schedule.next_run_at, now)
+        self.assertEqual(schedule.last_run_at, now)
+
+
+class BuiltInJobTests(ClinicTestCase):
+    def test_expired_sessions_are_purged(self):
+        store = SessionStore()
+        store['user_id'] = str(self.doctor.user.pk)
+        store.set_expiry(-1)
+        store.create()
+
+        queue.get_job('accounts.tasks.purge_expired_sessions')()
+        self.assertFalse(Session.objects.filter(session_key=store.session_key).exists())
+
+    def test_precomputed_reports_are_served(self):
+        cache.clear()
+        queue.get_job('dentalign_admin.tasks.precompute_reports')()
+        expected = reports.build_reports()
+
+        with mock.patch.object(reports, 'build_reports', side_effect=AssertionError('not precomputed')):
+            response = self.client.get('/api/admin/reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
@@ -0,0 +1,232 @@
+"""
+The job worker behind `manage.py run_worker`.
+
+Each pass the worker
+  - enqueues the periodic jobs that came due (jobs/models.Schedule),
+  - returns jobs held by workers that died to the queue,
+  - claims due queued jobs, as many as it has idle threads, and runs them.
+
+Claiming is one UPDATE guarded on status='queued', so workers sharing a
+database never run the same job twice. On PostgreSQL the candidates are
+read with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers do not
+wait on each other's rows.
+
+A job that raises is retried after JOBS_RETRY_DELAY_SECONDS, doubled on
+every further attempt, until it has used its max_attempts; then it is
+marked failed with the traceback in last_error. A job still running
+JOBS_LOCK_TIMEOUT_SECONDS after it was claimed is presumed lost with its
+worker and counts as a failed attempt.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job, Schedule
+from .queue import enqueue, get_job, registry, UnknownJob
+
+logger = logging.getLogger('jobs')
+
+# Longest wait between retries of a failing job
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def retry_delay(attempts):
+    """Backoff before the attempt after `attempts` failed ones"""
+    delay = timedelta(seconds=settings.JOBS_RETRY_DELAY_SECONDS * 2 ** (attempts - 1))
+    return min(delay, MAX_RETRY_DELAY)
+
+
+def _jsonable(result):
+    if result is None or isinstance(result, (bool, int, float, str, list, dict)):
+        return result
+    return str(result)
+
+
+def sync_schedules(now=None):
+    """Create, update and remove Schedule rows to match the registered periodic jobs"""
+    now = now or timezone.now()
+    periodic = {name: registered for name, registered in registry.items() if registered.cron}
+    Schedule.objects.exclude(name__in=periodic).delete()
+    existing = {schedule.name: schedule for schedule in Schedule.objects.filter(name__in=periodic)}
+    for name, registered in periodic.items():
+        cron = str(registered.cron)
+        schedule = existing.get(name)
+        if schedule is None:
+            Schedule.objects.get_or_create(
+                name=name, defaults={'cron': cron, 'next_run_at': registered.cron.next_after(now)},
+            )
+        elif schedule.cron != cron:
+            Schedule.objects.filter(pk=schedule.pk).update(cron=cron, next_run_at=registered.cron.next_after(now))
+
+
+def enqueue_due_schedules(now=None):
+    """Enqueue every periodic job whose time has come; returns the Job rows"""
+    now = now or timezone.now()
+    enqueued = []
+    for schedule in Schedule.objects.filter(next_run_at__lte=now):
+        registered = registry.get(schedule.name)
+        if registered is None or not registered.cron:
+            continue
+        with transaction.atomic():
+            # Only the worker that moves next_run_at on enqueues the run
+            claimed = Schedule.objects.filter(pk=schedule.pk, next_run_at=schedule.next_run_at).update(
+                next_run_at=registered.cron.next_after(now), last_run_at=now,
+            )
+            if claimed:
+                # Keyed by name: runs missed while no worker was up collapse into one
+                enqueued.append(enqueue(schedule.name, key=f'schedule:{schedule.name}'))
+    return enqueued
+
+
+def requeue_lost_jobs(now=None):
+    """Return jobs whose worker stopped answering to the queue, or fail them; returns how many"""
+    now = now or timezone.now()
+    lost = Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT_SECONDS),
+    )
+    error = 'Worker lost while running the job.'
+    failed_fields = dict(status=Job.FAILED, last_error=error, finished_at=now, locked_by='', locked_at=None)
+    queued_fields = dict(status=Job.QUEUED, last_error=error, run_at=now, locked_by='', locked_at=None)
+    # A job whose key was enqueued again meanwhile is covered by the queued one
+    superseded = Q(attempts__gte=F('max_attempts')) | Q(
+        key__in=Job.objects.filter(status=Job.QUEUED, key__isnull=False).values('key'),
+    )
+    failed = lost.filter(superseded).update(**failed_fields)
+    requeued = lost.filter(key__isnull=True).update(**queued_fields)
+
+    # Only one job per key may be queued, and several lost ones can share a
+    # key (re-enqueued and claimed while an earlier run was still going):
+    # requeue the newest of each, fail the rest
+    for pk in lost.order_by('-pk').values_list('pk', flat=True):
+        try:
+            with transaction.atomic():
+                requeued += Job.objects.filter(pk=pk, status=Job.RUNNING).update(**queued_fields)
+        except IntegrityError:
+            failed += Job.objects.filter(pk=pk, status=Job.RUNNING).update(**failed_fields)
+    return failed + requeued
+
+
+class Worker:
+    def __init__(self, threads=None, poll_interval=None, schedule=True, name=None):
+        self.threads = threads or settings.JOBS_WORKER_THREADS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOBS_POLL_SECONDS
+        self.schedule = schedule
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.stopping = threading.Event()
+
+    def claim(self, limit):
+        """Mark up to `limit` due jobs as running for this worker and return them"""
+        if limit < 1:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            candidates = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'pk')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates.values_list('pk', flat=True)[:limit])
+            if not ids:
+                return []
+            # Another worker may have claimed some of them since the read
+            Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+                status=Job.RUNNING, locked_by=self.name, locked_at=now, attempts=F('attempts') + 1,
+            )
+        return list(
+            Job.objects.filter(pk__in=ids, status=Job.RUNNING, locked_by=self.name, locked_at=now)
+            .order_by('-priority', 'run_at', 'pk')
+        )
+
+    def execute(self, job):
+        """Run a claimed job and record the outcome"""
+        close_old_connections()
+        try:
+            result = get_job(job.name).func(**job.kwargs)
+        except Exception as exc:
+            self._failed(job, exc)
+        else:
+            self._finished(job, Job.SUCCEEDED, result=_jsonable(result), last_error='')
+        finally:
+            close_old_connections()
+
+    def _finished(self, job, status, **fields):
+        Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=self.name).update(
+            status=status, finished_at=timezone.now(), locked_by='', locked_at=None, **fields,
+        )
+
+    def _failed(self, job, exc):
+        error = ''.join(traceback.format_exception(exc))
+        retry = job.attempts < job.max_attempts and not isinstance(exc, UnknownJob)
+        logger.warning(
+            'Job %s (%s) failed on attempt %d of %d%s: %s', job.pk, job.name, job.attempts,
+            job.max_attempts, ', retrying' if retry else '', exc,
+        )
+        if retry:
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=self.name).update(
+                        status=Job.QUEUED, run_at=timezone.now() + retry_delay(job.attempts),
+                        last_error=error, locked_by='', locked_at=None,
+                    )
+                return
+            except IntegrityError:
+                # Its key was enqueued again while it ran; the queued job does the work
+                pass
+        self._finished(job, Job.FAILED, last_error=error)
+
+    def maintain(self):
+        if self.schedule:
+            enqueue_due_schedules()
+        requeue_lost_jobs()
+
+    def work_off(self):
+        """Run due jobs in this thread until none is left; returns how many ran"""
+        if self.schedule:
+            sync_schedules()
+        self.maintain()
+        ran = 0
+        while True:
+            jobs = self.claim(self.threads)
+            if not jobs:
+                return ran
+            for job in jobs:
+                self.execute(job)
+            ran += len(jobs)
+
+    def run(self):
+        """Poll and run jobs on a thread pool until stop() is called"""
+        if self.schedule:
+            sync_schedules()
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='job') as pool:
+            while not self.stopping.is_set():
+                try:
+                    self.maintain()
+                except Exception:
+                    # Must not keep the worker from running the queue
+                    logger.exception('Job worker %s could not maintain the queue', self.name)
+                    close_old_connections()
+                try:
+                    jobs = self.claim(self.threads - len(running))
+                except Exception:
+                    # e.g. the database restarting; keep polling
+                    logger.exception('Job worker %s could not poll the queue', self.name)
+                    close_old_connections()
+                    jobs = []
+                running.update(pool.submit(self.execute, job) for job in jobs)
+                if running:
+                    _, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.poll_interval)
+            wait(running)
+
+    def stop(self):
+        self.stopping.set()
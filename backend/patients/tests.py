@@ -1,3 +1,80 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.utils import timezone
+
+from backend.testing import ClinicTestCase
+from staff.models import ChronicCondition, Allergy, PastSurgery
+
+
+class PatientEndpointQueryBudgetTests(ClinicTestCase):
+    """Every patient route stays within its query budget on the seeded clinic"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.patient.user
+        cls.condition = ChronicCondition.objects.filter(patient=cls.patient).first()
+        cls.allergy = Allergy.objects.filter(patient=cls.patient).first()
+        cls.surgery = PastSurgery.objects.filter(patient=cls.patient).first()
+
+    def test_dashboard_stats(self):
+        self.assertQueryBudget(10, 'GET', '/api/patients/dashboard/stats/', user=self.user)
+
+    def test_profile(self):
+        self.assertQueryBudget(3, 'GET', '/api/patients/profile/', user=self.user)
+
+    def test_profile_update(self):
+        self.assertQueryBudget(6, 'PUT', '/api/patients/profile/', {'phone': '555-0199'}, user=self.user)
+
+    def test_available_services(self):
+        self.assertQueryBudget(1, 'GET', '/api/patients/services/')
+
+    def test_available_doctors(self):
+        self.assertQueryBudget(3, 'GET', '/api/patients/doctors/', user=self.user)
+
+    def test_available_slots(self):
+        day = timezone.localdate() + timedelta(days=2)
+        self.assertQueryBudget(
+            4, 'GET', '/api/patients/slots/', {'doctor_id': str(self.doctor.staff_id), 'date': str(day)}, user=self.user
+        )
+
+    def test_appointments(self):
+        self.assertQueryBudget(5, 'GET', '/api/patients/appointments/', user=self.user)
+
+    def test_book_appointment(self):
+        day = timezone.localdate() + timedelta(days=60)
+        self.assertQueryBudget(
+            10, 'POST', '/api/patients/appointments/book/',
+            {
+                'doctor_id': str(self.doctor.staff_id), 'date': str(day), 'time': '10:30',
+                'service_ids': [str(service.service_id) for service in self.clinic['services'][:3]],
+            },
+            user=self.user, status_code=201,
+        )
+
+    def test_invoices(self):
+        self.assertQueryBudget(10, 'GET', '/api/patients/invoices/', user=self.user)
+
+    def test_prescriptions(self):
+        self.assertQueryBudget(8, 'GET', '/api/patients/prescriptions/', user=self.user)
+
+    def test_medical_history(self):
+        self.assertQueryBudget(14, 'GET', '/api/patients/medical-history/', user=self.user)
+
+    def test_chronic_conditions(self):
+        self.assertQueryBudget(5, 'GET', '/api/patients/chronic-conditions/', user=self.user)
+        self.assertQueryBudget(4, 'GET', f'/api/patients/chronic-conditions/{self.condition.condition_id}/', user=self.user)
+
+    def test_allergies(self):
+        self.assertQueryBudget(5, 'GET', '/api/patients/allergies/', user=self.user)
+        self.assertQueryBudget(4, 'GET', f'/api/patients/allergies/{self.allergy.allergy_id}/', user=self.user)
+
+    def test_past_surgeries(self):
+        self.assertQueryBudget(5, 'GET', '/api/patients/past-surgeries/', user=self.user)
+        self.assertQueryBudget(4, 'GET', f'/api/patients/past-surgeries/{self.surgery.surgery_id}/', user=self.user)
+
+    def test_sync(self):
+        self.assertQueryBudget(6, 'GET', '/api/patients/sync/', user=self.user)
+
+    def test_test_endpoint(self):
+        self.assertQueryBudget(2, 'GET', '/api/patients/test/', user=self.user)
@@ -26,5 +26,6 @@ urlpatterns = [
     path('allergies/<uuid:allergy_id>/', views.AllergyDetailView.as_view(), name='allergy_detail'),
     path('past-surgeries/', views.PastSurgeryListView.as_view(), name='past_surgery_list'),
     path('past-surgeries/<uuid:surgery_id>/', views.PastSurgeryDetailView.as_view(), name='past_surgery_detail'),
+    path('sync/', views.sync_changes, name='sync_changes'),
     path('test/', views.test_endpoint, name='test_endpoint'),
 ]
\ No newline at end of file
@@ -10,7 +10,17 @@ import json
 
 from staff.serializers import ChronicConditionSerializer, AllergySerializer, PastSurgerySerializer
 
-from staff.models import Patient, Appointment, Treatment, Invoice, MedicalRecord, Staff, Service, Diagnosis, ChronicCondition, Allergy, PastSurgery
+from staff import summaries, sync
+from staff.filters import on_date, date_range
+from backend.concurrency import run_concurrently
+from backend.conditional import ConditionalGetMixin, conditional_get
+from backend.db_routers import use_replica
+from backend.response_cache import cache_response
+from accounts.models import User
+from staff.models import (
+    Patient, PatientSummary, Appointment, Treatment, Invoice, MedicalRecord, Staff, Service, Diagnosis, ChronicCondition,
+    Allergy, PastSurgery,
+)
 
 
 class IsPatientOnly:
@@ -21,12 +31,14 @@ class IsPatientOnly:
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@cache_response([Patient, PatientSummary, Staff, User, Appointment, MedicalRecord, Treatment, Invoice, Service])
 def dashboard_stats(request):
     """Get patient dashboard statistics and data"""
     try:
         # Try to get the patient profile
         try:
-            patient = Patient.objects.get(user=request.user)
+            patient = Patient.objects.select_related('summary').get(user=request.user)
         except Patient.DoesNotExist:
             # For now, return mock data if no patient profile exists
             # In production, we should create the patient profile properly
@@ -66,58 +78,29 @@ def dashboard_stats(request):
         
         # If patient exists, get real data
         
-        # Get upcoming appointments
         today = timezone.now().date()
-        upcoming_appointments = Appointment.objects.filter(
-            patient=patient,
-            start_time__date__gte=today,
-            status__in=['scheduled', 'confirmed']
-        ).order_by('start_time')[:3]
-        
-        # Get recent appointments for history
-        recent_appointments = Appointment.objects.filter(
-            patient=patient,
-            start_time__date__lt=today
-        ).order_by('-start_time')[:5]
-        
-        # Get pending invoices
+        # Counts and balance come from the patient summary (staff/summaries.py)
+        summary = getattr(patient, 'summary', None) or PatientSummary(patient=patient)
         pending_invoices = Invoice.objects.filter(
             patient=patient,
-            status__in=['unpaid', 'pending', 'overdue']
-        )
-        
-        # Get recent treatments
-        recent_treatments = Treatment.objects.filter(
-            appointment__patient=patient
-        ).select_related('appointment__staff__user', 'appointment__medical_record', 'service').order_by('-appointment__start_time')[:3]
-        
-        # Get medical records count
-        medical_records_count = MedicalRecord.objects.filter(patient=patient).count()
-        
-        # Format upcoming appointments
-        next_appointment_data = None
-        if upcoming_appointments:
-            next_apt = upcoming_appointments[0]
-            next_appointment_data = {
-                'appointment_id': str(next_apt.appointment_id),
-                'doctor_name': f"{next_apt.staff.first_name or ''} {next_apt.staff.last_name or ''}".strip() or "Staff Member",
-                'date': next_apt.start_time.strftime('%Y-%m-%d'),
-                'time': next_apt.start_time.strftime('%I:%M %p'),
-                'reason': next_apt.reason or 'General Consultation',
-                'status': next_apt.status
-            }
-        
-        # Format recent treatments for prescriptions/latest treatment
-        latest_treatment = None
-        if recent_treatments:
-            treatment = recent_treatments[0]
+            status__in=summaries.OPEN_INVOICE_STATUSES
+        ).order_by('due_date')
+
+        def latest_treatment():
+            # Most recent treatment, for prescriptions/latest treatment
+            treatment = Treatment.objects.filter(
+                appointment__patient=patient
+            ).select_related('appointment__staff__user', 'appointment__medical_record', 'service').order_by('-appointment__start_time').first()
+            if treatment is None:
+                return None
+
             # Get doctor name from appointment staff
             doctor_name = 'N/A'
             if treatment.appointment and treatment.appointment.staff:
                 doctor_name = f"Dr. {treatment.appointment.staff.first_name or ''} {treatment.appointment.staff.last_name or ''}".strip()
                 if not doctor_name or doctor_name == 'Dr.':
                     doctor_name = f"Dr. {treatment.appointment.staff.user.full_name}" if treatment.appointment.staff.user else 'N/A'
-            
+
             # Get notes from medical record if available
             notes = 'Treatment completed'
             if treatment.appointment and treatment.appointment.medical_record:
@@ -126,15 +109,15 @@ def dashboard_stats(request):
                     notes = medical_record.chief_complaint
                 elif medical_record.examination_notes:
                     notes = medical_record.examination_notes
-            
+
             # Get total cost from invoice instead of individual treatment cost
             total_cost = 0
             if treatment.appointment:
                 invoice = Invoice.objects.filter(appointment=treatment.appointment).first()
                 if invoice:
                     total_cost = float(invoice.total_amount)
-            
-            latest_treatment = {
+
+            return {
                 'treatment_id': str(treatment.treatment_id),
                 'treatment_type': treatment.service.name if treatment.service else 'Unknown Treatment',
                 'description': treatment.description or f'{treatment.service.name if treatment.service else "Treatment"} service',
@@ -143,7 +126,38 @@ def dashboard_stats(request):
                 'notes': notes,
                 'cost': total_cost
             }
-        
+
+        # The queries are independent; run them concurrently
+        results = run_concurrently({
+            # Upcoming appointments
+            'upcoming': lambda: list(Appointment.objects.filter(
+                date_range('start_time', start=today),
+                patient=patient,
+                status__in=['scheduled', 'confirmed']
+            ).select_related('staff').order_by('start_time')[:3]),
+            # Recent appointments for history
+            'recent': lambda: list(Appointment.objects.filter(
+                date_range('start_time', end=today - timedelta(days=1)),
+                patient=patient
+            ).order_by('-start_time')[:5]),
+            'pending_invoices': lambda: list(pending_invoices[:3]),
+            'latest_treatment': latest_treatment,
+        })
+        upcoming_appointments = results['upcoming']
+
+        # Format upcoming appointments
+        next_appointment_data = None
+        if upcoming_appointments:
+            next_apt = upcoming_appointments[0]
+            next_appointment_data = {
+                'appointment_id': str(next_apt.appointment_id),
+                'doctor_name': f"{next_apt.staff.first_name or ''} {next_apt.staff.last_name or ''}".strip() or "Staff Member",
+                'date': next_apt.start_time.strftime('%Y-%m-%d'),
+                'time': next_apt.start_time.strftime('%I:%M %p'),
+                'reason': next_apt.reason or 'General Consultation',
+                'status': next_apt.status
+            }
+
         dashboard_data = {
             'patient_info': {
                 'name': f"{patient.first_name} {patient.last_name}",
@@ -152,20 +166,20 @@ def dashboard_stats(request):
             },
             'next_appointment': next_appointment_data,
             'pending_bills': {
-                'count': pending_invoices.count(),
-                'total_amount': float(pending_invoices.aggregate(total=Sum('total_amount'))['total'] or 0),
+                'count': summary.open_invoice_count,
+                'total_amount': float(summary.outstanding_balance),
                 'invoices': [
                     {
                         'invoice_id': str(inv.invoice_id),
                         'amount': float(inv.total_amount),
                         'due_date': inv.due_date.strftime('%Y-%m-%d') if inv.due_date else None,
                         'status': inv.status
-                    } for inv in pending_invoices[:3]
+                    } for inv in results['pending_invoices']
                 ]
             },
-            'latest_treatment': latest_treatment,
-            'medical_records_count': medical_records_count,
-            'upcoming_appointments_count': upcoming_appointments.count(),
+            'latest_treatment': results['latest_treatment'],
+            'medical_records_count': summary.record_count,
+            'upcoming_appointments_count': len(upcoming_appointments),
             'recent_appointments': [
                 {
                     'appointment_id': str(apt.appointment_id),
@@ -173,10 +187,10 @@ def dashboard_stats(request):
                     'time': apt.start_time.strftime('%I:%M %p') if apt.start_time else 'Time TBD',
                     'status': apt.status,
                     'reason': apt.reason or 'General Consultation'
-                } for apt in recent_appointments
+                } for apt in results['recent']
             ]
         }
-        
+
         return Response(dashboard_data)
         
     except Patient.DoesNotExist:
@@ -303,6 +317,7 @@ STAFF_SERVICES = {
 
 @api_view(['GET'])
 @permission_classes([])
+@cache_response([Service])
 def available_services(request):
     """Get list of available services"""
     services = Service.objects.filter(is_active=True).order_by('name')
@@ -321,6 +336,7 @@ def available_services(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated]) 
+@cache_response([Staff, User])
 def available_doctors(request):
     """Get list of available doctors with their services"""
     try:
@@ -363,6 +379,7 @@ def available_doctors(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
 def available_slots(request):
     """Get available time slots for a specific doctor and date"""
     try:
@@ -402,8 +419,8 @@ def available_slots(request):
         
         # Get existing appointments for this doctor and date
         existing_appointments = Appointment.objects.filter(
+            on_date('start_time', appointment_date),
             staff=staff,
-            start_time__date=appointment_date,
             status__in=['scheduled', 'confirmed', 'in_progress']
         )
         
@@ -429,6 +446,9 @@ def available_slots(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@conditional_get(lambda request: Appointment.objects.filter(patient__user=request.user))
+@cache_response([Patient, Staff, Appointment])
 def patient_appointments(request):
     """Get patient's appointments"""
     try:
@@ -622,6 +642,16 @@ def book_appointment(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """Changes feed of the patient's own appointments, invoices, records and treatments (see staff/sync.py)"""
+    try:
+        return Response(sync.changes_since(request.query_params.get('since'), patient_user=request.user))
+    except sync.InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET'])
 def test_endpoint(request):
     """Simple test endpoint to verify URL routing"""
@@ -630,6 +660,9 @@ def test_endpoint(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@conditional_get(lambda request: Invoice.objects.filter(patient__user=request.user))
+@cache_response([Patient, Staff, Appointment, Treatment, Invoice, Service])
 def patient_bills(request):
     """
     API endpoint for patient bills - returns all invoices for the logged-in patient
@@ -727,6 +760,9 @@ def patient_bills(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@conditional_get(lambda request: MedicalRecord.objects.filter(patient__user=request.user))
+@cache_response([Patient, Staff, MedicalRecord, Diagnosis])
 def patient_prescriptions(request):
     """Get patient's prescriptions/medical history"""
     try:
@@ -789,6 +825,9 @@ def patient_prescriptions(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@conditional_get(lambda request: MedicalRecord.objects.filter(patient__user=request.user))
+@cache_response([Patient, Staff, User, Appointment, MedicalRecord, Treatment, Service, ChronicCondition, Allergy, PastSurgery])
 def patient_medical_history(request):
     """Get patient's complete medical history including visits, conditions, and radiology"""
     try:
@@ -910,17 +949,13 @@ def patient_medical_history(request):
         )
 
 
-class ChronicConditionListView(generics.ListCreateAPIView):
+class ChronicConditionListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create chronic conditions for the current patient"""
     serializer_class = ChronicConditionSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            return ChronicCondition.objects.filter(patient=patient).order_by('condition_name')
-        except Patient.DoesNotExist:
-            return ChronicCondition.objects.none()
+        return ChronicCondition.objects.filter(patient__user=self.request.user).order_by('condition_name')
 
     def perform_create(self, serializer):
         try:
@@ -930,31 +965,23 @@ class ChronicConditionListView(generics.ListCreateAPIView):
             raise serializers.ValidationError("Patient profile not found")
 
 
-class ChronicConditionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ChronicConditionDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete chronic condition for the current patient"""
     serializer_class = ChronicConditionSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'condition_id'
 
     def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            return ChronicCondition.objects.filter(patient=patient)
-        except Patient.DoesNotExist:
-            return ChronicCondition.objects.none()
+        return ChronicCondition.objects.filter(patient__user=self.request.user)
 
 
-class AllergyListView(generics.ListCreateAPIView):
+class AllergyListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create allergies for the current patient"""
     serializer_class = AllergySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            return Allergy.objects.filter(patient=patient).order_by('allergen_name')
-        except Patient.DoesNotExist:
-            return Allergy.objects.none()
+        return Allergy.objects.filter(patient__user=self.request.user).order_by('allergen_name')
 
     def perform_create(self, serializer):
         try:
@@ -964,31 +991,23 @@ class AllergyListView(generics.ListCreateAPIView):
             raise serializers.ValidationError("Patient profile not found")
 
 
-class AllergyDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AllergyDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete allergy for the current patient"""
     serializer_class = AllergySerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'allergy_id'
 
     def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            return Allergy.objects.filter(patient=patient)
-        except Patient.DoesNotExist:
-            return Allergy.objects.none()
+        return Allergy.objects.filter(patient__user=self.request.user)
 
 
-class PastSurgeryListView(generics.ListCreateAPIView):
+class PastSurgeryListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create past surgeries for the current patient"""
     serializer_class = PastSurgerySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            return PastSurgery.objects.filter(patient=patient).order_by('-surgery_date')
-        except Patient.DoesNotExist:
-            return PastSurgery.objects.none()
+        return PastSurgery.objects.filter(patient__user=self.request.user).order_by('-surgery_date')
 
     def perform_create(self, serializer):
         try:
@@ -998,15 +1017,11 @@ class PastSurgeryListView(generics.ListCreateAPIView):
             raise serializers.ValidationError("Patient profile not found")
 
 
-class PastSurgeryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PastSurgeryDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete past surgery for the current patient"""
     serializer_class = PastSurgerySerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'surgery_id'
 
     def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            return PastSurgery.objects.filter(patient=patient)
-        except Patient.DoesNotExist:
-            return PastSurgery.objects.none()
+        return PastSurgery.objects.filter(patient__user=self.request.user)
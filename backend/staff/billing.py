@@ -0,0 +1,118 @@
+"""
+Invoice totals maintained from treatments.
+
+Treatment changes mark their appointment dirty (see staff/signals.py).
+The first mark inside a transaction schedules a single flush with
+transaction.on_commit; the flush recomputes every dirty appointment's
+invoice in one UPDATE, summing Coalesce(actual_cost, service price) in
+the database. Outside a transaction the flush runs immediately.
+
+Open invoices past their due date are moved to 'overdue' by
+sweep_overdue_invoices(), run hourly by the job worker, so overdue
+filters and counts are lookups on the (status, due_date) index.
+"""
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from backend.response_cache import bump_model_versions
+
+from . import summaries
+
+
+def treatment_total(appointment_ref):
+    """Subquery: the billed total of the treatments of `appointment_ref`"""
+    from .models import Treatment
+
+    money = DecimalField(max_digits=10, decimal_places=2)
+    totals = Treatment.objects.filter(
+        appointment_id=appointment_ref
+    ).values('appointment_id').annotate(
+        total=Sum(Coalesce('actual_cost', 'service__price'), output_field=money)
+    ).values('total')[:1]
+    return Coalesce(Subquery(totals, output_field=money), Value(Decimal('0')), output_field=money)
+
+
+def recalculate_invoice_totals(appointment_ids, using=DEFAULT_DB_ALIAS):
+    """Recompute total_amount for the invoices of the given appointments in one UPDATE"""
+    from .models import Invoice
+
+    appointment_ids = list(appointment_ids)
+    if not appointment_ids:
+        return 0
+    invoices = Invoice.objects.using(using).filter(appointment_id__in=appointment_ids)
+    updated = invoices.update(
+        total_amount=treatment_total(OuterRef('appointment_id')),
+        updated_at=timezone.now(),
+    )
+    # update() sends no post_save
+    bump_model_versions(Invoice)
+    # Balances changed with the totals
+    summaries.refresh_patient_summaries(invoices.values('patient_id'), using=using)
+    return updated
+
+
+class _RecalculationBatch:
+    """Appointments whose invoices are recalculated when the transaction commits"""
+
+    def __init__(self, using):
+        self.using = using
+        self.appointment_ids = set()
+
+    def __call__(self):
+        recalculate_invoice_totals(self.appointment_ids, using=self.using)
+
+
+def mark_invoice_dirty(appointment_id, using=DEFAULT_DB_ALIAS):
+    """Schedule recalculation of the invoice of `appointment_id` at commit"""
+    if appointment_id is None:
+        return
+    connection = transaction.get_connection(using)
+    batch = getattr(connection, 'invoice_recalculation_batch', None)
+
+    # A batch is reusable only while its callback is still pending; a rollback
+    # discards the callback and a commit runs it.
+    pending = batch is not None and any(
+        callback is batch for _, callback, _ in connection.run_on_commit
+    )
+    if not pending:
+        batch = _RecalculationBatch(using)
+        connection.invoice_recalculation_batch = batch
+        batch.appointment_ids.add(appointment_id)
+        transaction.on_commit(batch, using=using)
+    else:
+        batch.appointment_ids.add(appointment_id)
+
+
+def sweep_overdue_invoices(today=None):
+    """
+    Mark unpaid open invoices due before `today` overdue, and return overdue ones
+    whose due date was moved to today or later to the open status they had,
+    in two UPDATEs. Returns (marked, reopened).
+    """
+    from .models import Invoice
+
+    today = today or timezone.localdate()
+    now = timezone.now()
+    marked = Invoice.objects.filter(
+        status__in=Invoice.OPEN_STATUSES, due_date__lt=today, paid_amount__lt=F('total_amount'),
+    ).update(
+        status=Invoice.OVERDUE, status_before_overdue=F('status'), updated_at=now,
+    )
+    reopened = Invoice.objects.filter(status=Invoice.OVERDUE, due_date__gte=today).update(
+        status=Case(
+            When(status_before_overdue__isnull=False, then=F('status_before_overdue')),
+            # Marked overdue before the previous status was kept
+            When(Q(paid_amount__gt=0), then=Value('partially_paid')),
+            default=Value('pending'),
+        ),
+        status_before_overdue=None,
+        updated_at=now,
+    )
+    if marked or reopened:
+        # update() sends no post_save
+        bump_model_versions(Invoice)
+    return marked, reopened
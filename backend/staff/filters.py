@@ -0,0 +1,32 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+# Date filters for datetime columns.
+#
+# Lookups such as `start_time__date=day` wrap the column in a cast, which
+# prevents the database from using an index on it. These helpers express
+# the same calendar-day filters as half-open [start, end) ranges on the raw
+# column, evaluated in the clinic time zone (the current Django time zone),
+# so the composite indexes on appointments can be used.
+
+def start_of_day(day):
+    """Return the aware datetime at which `day` starts in the clinic time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def date_range(field, start=None, end=None):
+    """Q for `field` falling on any calendar day from `start` to `end`, both inclusive"""
+    query = Q()
+    if start is not None:
+        query &= Q(**{f'{field}__gte': start_of_day(start)})
+    if end is not None:
+        query &= Q(**{f'{field}__lt': start_of_day(end + timedelta(days=1))})
+    return query
+
+
+def on_date(field, day):
+    """Q for `field` falling on the calendar day `day`"""
+    return date_range(field, day, day)
@@ -0,0 +1,122 @@
+"""
+Load-test the API with a mix of portal, staff and admin scenarios.
+
+    python manage.py seed_clinic --patients 5000 --years 2
+    python manage.py benchmark --concurrency 8 --duration 60 --output bench/$(git rev-parse --short HEAD).json
+    python manage.py benchmark --transport wsgi --compare bench/previous.json
+
+See backend/benchmark.py for the scenarios. Run with DEBUG=False for
+numbers close to production; DEBUG keeps every query in memory.
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import benchmark
+from staff.management.commands.seed_clinic import PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API with concurrent portal, staff and admin scenarios and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--transport', choices=['client', 'wsgi'], default='client',
+            help='client: in-process test client; wsgi: a threaded WSGI server on 127.0.0.1',
+        )
+        parser.add_argument('--url', help='Benchmark an already running server at this base URL instead')
+        parser.add_argument('--concurrency', type=int, default=4, help='Virtual users')
+        parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+        parser.add_argument('--warmup', type=float, default=5, help='Seconds run before measuring')
+        parser.add_argument('--mix', default='portal=6,staff=3,admin=1', help='Relative weight of each role')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--password', default=PASSWORD, help='Password of the patients used by the login scenario')
+        parser.add_argument('--read-only', action='store_true', help='Skip the booking request')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='A previous JSON report to compare against')
+
+    def handle(self, *args, **options):
+        try:
+            mix = benchmark.parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if settings.DEBUG:
+            self.stdout.write(self.style.WARNING('DEBUG is on; timings include query logging overhead'))
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        run_options = {
+            'mix': mix,
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+            'password': options['password'],
+            'writes': not options['read_only'],
+        }
+        try:
+            if options['url']:
+                report = benchmark.run(benchmark.HTTPTransport(options['url']), **run_options)
+            elif options['transport'] == 'wsgi':
+                with benchmark.LocalServer() as server:
+                    report = benchmark.run(benchmark.HTTPTransport(server.url), **run_options)
+            else:
+                report = benchmark.run(benchmark.ClientTransport(), **run_options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if report['meta']['skipped_roles']:
+            self.stdout.write(self.style.WARNING(
+                f'No users for: {", ".join(report["meta"]["skipped_roles"])}'
+            ))
+        self.print_report(report, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def print_report(self, report, baseline=None):
+        previous = baseline.get('endpoints', {}) if baseline else {}
+        header = f'{"endpoint":<22} {"reqs":>6} {"err":>4} {"rps":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>7}'
+        if baseline:
+            header += f' {"p95 vs base":>12}'
+        self.stdout.write(header)
+
+        rows = list(report['endpoints'].items()) + [('TOTAL', report['summary'])]
+        for name, stats in rows:
+            latency = stats['latency_ms']
+            queries = stats['queries']['mean']
+            line = (
+                f'{name:<22} {stats["requests"]:>6} {stats["errors"]:>4} {stats["throughput_rps"] or 0:>8.1f} '
+                f'{latency["p50"] or 0:>8.1f} {latency["p95"] or 0:>8.1f} {latency["p99"] or 0:>8.1f} '
+                f'{queries if queries is not None else "-":>7}'
+            )
+            if baseline:
+                base = baseline.get('summary') if name == 'TOTAL' else previous.get(name)
+                line += f' {self.change(base["latency_ms"]["p95"] if base else None, latency["p95"]):>12}'
+            self.stdout.write(line)
+
+        summary = report['summary']
+        self.stdout.write(
+            f'{summary["requests"]} requests in {report["meta"]["duration_s"]}s '
+            f'({summary["throughput_rps"]} req/s, {summary["errors"]} errors) '
+            f'at commit {report["meta"]["commit"] or "unknown"}'
+        )
+        if baseline:
+            self.stdout.write(
+                f'Baseline {baseline["meta"].get("commit") or "unknown"}: '
+                f'{baseline["summary"]["throughput_rps"]} req/s, '
+                f'p95 {baseline["summary"]["latency_ms"]["p95"]} ms'
+            )
+
+    def change(self, before, after):
+        if not before or after is None:
+            return '-'
+        return f'{(after - before) / before * 100:+.1f}%'
@@ -0,0 +1,19 @@
+"""
+Delete tombstones of the changes feed older than SYNC_TOMBSTONE_DAYS.
+
+    python manage.py prune_tombstones
+
+The job worker already runs it daily (staff.tasks.prune_tombstones). Clients whose cursor is older than the retention get a full
+resync (`reset: true`), so pruning never loses a delete.
+"""
+from django.core.management.base import BaseCommand
+
+from staff import sync
+
+
+class Command(BaseCommand):
+    help = 'Delete changes-feed tombstones older than SYNC_TOMBSTONE_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s)'))
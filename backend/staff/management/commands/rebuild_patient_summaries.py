@@ -0,0 +1,19 @@
+"""
+Recompute every row of the patient_summary table.
+
+    python manage.py rebuild_patient_summaries
+
+Signals keep the summaries current (staff/summaries.py); run this after
+loading data that bypassed them, or to repair drift.
+"""
+from django.core.management.base import BaseCommand
+
+from staff import summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the patient_summary table from appointments, invoices, allergies and records'
+
+    def handle(self, *args, **options):
+        rebuilt = summaries.rebuild_patient_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} patient summar{"y" if rebuilt == 1 else "ies"}'))
@@ -0,0 +1,350 @@
+"""
+Generate a synthetic clinic for local profiling.
+
+    python manage.py seed_clinic --doctors 40 --patients 200000 --years 6 --per-day 20 --workers 8
+
+creates an admin, staff, a service catalog, patients with portal accounts, and
+`years` of appointments (plus a month ahead) with their treatments,
+medical records, diagnoses, invoices and payments. Output is
+deterministic for a given --seed.
+
+Rows are inserted with chunked bulk_create. Appointments are generated per
+doctor-month work unit; with --workers > 1 the units are spread over a
+process pool, each worker using its own database connection. SQLite
+allows a single writer, so it always runs in-process.
+
+bulk_create sends no signals: invoice totals are written directly, and the
+patient search index and summaries are rebuilt and cached responses
+invalidated at the end.
+"""
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta, time as day_time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from accounts.models import Role, User
+from backend.response_cache import bump_model_versions
+from staff import search, summaries
+from staff.models import (
+    Appointment, Diagnosis, Invoice, MedicalRecord, Patient, Payment, Service, Staff, Treatment,
+)
+
+EMAIL_DOMAIN = 'seed.dentalign.test'
+PASSWORD = 'password123'
+
+SERVICES = [
+    ('Consultation', 'Initial patient consultation and examination', '400.00'),
+    ('Dental Cleaning', 'Professional dental cleaning and scaling', '2500.00'),
+    ('Cavity Filling', 'Tooth cavity filling procedure', '800.00'),
+    ('Root Canal', 'Root canal treatment procedure', '5000.00'),
+    ('Teeth Whitening', 'Professional teeth whitening treatment', '3000.00'),
+    ('Dental Extraction', 'Tooth extraction procedure', '1200.00'),
+    ('Dental Crown', 'Dental crown installation', '4000.00'),
+    ('Orthodontic Consultation', 'Consultation for orthodontic treatment', '500.00'),
+]
+
+FIRST_NAMES = [
+    'Ahmed', 'Mohamed', 'Omar', 'Youssef', 'Karim', 'Hassan', 'Mahmoud', 'Ali', 'Mostafa', 'Tarek',
+    'Sara', 'Nour', 'Mariam', 'Salma', 'Hana', 'Laila', 'Yasmin', 'Farida', 'Malak', 'Aya',
+]
+LAST_NAMES = [
+    'Hassan', 'Ibrahim', 'Mahmoud', 'Mostafa', 'Abdelrahman', 'Saleh', 'Fathy', 'Kamal', 'Nabil', 'Soliman',
+    'Farouk', 'Gamal', 'Helmy', 'Zaki', 'Rashad', 'Shawky', 'Anwar', 'Emad', 'Lotfy', 'Sabry',
+]
+COMPLAINTS = ['Tooth pain', 'Bleeding gums', 'Sensitivity to cold', 'Broken tooth', 'Routine check-up', 'Jaw pain']
+ICD10_CODES = ['K02.9', 'K04.0', 'K05.1', 'K08.1', 'K03.6', 'S02.5']
+MEDICATIONS = ['Amoxicillin 500mg', 'Ibuprofen 400mg', 'Chlorhexidine mouthwash', 'Paracetamol 500mg']
+
+SLOT_MINUTES = 30
+FIRST_SLOT_HOUR = 9
+
+
+class Command(BaseCommand):
+    help = 'Generate a seeded synthetic clinic with years of appointments (chunked bulk_create, optional multiprocessing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=10)
+        parser.add_argument('--nurses', type=int, default=5)
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--years', type=float, default=1, help='Years of appointment history up to today')
+        parser.add_argument('--per-day', type=int, default=12, help='Appointments per doctor per weekday')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk INSERT')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating appointments')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        seed = options['seed']
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write(self.style.WARNING('SQLite allows one writer; generating in-process'))
+            workers = 1
+
+        tag = f's{seed}'
+        if User.objects.filter(email__endswith=f'.{tag}@{EMAIL_DOMAIN}').exists():
+            raise CommandError(f'A clinic with --seed {seed} already exists; use another seed')
+
+        rng = random.Random(seed)
+        password_hash = make_password(PASSWORD)
+
+        with transaction.atomic():
+            roles = {
+                name: Role.objects.get_or_create(name=name)[0]
+                for name in ('Admin', 'Doctor', 'Nurse', 'Patient')
+            }
+            admin_email = f'admin.{tag}@{EMAIL_DOMAIN}'
+            User.objects.create(
+                full_name='Clinic Admin', email=admin_email, username=admin_email, password_hash=password_hash,
+                role=roles['Admin'], is_verified=True, is_approved=True,
+            )
+            services = self.create_services()
+            doctors = self.create_staff('Doctor', options['doctors'], roles['Doctor'], password_hash, tag, rng, chunk_size)
+            nurses = self.create_staff('Nurse', options['nurses'], roles['Nurse'], password_hash, tag, rng, chunk_size)
+            patients = self.create_patients(options['patients'], roles['Patient'], password_hash, tag, rng, chunk_size)
+        self.stdout.write(
+            f'Created {len(doctors)} doctors, {len(nurses)} nurses, {len(patients)} patients '
+            f'({time.perf_counter() - started:.1f}s)'
+        )
+        if not doctors or not patients:
+            raise CommandError('At least one doctor and one patient are needed to generate appointments')
+
+        today = timezone.localdate()
+        first_day = today - timedelta(days=int(options['years'] * 365))
+        last_day = today + timedelta(days=30)
+        units = [
+            (seed, doctor_index, month_start, month_end)
+            for doctor_index in range(len(doctors))
+            for month_start, month_end in months(first_day, last_day)
+        ]
+        context = {
+            'doctors': doctors,
+            'nurses': nurses,
+            'patients': patients,
+            'services': [(service.service_id, service.price) for service in services],
+            'per_day': options['per_day'],
+            'chunk_size': chunk_size,
+            'today': today,
+        }
+
+        totals = {}
+        if workers > 1:
+            # Children must open their own connections
+            connections.close_all()
+            pool = multiprocessing.get_context().Pool(workers, initializer=init_worker, initargs=(context,))
+            with pool:
+                results = pool.imap_unordered(generate_unit, units, chunksize=4)
+                totals = self.collect(results, len(units), started)
+        else:
+            init_worker(context, setup=False)
+            totals = self.collect(map(generate_unit, units), len(units), started)
+
+        search.reindex()
+        summaries.rebuild_patient_summaries()
+        bump_model_versions(User, Staff, Patient, Service, Appointment, MedicalRecord, Diagnosis, Treatment, Invoice, Payment)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        summary = ', '.join(f'{count} {name}' for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {time.perf_counter() - started:.1f}s'))
+        self.stdout.write(f'Portal accounts use the password "{PASSWORD}"')
+
+    def collect(self, results, unit_count, started):
+        totals = {}
+        for done, counts in enumerate(results, 1):
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+            if done % 50 == 0 or done == unit_count:
+                self.stdout.write(
+                    f'  {done}/{unit_count} doctor-months, {totals.get("appointments", 0)} appointments '
+                    f'({time.perf_counter() - started:.1f}s)'
+                )
+        return totals
+
+    def create_services(self):
+        services = []
+        for name, description, price in SERVICES:
+            service, _ = Service.objects.get_or_create(
+                name=name, defaults={'description': description, 'price': Decimal(price), 'is_active': True}
+            )
+            services.append(service)
+        return services
+
+    def create_staff(self, role_title, count, role, password_hash, tag, rng, chunk_size):
+        users, staff = [], []
+        for index in range(count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            email = f'{role_title.lower()}{index}.{tag}@{EMAIL_DOMAIN}'
+            user = User(
+                full_name=f'{first} {last}', email=email, username=email, password_hash=password_hash,
+                role=role, is_verified=True, is_approved=True,
+            )
+            users.append(user)
+            staff.append(Staff(
+                user=user, first_name=first, last_name=last, role_title=role_title,
+                license_number=f'{role_title[0]}-{tag}-{index:05d}', phone=phone_number(rng),
+                specialization='General Dentistry' if role_title == 'Doctor' else None,
+            ))
+        User.objects.bulk_create(users, batch_size=chunk_size)
+        Staff.objects.bulk_create(staff, batch_size=chunk_size)
+        return [member.staff_id for member in staff]
+
+    def create_patients(self, count, role, password_hash, tag, rng, chunk_size):
+        patient_ids = []
+        today = timezone.localdate()
+        for start in range(0, count, chunk_size):
+            users, patients = [], []
+            for index in range(start, min(start + chunk_size, count)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                email = f'patient{index}.{tag}@{EMAIL_DOMAIN}'
+                user = User(
+                    full_name=f'{first} {last}', email=email, username=email, password_hash=password_hash,
+                    role=role, is_verified=True,
+                )
+                users.append(user)
+                patients.append(Patient(
+                    user=user, first_name=first, last_name=last, email=email, phone=phone_number(rng),
+                    dob=today - timedelta(days=rng.randint(5 * 365, 85 * 365)),
+                    gender=rng.choice(['Male', 'Female']),
+                ))
+            User.objects.bulk_create(users)
+            Patient.objects.bulk_create(patients)
+            patient_ids.extend(patient.patient_id for patient in patients)
+        return patient_ids
+
+
+def phone_number(rng):
+    return f'01{rng.randint(0, 2)}{rng.randint(10000000, 99999999)}'
+
+
+def months(first_day, last_day):
+    """(start, end) pairs covering first_day..last_day, end exclusive"""
+    start = first_day
+    while start <= last_day:
+        following = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(following, last_day + timedelta(days=1))
+        yield start, end
+        start = end
+
+
+_context = None
+
+
+def init_worker(context, setup=True):
+    """Pool initializer: share the generated ids with every unit of this process"""
+    global _context
+    if setup:
+        import django
+        from django.apps import apps
+        if not apps.ready:
+            django.setup()
+        connections.close_all()
+    _context = context
+
+
+def generate_unit(unit):
+    """Generate and insert one doctor's appointments for one month. Returns row counts."""
+    seed, doctor_index, month_start, month_end = unit
+    context = _context
+    rng = random.Random(f'{seed}:{doctor_index}:{month_start.isoformat()}')
+    doctor_id = context['doctors'][doctor_index]
+    nurses = context['nurses']
+    patients = context['patients']
+    services = context['services']
+    today = context['today']
+    clinic_tz = timezone.get_current_timezone()
+    now = timezone.now()
+
+    appointments, records, treatments, diagnoses, invoices, payments = [], [], [], [], [], []
+    day = month_start
+    while day < month_end:
+        slots = context['per_day'] if day.weekday() < 5 else context['per_day'] // 2
+        for slot in range(slots):
+            start = timezone.make_aware(
+                datetime.combine(day, day_time(FIRST_SLOT_HOUR)) + timedelta(minutes=slot * SLOT_MINUTES), clinic_tz
+            )
+            end = start + timedelta(minutes=SLOT_MINUTES)
+            patient_id = rng.choice(patients)
+            past = day < today
+            roll = rng.random()
+            if past:
+                status = 'completed' if roll < 0.85 else 'cancelled' if roll < 0.93 else 'no_show'
+            else:
+                status = 'confirmed' if roll < 0.4 else 'scheduled'
+
+            appointment = Appointment(
+                patient_id=patient_id, staff_id=doctor_id, start_time=start, end_time=end,
+                nurse_id=rng.choice(nurses) if nurses and rng.random() < 0.7 else None,
+                status=status, reason=rng.choice(COMPLAINTS), created_at=start - timedelta(days=rng.randint(1, 30)),
+            )
+            appointments.append(appointment)
+            if status != 'completed':
+                continue
+
+            # Foreign keys are checked at commit, so the record and the
+            # appointment can point at each other within the chunk
+            record = MedicalRecord(
+                patient_id=patient_id, staff_id=doctor_id, created_by_id=doctor_id,
+                appointment_id=appointment.appointment_id, record_date=day,
+                chief_complaint=appointment.reason, outcome='Treated', created_at=end,
+            )
+            appointment.medical_record_id = record.record_id
+            records.append(record)
+            for _ in range(rng.randint(1, 2)):
+                diagnoses.append(Diagnosis(
+                    record_id=record.record_id, icd10_code=rng.choice(ICD10_CODES),
+                    notes=rng.choice(MEDICATIONS), diagnosed_at=end,
+                ))
+
+            total = Decimal('0')
+            for service_id, price in rng.sample(services, rng.randint(1, min(3, len(services)))):
+                treatments.append(Treatment(
+                    appointment_id=appointment.appointment_id, service_id=service_id, created_at=end,
+                ))
+                total += price
+
+            due = day + timedelta(days=30)
+            roll = rng.random()
+            if roll < 0.7:
+                paid, invoice_status = total, 'paid'
+            elif roll < 0.8:
+                paid, invoice_status = (total / 2).quantize(Decimal('0.01')), 'partially_paid'
+            else:
+                paid, invoice_status = Decimal('0'), 'overdue' if due < today else 'pending'
+            invoice = Invoice(
+                patient_id=patient_id, appointment_id=appointment.appointment_id, total_amount=total,
+                paid_amount=paid, status=invoice_status, issued_date=day, due_date=due,
+                is_approved=True, created_at=end,
+            )
+            invoices.append(invoice)
+            if paid:
+                payments.append(Payment(
+                    invoice_id=invoice.invoice_id, amount=paid, method=rng.choice(['cash', 'credit_card', 'debit_card', 'insurance']),
+                    paid_at=min(end + timedelta(days=rng.randint(0, 20)), now),
+                ))
+        day += timedelta(days=1)
+
+    batch_size = context['chunk_size']
+    with transaction.atomic():
+        Appointment.objects.bulk_create(appointments, batch_size=batch_size)
+        MedicalRecord.objects.bulk_create(records, batch_size=batch_size)
+        Diagnosis.objects.bulk_create(diagnoses, batch_size=batch_size)
+        Treatment.objects.bulk_create(treatments, batch_size=batch_size)
+        Invoice.objects.bulk_create(invoices, batch_size=batch_size)
+        Payment.objects.bulk_create(payments, batch_size=batch_size)
+
+    return {
+        'appointments': len(appointments),
+        'medical records': len(records),
+        'diagnoses': len(diagnoses),
+        'treatments': len(treatments),
+        'invoices': len(invoices),
+        'payments': len(payments),
+    }
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:29
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_overdue_invoices(apps, schema_editor):
+    # Overdue filters now read the status; the hourly sweep keeps it current from here on
+    Invoice = apps.get_model('staff', 'Invoice')
+    Invoice.objects.filter(
+        status__in=['pending', 'unpaid', 'partially_paid'], due_date__lt=timezone.localdate(),
+    ).update(status='overdue')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0026_sync_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='invoices_status_due_idx'),
+        ),
+        migrations.RunPython(mark_overdue_invoices, migrations.RunPython.noop),
+    ]
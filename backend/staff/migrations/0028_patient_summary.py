@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:32
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def build_patient_summaries(apps, schema_editor):
+    # One row per existing patient. The columns are a frozen copy of
+    # staff.summaries.summary_columns() as of this migration, so later edits
+    # to it do not change what this migration does.
+    Patient = apps.get_model('staff', 'Patient')
+    PatientSummary = apps.get_model('staff', 'PatientSummary')
+    Appointment = apps.get_model('staff', 'Appointment')
+    Invoice = apps.get_model('staff', 'Invoice')
+    Allergy = apps.get_model('staff', 'Allergy')
+    MedicalRecord = apps.get_model('staff', 'MedicalRecord')
+
+    def per_patient(queryset, aggregate, output_field, default=None):
+        value = Subquery(
+            queryset.filter(patient_id=OuterRef('patient_id')).values('patient_id').annotate(
+                value=aggregate
+            ).values('value')[:1],
+            output_field=output_field,
+        )
+        return value if default is None else Coalesce(value, Value(default), output_field=output_field)
+
+    now = timezone.now()
+    count = models.IntegerField()
+    moment = models.DateTimeField()
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    completed = Appointment.objects.filter(status='completed')
+    open_invoices = Invoice.objects.filter(status__in=['pending', 'unpaid', 'partially_paid', 'overdue'])
+
+    PatientSummary.objects.bulk_create(
+        [PatientSummary(patient_id=pk) for pk in Patient.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000,
+    )
+    PatientSummary.objects.update(
+        visit_count=per_patient(completed, Count('pk'), count, 0),
+        last_visit_at=per_patient(completed, Max('start_time'), moment),
+        last_appointment_at=per_patient(Appointment.objects.all(), Max('start_time'), moment),
+        next_appointment_at=per_patient(
+            Appointment.objects.filter(status__in=['scheduled', 'confirmed'], start_time__gte=now),
+            Min('start_time'), moment,
+        ),
+        outstanding_balance=per_patient(
+            open_invoices, Sum(F('total_amount') - F('paid_amount'), output_field=money), money, Decimal('0'),
+        ),
+        open_invoice_count=per_patient(open_invoices, Count('pk'), count, 0),
+        allergy_count=per_patient(Allergy.objects.all(), Count('pk'), count, 0),
+        has_severe_allergy=Exists(Allergy.objects.filter(patient_id=OuterRef('patient_id'), severity='severe')),
+        record_count=per_patient(MedicalRecord.objects.all(), Count('pk'), count, 0),
+        updated_at=Value(now),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0027_invoice_overdue_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSummary',
+            fields=[
+                ('patient', models.OneToOneField(db_column='patient_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='staff.patient')),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('last_visit_at', models.DateTimeField(blank=True, null=True)),
+                ('last_appointment_at', models.DateTimeField(blank=True, null=True)),
+                ('next_appointment_at', models.DateTimeField(blank=True, null=True)),
+                ('outstanding_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('open_invoice_count', models.PositiveIntegerField(default=0)),
+                ('allergy_count', models.PositiveIntegerField(default=0)),
+                ('has_severe_allergy', models.BooleanField(default=False)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'patient_summary',
+                'indexes': [models.Index(fields=['next_appointment_at'], name='patient_summary_next_idx')],
+            },
+        ),
+        migrations.RunPython(build_patient_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0028_patient_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='status_before_overdue',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:03
+
+import staff.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0029_invoice_status_before_overdue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_time',
+            field=models.DateTimeField(default=staff.models.default_end_time),
+        ),
+    ]
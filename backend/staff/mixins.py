@@ -0,0 +1,162 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from backend.response_cache import bump_model_versions
+
+
+def _walk_relations(model, parts):
+    """
+    Follow dotted source parts across model relations.
+    Returns (relation path, whether every hop is single-valued, final model).
+    """
+    path = []
+    single_valued = True
+    for part in parts:
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        path.append(part)
+        if field.many_to_many or field.one_to_many:
+            single_valued = False
+        model = field.related_model
+    return path, single_valued, model
+
+
+def collect_related_lookups(serializer_class, model, prefix=()):
+    """
+    Inspect the declared fields of a serializer and return the
+    select_related / prefetch_related lookups their `source` paths need.
+    """
+    select_related, prefetch_related = set(), set()
+
+    for field_name, field in serializer_class._declared_fields.items():
+        if isinstance(field, serializers.SerializerMethodField):
+            continue
+        source = field.source or field_name
+        if source == '*':
+            continue
+
+        path, single_valued, related_model = _walk_relations(model, source.split('.'))
+        if not path:
+            continue
+
+        lookup = '__'.join(prefix + tuple(path))
+        if single_valued:
+            select_related.add(lookup)
+        else:
+            prefetch_related.add(lookup)
+
+        # Nested serializers add their own relations below this path
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(nested, serializers.BaseSerializer):
+            nested_select, nested_prefetch = collect_related_lookups(
+                type(nested), related_model, prefix + tuple(path)
+            )
+            if single_valued:
+                select_related |= nested_select
+                prefetch_related |= nested_prefetch
+            else:
+                prefetch_related |= nested_select | nested_prefetch
+
+    # A select_related path that is a prefix of a longer one is redundant
+    select_related = {
+        lookup for lookup in select_related
+        if not any(other.startswith(lookup + '__') for other in select_related)
+    }
+    return select_related, prefetch_related
+
+
+class EagerLoadingMixin:
+    """
+    Apply select_related / prefetch_related to the view queryset based on the
+    `source` paths declared on `serializer_class`.
+
+    The lookups are computed once, when the view class is created, so list
+    views run a constant number of queries without hand-maintained join lists.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        serializer_class = getattr(cls, 'serializer_class', None)
+        model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+        if model is None:
+            return
+
+        select_related, prefetch_related = collect_related_lookups(serializer_class, model)
+        cls.select_related_fields = tuple(sorted(select_related))
+        cls.prefetch_related_fields = tuple(sorted(prefetch_related))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        return queryset
+
+
+class BulkCreateMixin:
+    """
+    Create a list of objects in one POST.
+
+    Items are validated together with `bulk_serializer_class`, whose related
+    fields are plain primary keys. Each relation in `bulk_relations` is then
+    resolved with a single in_bulk() and the objects are inserted with
+    bulk_create in one transaction. The response uses `serializer_class`.
+    """
+    bulk_serializer_class = None
+    # Related field name -> queryset its primary keys are resolved against
+    bulk_relations = {}
+    bulk_max_items = 100
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ['Expected a non-empty list of items.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'At most {self.bulk_max_items} items can be created at once.']})
+
+        item_serializer = self.bulk_serializer_class(data=items, many=True)
+        item_serializer.is_valid(raise_exception=True)
+        items = item_serializer.validated_data
+
+        errors = {}
+        resolved = {}
+        for field, queryset in self.bulk_relations.items():
+            objects = queryset.in_bulk({item[field] for item in items if item.get(field) is not None})
+            for index, item in enumerate(items):
+                pk = item.get(field)
+                if pk is not None and pk not in objects:
+                    errors.setdefault(index, {})[field] = [f'Invalid pk "{pk}" - object does not exist.']
+            resolved[field] = objects
+        if errors:
+            # Same shape as the item serializer's errors: {index: {field: [...]}}
+            raise ValidationError(errors)
+
+        model = self.bulk_serializer_class.Meta.model
+        instances = [
+            model(**{
+                **item,
+                **{field: resolved[field][item[field]] for field in resolved if item.get(field) is not None},
+            })
+            for item in items
+        ]
+        with transaction.atomic():
+            self.perform_bulk_create(instances)
+
+        serializer = self.get_serializer(instances, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, instances):
+        model = self.bulk_serializer_class.Meta.model
+        model.objects.bulk_create(instances)
+        # bulk_create sends no post_save
+        bump_model_versions(model)
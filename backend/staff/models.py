@@ -2,7 +2,8 @@ from django.db import models
 from django.utils import timezone
 from accounts.models import User
 import uuid
-from django.db.models import Func
+from django.db.models import F, Func, Q, Case, When, Value, IntegerField
+from django.db.models.functions import ExtractYear
 
 
 class UUIDGenerateV4(Func):
@@ -13,9 +14,37 @@ class UUIDGenerateV4(Func):
 def default_record_date():
     return timezone.now().date()
 
+def default_end_time():
+    return timezone.now() + timezone.timedelta(hours=1)
+
 # Staff models for the dental practice management system
 # These models map to existing tables in the Neon database
 
+class PatientQuerySet(models.QuerySet):
+    """Queryset helpers for patient list endpoints"""
+
+    def with_list_annotations(self):
+        """
+        Annotate `last_appointment_at` (from the patient summary) and `age` so
+        list serializers can read them without issuing a query per patient.
+        """
+        today = timezone.localdate()
+
+        # Birthday still ahead this year -> one year younger than the year difference
+        birthday_pending = Q(dob__month__gt=today.month) | Q(dob__month=today.month, dob__day__gt=today.day)
+        year_diff = Value(today.year) - ExtractYear('dob')
+
+        return self.annotate(
+            last_appointment_at=F('summary__last_appointment_at'),
+            age=Case(
+                When(dob__isnull=True, then=Value(None)),
+                When(birthday_pending, then=year_diff - Value(1)),
+                default=year_diff,
+                output_field=IntegerField(),
+            ),
+        )
+
+
 class Patient(models.Model):
     """Model mapping to existing patients table"""
     patient_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -31,6 +60,8 @@ class Patient(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PatientQuerySet.as_manager()
+
     class Meta:
         db_table = 'patients'
 
@@ -93,6 +124,9 @@ class MedicalRecord(models.Model):
 
     class Meta:
         db_table = 'medical_records'
+        indexes = [
+            models.Index(fields=['updated_at'], name='medical_records_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Record for {self.patient.full_name} - {self.record_date}"
@@ -122,7 +156,7 @@ class Appointment(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointments')
     staff = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='appointments', db_column='staff_id')
     start_time = models.DateTimeField(default=timezone.now)
-    end_time = models.DateTimeField(default=timezone.now()+timezone.timedelta(hours=1))
+    end_time = models.DateTimeField(default=default_end_time)
     appointment_date = models.DateTimeField(blank=True, null=True, help_text="Actual date/time of appointment session, can differ from scheduled start_time.")
     nurse = models.ForeignKey('Staff', on_delete=models.SET_NULL, related_name='nurse_appointments', blank=True, null=True, help_text="Nurse assisting in the appointment.", db_column='nurse_id')
     medical_record = models.OneToOneField('MedicalRecord', on_delete=models.SET_NULL, blank=True, null=True, related_name='appointment_record', help_text="Medical record for this appointment.")
@@ -134,6 +168,12 @@ class Appointment(models.Model):
 
     class Meta:
         db_table = 'appointments'
+        indexes = [
+            models.Index(fields=['staff', 'start_time'], name='appointments_staff_start_idx'),
+            models.Index(fields=['patient', 'start_time'], name='appointments_patient_start_idx'),
+            models.Index(fields=['status', 'start_time'], name='appointments_status_start_idx'),
+            models.Index(fields=['updated_at'], name='appointments_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient.full_name} - {self.start_time}"
@@ -157,9 +197,13 @@ class Treatment(models.Model):
     # Optional: actual cost charged (may differ from service price)
     actual_cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'treatments'
+        indexes = [
+            models.Index(fields=['updated_at'], name='treatments_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.service.name if self.service else 'Unknown'} - {self.appointment.patient.full_name if self.appointment else 'No Appointment'}"
@@ -286,6 +330,10 @@ class Invoice(models.Model):
         ('cancelled', 'Cancelled'),
         ('partially_paid', 'Partially Paid'),
     ]
+    # Awaiting payment; past their due date the overdue sweep marks them
+    # 'overdue' (staff/billing.py sweep_overdue_invoices)
+    OPEN_STATUSES = ['pending', 'unpaid', 'partially_paid']
+    OVERDUE = 'overdue'
 
     invoice_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='invoices')
@@ -293,6 +341,8 @@ class Invoice(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # The open status an overdue invoice returns to when its due date moves on
+    status_before_overdue = models.CharField(max_length=20, blank=True, null=True)
     issued_date = models.DateField(default=timezone.now)
     due_date = models.DateField()
     created_at = models.DateTimeField(default=timezone.now)
@@ -301,6 +351,11 @@ class Invoice(models.Model):
 
     class Meta:
         db_table = 'invoices'
+        indexes = [
+            models.Index(fields=['updated_at'], name='invoices_updated_idx'),
+            # Overdue sweep and overdue filters/counts
+            models.Index(fields=['status', 'due_date'], name='invoices_status_due_idx'),
+        ]
 
     def __str__(self):
         return f"Invoice #{self.invoice_id} - {self.patient.full_name} - ${self.total_amount}"
@@ -315,8 +370,14 @@ class Invoice(models.Model):
 
     @property
     def is_overdue(self):
-        from django.utils import timezone
-        return timezone.now().date() > self.due_date and not self.is_fully_paid
+        # Also true between sweeps for an open invoice already past its due date
+        if self.status == self.OVERDUE:
+            return True
+        return (
+            self.status in self.OPEN_STATUSES
+            and self.due_date < timezone.localdate()
+            and not self.is_fully_paid
+        )
 
 
 class Payment(models.Model):
@@ -367,4 +428,56 @@ class Service(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        return f"{self.name} - ${self.price}"
\ No newline at end of file
+        return f"{self.name} - ${self.price}"
+
+
+class Tombstone(models.Model):
+    """
+    A deleted row, kept so clients of the changes feed (staff/sync.py) can
+    drop it too. Written by post_delete signals and pruned after
+    SYNC_TOMBSTONE_DAYS by the prune_tombstones command.
+    """
+    collection = models.CharField(max_length=30)  # feed collection, e.g. 'appointments'
+    object_id = models.UUIDField()
+    # Owner of the deleted row, so a patient's feed only lists their own deletes
+    patient_id = models.UUIDField(blank=True, null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'tombstones'
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstones_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.collection} {self.object_id} deleted {self.deleted_at}"
+
+
+class PatientSummary(models.Model):
+    """
+    Per-patient counts and dates read by patient lists and dashboards,
+    maintained from model signals by staff/summaries.py
+    """
+    patient = models.OneToOneField(
+        Patient, on_delete=models.CASCADE, primary_key=True, related_name='summary', db_column='patient_id',
+    )
+    visit_count = models.PositiveIntegerField(default=0)  # completed appointments
+    last_visit_at = models.DateTimeField(blank=True, null=True)
+    last_appointment_at = models.DateTimeField(blank=True, null=True)  # any status
+    next_appointment_at = models.DateTimeField(blank=True, null=True)  # scheduled or confirmed
+    outstanding_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    open_invoice_count = models.PositiveIntegerField(default=0)
+    allergy_count = models.PositiveIntegerField(default=0)
+    has_severe_allergy = models.BooleanField(default=False)
+    record_count = models.PositiveIntegerField(default=0)  # medical records
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'patient_summary'
+        indexes = [
+            # Rows whose next appointment has started need a refresh
+            models.Index(fields=['next_appointment_at'], name='patient_summary_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"Summary of {self.patient_id}"
@@ -0,0 +1,208 @@
+"""
+Ranked, typo-tolerant patient search.
+
+PostgreSQL: a pg_trgm GIN index over a single search document
+(name, email and phone) answers both substring and word-similarity
+matches, ranked by word_similarity(). The matching ids are read in a
+transaction that sets the `<%` threshold with SET LOCAL: a session-level
+setting would not survive a transaction-mode pooler (pgbouncer, Neon).
+
+SQLite: an FTS5 shadow table using the trigram tokenizer holds the same
+document. Candidates come from the FTS index and are ranked by trigram
+overlap with the query. The shadow table is kept in sync from Patient
+save/delete signals (see staff/signals.py).
+
+Other backends fall back to the plain icontains filter.
+"""
+import uuid
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+SQLITE_TABLE = 'patients_search'
+POSTGRES_INDEX = 'patients_search_trgm_idx'
+
+# Must match the indexed expression exactly for PostgreSQL to use the index
+POSTGRES_DOCUMENT = (
+    "lower(\"patients\".\"first_name\" || ' ' || \"patients\".\"last_name\" || ' ' || "
+    "\"patients\".\"email\" || ' ' || coalesce(\"patients\".\"phone\", ''))"
+)
+POSTGRES_INDEX_DOCUMENT = (
+    "lower(first_name || ' ' || last_name || ' ' || email || ' ' || coalesce(phone, ''))"
+)
+
+# Fills the SQLite shadow table from the patients table
+SQLITE_POPULATE = (
+    f"INSERT INTO {SQLITE_TABLE} (patient_id, document) "
+    f"SELECT patient_id, lower(first_name || ' ' || last_name || ' ' || email || "
+    f"coalesce(' ' || nullif(phone, ''), '')) FROM patients"
+)
+
+# Upper bound on FTS candidates re-ranked in Python on SQLite
+SQLITE_CANDIDATES = 200
+
+
+def similarity_threshold():
+    return getattr(settings, 'PATIENT_SEARCH_SIMILARITY', 0.3)
+
+
+def patient_document(patient):
+    return ' '.join(filter(None, [patient.first_name, patient.last_name, patient.email, patient.phone])).lower()
+
+
+def trigrams(text):
+    """Padded word trigrams, matching how pg_trgm splits words"""
+    grams = set()
+    for word in text.lower().split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(term, document):
+    """Share of the term's trigrams that appear in the document"""
+    term_grams = trigrams(term)
+    if not term_grams:
+        return 0.0
+    return len(term_grams & trigrams(document)) / len(term_grams)
+
+
+def search_patients(term, queryset=None):
+    """
+    Filter `queryset` (all patients by default) to those matching `term`,
+    best matches first. Returns a queryset.
+    """
+    from .models import Patient
+
+    if queryset is None:
+        queryset = Patient.objects.all()
+    term = term.strip().lower()
+    if not term:
+        return queryset.none()
+
+    if connection.vendor == 'postgresql':
+        return _search_postgres(term, queryset)
+    if connection.vendor == 'sqlite' and len(term) >= 3:
+        return _search_sqlite(term, queryset)
+    return _search_fallback(term, queryset)
+
+
+def _search_fallback(term, queryset):
+    return queryset.filter(
+        Q(first_name__icontains=term) |
+        Q(last_name__icontains=term) |
+        Q(email__icontains=term) |
+        Q(phone__icontains=term)
+    ).order_by('last_name', 'first_name')
+
+
+def _search_postgres(term, queryset):
+    # `<%` (word similarity) and LIKE can both be answered from the trigram index
+    matches = RawSQL(
+        f"(%s <%% {POSTGRES_DOCUMENT} OR {POSTGRES_DOCUMENT} LIKE %s)",
+        (term, f'%{term}%'),
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(f"word_similarity(%s, {POSTGRES_DOCUMENT})", (term,), output_field=FloatField())
+    ordering = ('-search_rank', 'last_name', 'first_name')
+
+    with transaction.atomic(using=queryset.db):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(similarity_threshold())],
+            )
+        ids = list(queryset.filter(matches).annotate(search_rank=rank).order_by(*ordering).values_list('pk', flat=True))
+
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by(*ordering)
+
+
+def _search_sqlite(term, queryset):
+    grams = trigrams(term)
+    # Plain (unpadded) trigrams for the FTS5 trigram tokenizer, any of which may match
+    plain = {gram for gram in grams if ' ' not in gram}
+    if not plain:
+        return _search_fallback(term, queryset)
+    match = ' OR '.join('"{}"'.format(gram.replace('"', '""')) for gram in sorted(plain))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT patient_id, document FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+            [match, SQLITE_CANDIDATES],
+        )
+        candidates = cursor.fetchall()
+
+    threshold = similarity_threshold()
+    scored = []
+    for patient_id, document in candidates:
+        similarity = word_similarity(term, document)
+        is_substring = term in document
+        if is_substring or similarity >= threshold:
+            scored.append(((similarity, is_substring), uuid.UUID(patient_id)))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    ids = [patient_id for _, patient_id in scored]
+    if not ids:
+        return queryset.none()
+    position = Case(
+        *[When(pk=patient_id, then=index) for index, patient_id in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).order_by(position, 'last_name', 'first_name')
+
+
+def index_patient(patient):
+    """Refresh a patient's row in the SQLite shadow table"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE patient_id = %s', [patient.pk.hex])
+        cursor.execute(
+            f'INSERT INTO {SQLITE_TABLE} (patient_id, document) VALUES (%s, %s)',
+            [patient.pk.hex, patient_document(patient)],
+        )
+
+
+def unindex_patient(patient_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE patient_id = %s', [patient_id.hex])
+
+
+def reindex():
+    """Rebuild the SQLite shadow table, e.g. after patients were bulk-inserted without signals"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+        cursor.execute(SQLITE_POPULATE)
+
+
+def install(schema_editor):
+    """Create the search index for the current backend (used by migrations)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON patients '
+            f'USING gin (({POSTGRES_INDEX_DOCUMENT}) gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} '
+            f"USING fts5(patient_id UNINDEXED, document, tokenize='trigram')"
+        )
+        schema_editor.execute(SQLITE_POPULATE)
+
+
+def uninstall(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {POSTGRES_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
@@ -22,18 +22,13 @@ class StaffSerializer(serializers.ModelSerializer):
 class AppointmentSerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.full_name', read_only=True)
     staff_name = serializers.CharField(source='staff.user.full_name', read_only=True)
-    nurse_name = serializers.SerializerMethodField()
+    nurse_name = serializers.CharField(source='nurse.user.full_name', read_only=True, default=None)
     medical_record_id = serializers.UUIDField(source='medical_record.record_id', read_only=True, default=None)
 
     class Meta:
         model = Appointment
         fields = ['appointment_id', 'patient', 'patient_name', 'staff', 'staff_name', 'start_time', 'end_time', 'nurse', 'nurse_name', 'medical_record', 'medical_record_id', 'fee', 'status', 'reason', 'created_at', 'updated_at']
 
-    def get_nurse_name(self, obj):
-        if obj.nurse and obj.nurse.user:
-            return obj.nurse.user.full_name
-        return None
-
 
 class AppointmentListSerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.full_name', read_only=True)
@@ -77,6 +72,16 @@ class TreatmentSerializer(serializers.ModelSerializer):
         return obj.appointment.start_time.date() if obj.appointment and obj.appointment.start_time else None
 
 
+class TreatmentBulkItemSerializer(serializers.ModelSerializer):
+    """One item of a bulk treatment create; related objects are resolved by the view"""
+    appointment = serializers.UUIDField()
+    service = serializers.UUIDField(required=False, allow_null=True)
+
+    class Meta:
+        model = Treatment
+        fields = ['appointment', 'service', 'actual_cost']
+
+
 class TreatmentSummarySerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='appointment.patient.full_name', read_only=True)
     service_name = serializers.CharField(source='service.name', read_only=True)
@@ -99,6 +104,47 @@ class DiagnosisSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class DiagnosisBulkItemSerializer(serializers.ModelSerializer):
+    """One item of a bulk diagnosis create; the record is resolved by the view"""
+    record = serializers.UUIDField()
+
+    class Meta:
+        model = Diagnosis
+        fields = ['record', 'icd10_code', 'notes']
+
+
+class VisitRecordSerializer(serializers.ModelSerializer):
+    notes = serializers.CharField(source='chief_complaint', required=False, allow_blank=True)
+
+    class Meta:
+        model = MedicalRecord
+        fields = ['notes', 'examination_notes', 'diagnosis_notes', 'outcome', 'treatment_plan',
+                  'medications', 'follow_up_instructions', 'radiology_needed']
+
+
+class VisitTreatmentSerializer(serializers.ModelSerializer):
+    service = serializers.UUIDField(required=False, allow_null=True)
+
+    class Meta:
+        model = Treatment
+        fields = ['service', 'actual_cost']
+
+
+class VisitDiagnosisSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Diagnosis
+        fields = ['icd10_code', 'notes']
+
+
+class VisitCompletionSerializer(serializers.Serializer):
+    """Everything written when a visit is finalized"""
+    record = VisitRecordSerializer(required=False)
+    treatments = VisitTreatmentSerializer(many=True, required=False)
+    diagnoses = VisitDiagnosisSerializer(many=True, required=False)
+    nurse = serializers.UUIDField(required=False, allow_null=True)
+    end_time = serializers.DateTimeField(required=False)
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.full_name', read_only=True)
     balance_due = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -108,6 +154,7 @@ class InvoiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Invoice
         fields = '__all__'
+        read_only_fields = ['status_before_overdue']
 
 
 class InvoiceSummarySerializer(serializers.ModelSerializer):
@@ -136,6 +183,10 @@ class ServiceSerializer(serializers.ModelSerializer):
 
 # List serializers for dashboard views
 class PatientListSerializer(serializers.ModelSerializer):
+    """
+    Expects a queryset built with Patient.objects.with_list_annotations(),
+    which provides `age` and `last_appointment_at` in the same query.
+    """
     age = serializers.SerializerMethodField()
     last_appointment = serializers.SerializerMethodField()
     
@@ -144,6 +195,8 @@ class PatientListSerializer(serializers.ModelSerializer):
         fields = ['patient_id', 'first_name', 'last_name', 'full_name', 'email', 'phone', 'dob', 'age', 'last_appointment']
     
     def get_age(self, obj):
+        if hasattr(obj, 'age'):
+            return obj.age
         if obj.dob:
             from datetime import date
             today = date.today()
@@ -151,8 +204,12 @@ class PatientListSerializer(serializers.ModelSerializer):
         return None
     
     def get_last_appointment(self, obj):
-        last_apt = obj.appointments.order_by('-start_time').first()
-        return last_apt.start_time.date().isoformat() if last_apt else None
+        if hasattr(obj, 'last_appointment_at'):
+            last_start = obj.last_appointment_at
+        else:
+            last_apt = obj.appointments.order_by('-start_time').first()
+            last_start = last_apt.start_time if last_apt else None
+        return last_start.date().isoformat() if last_start else None
 
 
 class AppointmentListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,187 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from backend import events, response_cache
+
+from . import search, summaries, sync
+from .billing import mark_invoice_dirty
+from .models import (
+    Allergy, Appointment, ChronicCondition, Diagnosis, Invoice, MedicalRecord, PastSurgery, Patient, Payment,
+    Service, Staff, Treatment,
+)
+
+
+@receiver(post_save, sender=Patient)
+def index_patient_for_search(sender, instance, **kwargs):
+    search.index_patient(instance)
+
+
+@receiver(post_delete, sender=Patient)
+def unindex_patient_for_search(sender, instance, **kwargs):
+    search.unindex_patient(instance.pk)
+
+
+@receiver(post_save, sender=Patient)
+def create_patient_summary(sender, instance, created, using, **kwargs):
+    if created:
+        summaries.create_summary(instance.pk, using=using)
+
+
+@receiver(post_init, sender=Appointment)
+@receiver(post_init, sender=Invoice)
+@receiver(post_init, sender=Allergy)
+@receiver(post_init, sender=MedicalRecord)
+def remember_summary_patient(sender, instance, **kwargs):
+    # Lets an update that moves a row to another patient also refresh the old
+    # patient's summary; read from __dict__ so a deferred patient_id isn't loaded
+    instance._loaded_patient_id = instance.__dict__.get('patient_id')
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Allergy)
+@receiver(post_delete, sender=Allergy)
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_delete, sender=MedicalRecord)
+def refresh_patient_summary(sender, instance, using, **kwargs):
+    summaries.mark_summary_dirty(instance.patient_id, using=using)
+    if instance._loaded_patient_id != instance.patient_id:
+        summaries.mark_summary_dirty(instance._loaded_patient_id, using=using)
+    instance._loaded_patient_id = instance.patient_id
+
+
+@receiver(post_init, sender=Treatment)
+def remember_treatment_appointment(sender, instance, **kwargs):
+    # Lets an update that moves a treatment also refresh the old appointment's invoice
+    instance._loaded_appointment_id = instance.appointment_id
+
+
+@receiver(post_save, sender=Treatment)
+def recalculate_invoice_on_treatment_save(sender, instance, using, **kwargs):
+    mark_invoice_dirty(instance.appointment_id, using=using)
+    if instance._loaded_appointment_id != instance.appointment_id:
+        mark_invoice_dirty(instance._loaded_appointment_id, using=using)
+    instance._loaded_appointment_id = instance.appointment_id
+
+
+@receiver(post_delete, sender=Treatment)
+def recalculate_invoice_on_treatment_delete(sender, instance, using, **kwargs):
+    mark_invoice_dirty(instance.appointment_id, using=using)
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=MedicalRecord)
+def record_sync_deletion(sender, instance, **kwargs):
+    sync.record_deletion(instance, instance.patient_id)
+
+
+def _deleting_appointment_patients(using):
+    connection = transaction.get_connection(using)
+    if not hasattr(connection, 'deleting_appointment_patients'):
+        connection.deleting_appointment_patients = {}
+    return connection.deleting_appointment_patients
+
+
+@receiver(pre_delete, sender=Appointment)
+def remember_deleted_appointment_patient(sender, instance, using, **kwargs):
+    # A cascade deletes the appointment's treatments first; their tombstones need its patient
+    _deleting_appointment_patients(using)[instance.pk] = instance.patient_id
+
+
+@receiver(post_delete, sender=Appointment)
+def forget_deleted_appointment_patient(sender, instance, using, **kwargs):
+    _deleting_appointment_patients(using).pop(instance.pk, None)
+
+
+@receiver(post_delete, sender=Treatment)
+def record_treatment_sync_deletion(sender, instance, using, **kwargs):
+    deleting = _deleting_appointment_patients(using)
+    if instance.appointment_id in deleting:
+        patient_id = deleting[instance.appointment_id]
+    elif Treatment.appointment.is_cached(instance):
+        patient_id = instance.appointment.patient_id
+    else:
+        patient_id = Appointment.objects.using(using).filter(
+            pk=instance.appointment_id
+        ).values_list('patient_id', flat=True).first()
+    sync.record_deletion(instance, patient_id)
+
+
+# Appointment fields whose changes are pushed to the live appointment board
+BOARD_FIELDS = ('status', 'start_time', 'end_time', 'staff_id', 'nurse_id')
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_board_fields(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded
+    instance._loaded_board_fields = {field: instance.__dict__.get(field) for field in BOARD_FIELDS}
+
+
+def _publish_appointment(event_type, instance, using, changed=(), previous_status=None):
+    # Published even without subscribers: reconnecting clients replay the backlog
+    if instance.pk is None:
+        return  # deleted before the commit
+    if Appointment.patient.is_cached(instance) and Appointment.staff.is_cached(instance):
+        patient, staff = instance.patient, instance.staff
+        names = {
+            'patient__first_name': patient.first_name, 'patient__last_name': patient.last_name,
+            'staff__first_name': staff.first_name, 'staff__last_name': staff.last_name,
+        }
+    else:
+        # Only the names are not in memory; read them where the row was written
+        names = Appointment.objects.using(using).filter(pk=instance.pk).values(
+            'patient__first_name', 'patient__last_name', 'staff__first_name', 'staff__last_name',
+        ).first()
+        if names is None:
+            return
+    data = {
+        'appointment_id': instance.pk,
+        'status': instance.status,
+        'previous_status': previous_status,
+        'changed': list(changed),
+        'start_time': instance.start_time,
+        'end_time': instance.end_time,
+        'staff_id': instance.staff_id,
+        'nurse_id': instance.nurse_id,
+        'patient_id': instance.patient_id,
+        'patient_name': f"{names['patient__first_name']} {names['patient__last_name']}",
+        'staff_name': f"Dr. {names['staff__first_name'] or ''} {names['staff__last_name'] or ''}".strip(),
+    }
+    events.publish(event_type, data)
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_change(sender, instance, created, using, **kwargs):
+    loaded = instance._loaded_board_fields
+    current = {field: instance.__dict__.get(field) for field in BOARD_FIELDS}
+    instance._loaded_board_fields = current
+    if created:
+        event_type, changed = 'appointment.created', ()
+    else:
+        changed = [field for field in BOARD_FIELDS if field in instance.__dict__ and current[field] != loaded[field]]
+        if not changed:
+            return
+        event_type = 'appointment.updated'
+    previous_status = None if created else loaded['status']
+    transaction.on_commit(
+        lambda: _publish_appointment(event_type, instance, using, changed, previous_status),
+        using=using,
+    )
+
+
+@receiver(post_delete, sender=Appointment)
+def publish_appointment_deletion(sender, instance, using, **kwargs):
+    data = {'appointment_id': instance.pk, 'staff_id': instance.staff_id, 'patient_id': instance.patient_id}
+    transaction.on_commit(lambda: events.publish('appointment.deleted', data), using=using)
+
+
+# Cached responses (backend/response_cache.py) are keyed on the versions of these
+response_cache.connect_signals([
+    Patient, Staff, Appointment, MedicalRecord, Treatment, Diagnosis, Invoice, Payment, Service,
+    ChronicCondition, Allergy, PastSurgery, User,
+])
@@ -0,0 +1,162 @@
+"""
+Per-patient summaries (PatientSummary, the patient_summary table).
+
+One row per patient holds the visit count, last visit, last and next
+appointment, outstanding balance and open invoice count, allergy flags and
+medical record count, so patient lists and dashboards read them with a join
+instead of aggregating per patient.
+
+The row is created with the patient. Changes to a patient's appointments,
+invoices, allergies or medical records mark the patient dirty (see
+staff/signals.py); as for invoice totals (staff/billing.py), the first mark
+inside a transaction schedules a single refresh with transaction.on_commit,
+which recomputes every dirty row in one UPDATE of correlated subqueries.
+Writes that skip signals (bulk_create, QuerySet.update) call
+refresh_patient_summaries() themselves, and
+`python manage.py rebuild_patient_summaries` recomputes every row.
+
+`next_appointment_at` also changes with time alone: the job worker
+refreshes rows whose next appointment has started every 15 minutes
+(staff.tasks.refresh_started_appointments).
+"""
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import (
+    Count, DateTimeField, DecimalField, Exists, F, IntegerField, Max, Min, OuterRef, QuerySet, Subquery, Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from backend.response_cache import bump_model_versions
+
+from .models import Allergy, Appointment, Invoice, MedicalRecord
+
+# Invoices awaiting payment, whether or not the overdue sweep has marked them
+OPEN_INVOICE_STATUSES = Invoice.OPEN_STATUSES + [Invoice.OVERDUE]
+UPCOMING_APPOINTMENT_STATUSES = ['scheduled', 'confirmed']
+
+# Patients per UPDATE when rebuilding every summary
+REBUILD_BATCH_SIZE = 1000
+
+
+def _per_patient(queryset, aggregate, output_field, default=None):
+    """Subquery: `aggregate` over the rows of `queryset` that belong to the summary's patient"""
+    value = Subquery(
+        queryset.filter(patient_id=OuterRef('patient_id')).values('patient_id').annotate(
+            value=aggregate
+        ).values('value')[:1],
+        output_field=output_field,
+    )
+    return value if default is None else Coalesce(value, Value(default), output_field=output_field)
+
+
+def summary_columns(now):
+    """The UPDATE assignments that recompute a summary row"""
+
+    count = IntegerField()
+    moment = DateTimeField()
+    money = DecimalField(max_digits=12, decimal_places=2)
+    open_invoices = Invoice.objects.filter(status__in=OPEN_INVOICE_STATUSES)
+    return {
+        'visit_count': _per_patient(
+            Appointment.objects.filter(status='completed'), Count('pk'), count, 0,
+        ),
+        'last_visit_at': _per_patient(Appointment.objects.filter(status='completed'), Max('start_time'), moment),
+        'last_appointment_at': _per_patient(Appointment.objects.all(), Max('start_time'), moment),
+        'next_appointment_at': _per_patient(
+            Appointment.objects.filter(status__in=UPCOMING_APPOINTMENT_STATUSES, start_time__gte=now),
+            Min('start_time'), moment,
+        ),
+        'outstanding_balance': _per_patient(
+            open_invoices, Sum(F('total_amount') - F('paid_amount'), output_field=money), money, Decimal('0'),
+        ),
+        'open_invoice_count': _per_patient(open_invoices, Count('pk'), count, 0),
+        'allergy_count': _per_patient(Allergy.objects.all(), Count('pk'), count, 0),
+        'has_severe_allergy': Exists(Allergy.objects.filter(patient_id=OuterRef('patient_id'), severity='severe')),
+        'record_count': _per_patient(MedicalRecord.objects.all(), Count('pk'), count, 0),
+        'updated_at': Value(now),
+    }
+
+
+def refresh_patient_summaries(patient_ids=None, using=DEFAULT_DB_ALIAS):
+    """
+    Recompute the summaries of `patient_ids` (a list or a queryset of
+    patient ids; None for every patient) in one UPDATE. Returns the number
+    of rows updated.
+    """
+    from .models import PatientSummary
+
+    summaries = PatientSummary.objects.using(using)
+    if patient_ids is not None:
+        if not isinstance(patient_ids, QuerySet):
+            patient_ids = list(patient_ids)
+            if not patient_ids:
+                return 0
+        summaries = summaries.filter(patient_id__in=patient_ids)
+    updated = summaries.update(**summary_columns(timezone.now()))
+    # update() sends no post_save
+    bump_model_versions(PatientSummary)
+    return updated
+
+
+def create_summary(patient_id, using=DEFAULT_DB_ALIAS):
+    """Add the (empty) summary row of a new patient"""
+    from .models import PatientSummary
+
+    PatientSummary.objects.using(using).bulk_create([PatientSummary(patient_id=patient_id)], ignore_conflicts=True)
+
+
+def rebuild_patient_summaries(batch_size=REBUILD_BATCH_SIZE):
+    """Create missing summary rows and recompute them all; returns the number of rows"""
+    from .models import Patient, PatientSummary
+
+    missing = list(Patient.objects.filter(summary__isnull=True).values_list('pk', flat=True))
+    PatientSummary.objects.bulk_create(
+        [PatientSummary(patient_id=patient_id) for patient_id in missing],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    patient_ids = list(PatientSummary.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(patient_ids), batch_size):
+        refresh_patient_summaries(patient_ids[start:start + batch_size])
+    return len(patient_ids)
+
+
+def refresh_started_appointments(now=None):
+    """Refresh the summaries whose next appointment has started; returns how many"""
+    from .models import PatientSummary
+
+    started = PatientSummary.objects.filter(next_appointment_at__lt=now or timezone.now())
+    return refresh_patient_summaries(list(started.values_list('pk', flat=True)))
+
+
+class _RefreshBatch:
+    """Patients whose summaries are refreshed when the transaction commits"""
+
+    def __init__(self, using):
+        self.using = using
+        self.patient_ids = set()
+
+    def __call__(self):
+        refresh_patient_summaries(self.patient_ids, using=self.using)
+
+
+def mark_summary_dirty(patient_id, using=DEFAULT_DB_ALIAS):
+    """Schedule a refresh of the summary of `patient_id` at commit"""
+    if patient_id is None:
+        return
+    connection = transaction.get_connection(using)
+    batch = getattr(connection, 'patient_summary_batch', None)
+
+    # Reusable only while its callback is pending, as in billing.mark_invoice_dirty
+    pending = batch is not None and any(
+        callback is batch for _, callback, _ in connection.run_on_commit
+    )
+    if not pending:
+        batch = _RefreshBatch(using)
+        connection.patient_summary_batch = batch
+        batch.patient_ids.add(patient_id)
+        transaction.on_commit(batch, using=using)
+    else:
+        batch.patient_ids.add(patient_id)
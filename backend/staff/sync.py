@@ -0,0 +1,200 @@
+"""
+Incremental changes feed for portal and staff clients.
+
+A client syncs with GET .../sync/ and stores the returned `cursor`; the
+next call passes it back as ?since=<cursor> and receives only the
+appointments, invoices, medical records and treatments created or updated
+since then (an index scan on `updated_at`), plus the ids of rows deleted
+since then (from Tombstone, written by post_delete in staff/signals.py).
+Without `since` every row in scope is returned.
+
+Rows are returned oldest change first, at most SYNC_PAGE_SIZE per
+collection. When a collection is truncated `has_more` is true and the
+cursor points at the last row returned, so the client calls again right
+away. Otherwise the cursor is the start of the scan minus
+SYNC_CURSOR_LAG_SECONDS: a transaction that commits late with an older
+`updated_at` is still picked up by the next call. Either way some rows may
+be sent twice, so clients upsert by id.
+
+Bulk writes stamp many rows with one `updated_at`, more than a page can
+hold. The cursor therefore also carries, per collection (and for deletes),
+the pk of the last row returned at exactly the cursor's moment; the next
+call resumes after that (updated_at, pk) instead of re-reading the rows
+that share the timestamp.
+
+A cursor older than SYNC_TOMBSTONE_DAYS may have missed pruned
+tombstones; the feed then answers with every row and `reset: true`, and
+the client replaces its local copy.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .mixins import collect_related_lookups
+from .models import Appointment, Invoice, MedicalRecord, Patient, Tombstone, Treatment
+from .serializers import AppointmentSerializer, InvoiceSerializer, MedicalRecordSerializer, TreatmentSerializer
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Collection:
+    """A model synced by the feed, and the path from it to its patient"""
+
+    def __init__(self, model, serializer_class, patient_path):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.patient_path = patient_path
+        select_related, prefetch_related = collect_related_lookups(serializer_class, model)
+        self.select_related = sorted(select_related)
+        self.prefetch_related = sorted(prefetch_related)
+
+    def queryset(self, patient_user=None):
+        queryset = self.model.objects.select_related(*self.select_related).prefetch_related(*self.prefetch_related)
+        if patient_user is not None:
+            queryset = queryset.filter(**{f'{self.patient_path}__user': patient_user})
+        return queryset
+
+
+COLLECTIONS = {
+    'appointments': Collection(Appointment, AppointmentSerializer, 'patient'),
+    'invoices': Collection(Invoice, InvoiceSerializer, 'patient'),
+    'medical_records': Collection(MedicalRecord, MedicalRecordSerializer, 'patient'),
+    'treatments': Collection(Treatment, TreatmentSerializer, 'appointment__patient'),
+}
+
+COLLECTION_NAMES = {collection.model: name for name, collection in COLLECTIONS.items()}
+
+# Position name of the tombstone stream in a cursor
+DELETED = 'deleted'
+
+_STREAM_MODELS = {**{name: collection.model for name, collection in COLLECTIONS.items()}, DELETED: Tombstone}
+
+
+def encode_cursor(moment, after=None):
+    """
+    The cursor of `moment`. `after` maps a collection (or DELETED) to the pk
+    of the last row returned at exactly `moment`: "<microseconds>[,<name>:<pk>...]".
+    """
+    delta = moment - _EPOCH
+    parts = [str((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)]
+    parts += [f'{name}:{pk}' for name, pk in sorted((after or {}).items())]
+    return ','.join(parts)
+
+
+def decode_cursor(cursor):
+    """(moment, {name: pk}) of a cursor made by encode_cursor()"""
+    try:
+        microseconds, *positions = str(cursor).split(',')
+        moment = _EPOCH + timedelta(microseconds=int(microseconds))
+        after = {}
+        for position in positions:
+            name, pk = position.split(':', 1)
+            after[name] = _STREAM_MODELS[name]._meta.pk.to_python(pk)
+    except (TypeError, ValueError, OverflowError, KeyError, ValidationError):
+        raise InvalidCursor(f'Invalid cursor "{cursor}".')
+    return moment, after
+
+
+def _changed_since(field, moment, after_pk):
+    """Rows at or after `moment`; at exactly `moment`, only those after `after_pk` (when set)"""
+    changed = Q(**{f'{field}__gte': moment})
+    if after_pk is None:
+        return changed
+    # The range condition stays on its own so the timestamp index bounds the scan
+    return changed & (Q(**{f'{field}__gt': moment}) | Q(pk__gt=after_pk))
+
+
+def record_deletion(instance, patient_id):
+    """Write the tombstone of a deleted row of a synced model"""
+    Tombstone.objects.create(
+        collection=COLLECTION_NAMES[type(instance)], object_id=instance.pk, patient_id=patient_id,
+    )
+
+
+def changes_since(since=None, patient_user=None):
+    """
+    The feed payload for rows changed after the `since` cursor (None for a
+    full sync). `patient_user` restricts it to that user's patient records.
+    """
+    started = timezone.now()
+    page_size = settings.SYNC_PAGE_SIZE
+    since_at, after = decode_cursor(since) if since is not None else (None, {})
+    reset = since_at is not None and since_at < started - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    if reset:
+        since_at, after = None, {}
+
+    # (updated_at, pk) of the last row each stream returned, and the streams cut short
+    last = {}
+    truncated = set()
+    changes = {}
+    for name, collection in COLLECTIONS.items():
+        queryset = collection.queryset(patient_user)
+        if since_at is not None:
+            queryset = queryset.filter(_changed_since('updated_at', since_at, after.get(name)))
+        rows = list(queryset.order_by('updated_at', 'pk')[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            truncated.add(name)
+        if rows:
+            last[name] = (rows[-1].updated_at, rows[-1].pk)
+        changes[name] = collection.serializer_class(rows, many=True).data
+
+    deleted = {name: [] for name in COLLECTIONS}
+    if since_at is not None:
+        tombstones = Tombstone.objects.filter(_changed_since('deleted_at', since_at, after.get(DELETED)))
+        if patient_user is not None:
+            tombstones = tombstones.filter(
+                patient_id__in=Subquery(Patient.objects.filter(user=patient_user).values('pk'))
+            )
+        tombstones = list(
+            tombstones.order_by('deleted_at', 'pk').values_list(
+                'collection', 'object_id', 'deleted_at', 'pk'
+            )[:page_size + 1]
+        )
+        if len(tombstones) > page_size:
+            tombstones = tombstones[:page_size]
+            truncated.add(DELETED)
+        if tombstones:
+            last[DELETED] = tombstones[-1][2:]
+        for collection, object_id, _, _ in tombstones:
+            deleted[collection].append(object_id)
+
+    if truncated:
+        # Streams cut later than the earliest cut re-send a few rows, as after a lag
+        cursor_at = min(last[name][0] for name in truncated)
+    else:
+        cursor_at = started - timedelta(seconds=settings.SYNC_CURSOR_LAG_SECONDS)
+        if since_at is not None and since_at > cursor_at:
+            # Not past the lag window yet
+            cursor_at = since_at
+
+    # Rows at exactly cursor_at up to these pks have been sent
+    cursor_after = {}
+    for name in _STREAM_MODELS:
+        if name in last:
+            if last[name][0] == cursor_at:
+                cursor_after[name] = last[name][1]
+        elif cursor_at == since_at and name in after:
+            cursor_after[name] = after[name]
+
+    return {
+        'cursor': encode_cursor(cursor_at, cursor_after),
+        'has_more': bool(truncated),
+        'reset': reset,
+        'changes': changes,
+        'deleted': deleted,
+    }
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than SYNC_TOMBSTONE_DAYS; returns how many"""
+    horizon = (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=horizon).delete()
+    return deleted
@@ -0,0 +1,22 @@
+from jobs.queue import job
+
+from . import billing, summaries, sync
+
+
+@job(cron='0 3 * * *')
+def prune_tombstones():
+    """Delete changes-feed tombstones older than SYNC_TOMBSTONE_DAYS"""
+    return sync.prune_tombstones()
+
+
+@job(cron='0 * * * *')
+def sweep_overdue_invoices():
+    """Move open invoices past their due date to 'overdue'"""
+    marked, reopened = billing.sweep_overdue_invoices()
+    return {'marked': marked, 'reopened': reopened}
+
+
+@job(cron='*/15 * * * *')
+def refresh_started_appointments():
+    """Refresh patient summaries whose next appointment has started"""
+    return summaries.refresh_started_appointments()
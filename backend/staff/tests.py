@@ -1,3 +1,1386 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import AuthToken, User
+from backend import benchmark, concurrency, events, middleware, response_cache
+from backend.cache_backends import LRUFileBasedCache, LRULocMemCache
+from backend.concurrency import run_concurrently
+from backend.db_routers import pin_to_primary, read_from_replica
+from backend.renderers import FastJSONRenderer
+from backend.testing import ClinicTestCase, PASSWORD, seed_clinic
+from jobs import queue
+from . import billing, search, summaries, sync, visits
+from .filters import on_date, date_range
+from .models import (
+    Patient, PatientSummary, Staff, Appointment, Invoice, MedicalRecord, ChronicCondition, Allergy, PastSurgery,
+    Tombstone, Treatment,
+)
+from .views import CALENDAR_MAX_DAYS, InvoiceListView, PatientDetailView
+
+
+class AppointmentDateFilterTests(TestCase):
+    """Date filters on appointments are index-friendly start_time ranges"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(full_name='Dana Doctor', email='dana@example.com', password_hash='x')
+        cls.staff = Staff.objects.create(user=user, first_name='Dana', last_name='Doctor', role_title='Doctor')
+        cls.patient = Patient.objects.create(first_name='Pat', last_name='Patient', email='pat@example.com')
+
+        start = timezone.make_aware(datetime(2025, 3, 10, 9, 0), ZoneInfo('UTC'))
+        for hours in (0, 14, 18, 30):
+            Appointment.objects.create(
+                patient=cls.patient,
+                staff=cls.staff,
+                start_time=start + timedelta(hours=hours),
+                end_time=start + timedelta(hours=hours, minutes=30),
+            )
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables are always cheaper to scan; make the planner show its index choice
+                cursor.execute('SET LOCAL enable_seqscan TO off')
+        return queryset.explain()
+
+    def test_on_date_uses_clinic_time_zone(self):
+        day = date(2025, 3, 10)
+        with timezone.override(ZoneInfo('UTC')):
+            self.assertEqual(Appointment.objects.filter(on_date('start_time', day)).count(), 2)
+        with timezone.override(ZoneInfo('America/New_York')):
+            # 03:00 UTC on the 11th is still 23:00 on the 10th in New York
+            self.assertEqual(Appointment.objects.filter(on_date('start_time', day)).count(), 3)
+        with timezone.override(ZoneInfo('Asia/Tokyo')):
+            # 23:00 UTC on the 10th is already the 11th in Tokyo
+            self.assertEqual(Appointment.objects.filter(on_date('start_time', day)).count(), 1)
+
+    def test_date_range_matches_date_lookup(self):
+        start, end = date(2025, 3, 10), date(2025, 3, 11)
+        for tz in ('UTC', 'America/New_York', 'Asia/Tokyo'):
+            with timezone.override(ZoneInfo(tz)):
+                expected = set(Appointment.objects.filter(
+                    start_time__date__gte=start, start_time__date__lte=end
+                ).values_list('pk', flat=True))
+                actual = set(Appointment.objects.filter(
+                    date_range('start_time', start, end)
+                ).values_list('pk', flat=True))
+                self.assertEqual(actual, expected)
+
+    def test_range_filter_does_not_cast_column(self):
+        sql = str(Appointment.objects.filter(on_date('start_time', date(2025, 3, 10))).query)
+        self.assertNotIn('CAST', sql.upper())
+        self.assertNotIn('DJANGO_DATETIME_CAST_DATE', sql.upper())
+
+    def test_staff_day_filter_uses_staff_start_index(self):
+        queryset = Appointment.objects.filter(on_date('start_time', date(2025, 3, 10)), staff=self.staff)
+        self.assertIn('appointments_staff_start_idx', self.explain(queryset))
+
+    def test_patient_range_filter_uses_patient_start_index(self):
+        queryset = Appointment.objects.filter(
+            date_range('start_time', date(2025, 3, 1), date(2025, 3, 31)), patient=self.patient
+        )
+        self.assertIn('appointments_patient_start_idx', self.explain(queryset))
+
+    def test_status_range_filter_uses_status_start_index(self):
+        queryset = Appointment.objects.filter(
+            date_range('start_time', start=date(2025, 3, 10)), status='scheduled'
+        )
+        self.assertIn('appointments_status_start_idx', self.explain(queryset))
+
+
+class StaffEndpointQueryBudgetTests(ClinicTestCase):
+    """Every staff route stays within its query budget on the seeded clinic"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.appointment = Appointment.objects.filter(staff=cls.doctor, status='completed').first()
+        cls.upcoming = Appointment.objects.filter(staff=cls.doctor, status='scheduled').first()
+        cls.invoice = Invoice.objects.filter(appointment=cls.appointment).first()
+        cls.record = MedicalRecord.objects.filter(appointment=cls.appointment).first()
+        cls.condition = ChronicCondition.objects.filter(patient=cls.patient).first()
+        cls.allergy = Allergy.objects.filter(patient=cls.patient).first()
+        cls.surgery = PastSurgery.objects.filter(patient=cls.patient).first()
+
+    def test_dashboard_stats(self):
+        self.assertQueryBudget(11, 'GET', '/api/staff/dashboard/stats/', user=self.doctor.user)
+
+    def test_staff_profile(self):
+        self.assertQueryBudget(4, 'GET', '/api/staff/profile/', user=self.doctor.user)
+
+    def test_staff_reports(self):
+        self.assertQueryBudget(14, 'GET', '/api/staff/reports/', user=self.doctor.user)
+
+    def test_query_samples(self):
+        self.assertQueryBudget(3, 'GET', '/api/staff/diagnostics/queries/', user=self.doctor.user)
+
+    def test_patient_list(self):
+        self.assertQueryBudget(6, 'GET', '/api/staff/patients/', user=self.doctor.user)
+
+    def test_patient_list_search(self):
+        self.assertQueryBudget(7, 'GET', '/api/staff/patients/', {'search': 'Family3'}, user=self.doctor.user)
+
+    def test_patient_detail(self):
+        self.assertQueryBudget(9, 'GET', f'/api/staff/patients/{self.patient.patient_id}/', user=self.doctor.user)
+
+    def test_patient_search(self):
+        self.assertQueryBudget(4, 'GET', '/api/staff/patients/search/', {'q': 'Patient1'}, user=self.doctor.user)
+
+    def test_nurses(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/nurses/', user=self.doctor.user)
+
+    def test_appointment_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/appointments/', user=self.doctor.user)
+
+    def test_appointment_list_for_day(self):
+        self.assertQueryBudget(
+            5, 'GET', '/api/staff/appointments/',
+            {'staff': str(self.doctor.staff_id), 'date': str(self.upcoming.start_time.date())},
+            user=self.doctor.user,
+        )
+
+    def test_appointment_calendar(self):
+        today = timezone.localdate()
+        self.assertQueryBudget(
+            5, 'GET', '/api/staff/appointments/calendar/',
+            {'start': str(today - timedelta(days=30)), 'end': str(today + timedelta(days=30))},
+            user=self.doctor.user,
+        )
+
+    def test_appointment_detail(self):
+        self.assertQueryBudget(4, 'GET', f'/api/staff/appointments/{self.appointment.appointment_id}/', user=self.doctor.user)
+
+    def test_appointment_update(self):
+        self.assertQueryBudget(
+            4, 'PATCH', f'/api/staff/appointments/{self.upcoming.appointment_id}/',
+            {'status': 'confirmed'}, user=self.doctor.user,
+        )
+
+    def test_appointment_complete(self):
+        services = self.clinic['services']
+        self.assertQueryBudget(
+            15, 'POST', f'/api/staff/appointments/{self.upcoming.appointment_id}/complete/',
+            {
+                'record': {'notes': 'Sensitivity', 'outcome': 'Filled'},
+                'treatments': [{'service': str(service.service_id)} for service in services[:4]],
+                'diagnoses': [{'notes': 'Ibuprofen'}, {'notes': 'Mouthwash'}],
+                'nurse': str(self.nurse.staff_id),
+            },
+            user=self.doctor.user, status_code=201,
+        )
+
+    def test_treatment_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/treatments/', user=self.doctor.user)
+
+    def test_treatment_create(self):
+        self.assertQueryBudget(
+            8, 'POST', '/api/staff/treatments/',
+            {'appointment': str(self.appointment.appointment_id), 'service': str(self.clinic['services'][1].service_id)},
+            user=self.doctor.user, status_code=201,
+        )
+
+    def test_treatment_bulk_create(self):
+        self.assertQueryBudget(
+            7, 'POST', '/api/staff/treatments/bulk/',
+            [
+                {'appointment': str(self.appointment.appointment_id), 'service': str(service.service_id)}
+                for service in self.clinic['services']
+            ],
+            user=self.doctor.user, status_code=201,
+        )
+
+    def test_medical_record_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/medical-records/', user=self.doctor.user)
+
+    def test_medical_record_create(self):
+        self.assertQueryBudget(
+            7, 'POST', '/api/staff/medical-records/',
+            {
+                'patient': str(self.patient.patient_id), 'staff': str(self.doctor.staff_id),
+                'appointment': str(self.upcoming.appointment_id), 'notes': 'Follow-up',
+            },
+            user=self.doctor.user, status_code=201,
+        )
+
+    def test_diagnosis_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/diagnoses/', user=self.doctor.user)
+
+    def test_diagnosis_bulk_create(self):
+        self.assertQueryBudget(
+            6, 'POST', '/api/staff/diagnoses/bulk/',
+            [{'record': str(self.record.record_id), 'notes': f'Medication {index}'} for index in range(6)],
+            user=self.doctor.user, status_code=201,
+        )
+
+    def test_invoice_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/invoices/', user=self.doctor.user)
+
+    def test_invoice_detail(self):
+        self.assertQueryBudget(4, 'GET', f'/api/staff/invoices/{self.invoice.invoice_id}/', user=self.doctor.user)
+
+    def test_recalculate_invoice(self):
+        self.assertQueryBudget(
+            8, 'POST', f'/api/staff/appointments/{self.appointment.appointment_id}/recalculate-invoice/',
+            user=self.doctor.user,
+        )
+
+    def test_payment_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/payments/', user=self.doctor.user)
+
+    def test_sync(self):
+        self.assertQueryBudget(7, 'GET', '/api/staff/sync/', user=self.doctor.user)
+
+    def test_service_list(self):
+        self.assertQueryBudget(5, 'GET', '/api/staff/services/', user=self.doctor.user)
+
+    def test_chronic_conditions(self):
+        self.assertQueryBudget(
+            5, 'GET', '/api/staff/chronic-conditions/', {'patient_id': str(self.patient.patient_id)}, user=self.doctor.user
+        )
+        self.assertQueryBudget(4, 'GET', f'/api/staff/chronic-conditions/{self.condition.condition_id}/', user=self.doctor.user)
+
+    def test_allergies(self):
+        self.assertQueryBudget(
+            5, 'GET', '/api/staff/allergies/', {'patient_id': str(self.patient.patient_id)}, user=self.doctor.user
+        )
+        self.assertQueryBudget(4, 'GET', f'/api/staff/allergies/{self.allergy.allergy_id}/', user=self.doctor.user)
+
+    def test_past_surgeries(self):
+        self.assertQueryBudget(
+            5, 'GET', '/api/staff/past-surgeries/', {'patient_id': str(self.patient.patient_id)}, user=self.doctor.user
+        )
+        self.assertQueryBudget(4, 'GET', f'/api/staff/past-surgeries/{self.surgery.surgery_id}/', user=self.doctor.user)
+
+
+class PatientSearchTests(ClinicTestCase):
+    """Patient search ranks close matches first and tolerates typos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.thompson = Patient.objects.create(first_name='Margaret', last_name='Thompson', email='mt@clinic.test')
+        cls.thompsett = Patient.objects.create(first_name='Margot', last_name='Thompsett', email='mts@clinic.test')
+
+    def found(self, term):
+        return list(search.search_patients(term).values_list('pk', flat=True))
+
+    def test_exact_match_ranks_first(self):
+        found = self.found('thompson')
+        self.assertEqual(found[:2], [self.thompson.pk, self.thompsett.pk])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.found('thomspon')[0], self.thompson.pk)
+        self.assertIn(self.thompson.pk, self.found('margaret thompsom'))
+        self.assertEqual(self.found('zzqqxx'), [])
+
+    def test_search_endpoint_ranks_results(self):
+        response = self.client.get(
+            '/api/staff/patients/search/', {'q': 'Thompson'},
+            HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}',
+        )
+        self.assertEqual(response.json()['results'][0]['patient_id'], str(self.thompson.pk))
+
+    @skipUnless(connection.vendor == 'sqlite', 'the FTS5 shadow table is SQLite-only')
+    def test_shadow_table_follows_save_and_delete(self):
+        self.thompson.last_name = 'Whitfield'
+        self.thompson.save()
+        self.assertEqual(self.found('whitfield'), [self.thompson.pk])
+        self.assertNotIn(self.thompson.pk, self.found('thompson'))
+
+        patient_id = self.thompson.pk
+        self.thompson.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {search.SQLITE_TABLE} WHERE patient_id = %s', [patient_id.hex])
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(self.found('whitfield'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm is PostgreSQL-only')
+    def test_threshold_does_not_depend_on_the_session(self):
+        # A pooled server session may carry another client's threshold, or the default
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', '0.9', false)")
+        self.assertEqual(self.found('thomspon')[0], self.thompson.pk)
+
+
+class BenchmarkTests(ClinicTestCase):
+    """The load benchmark drives every role through the URLconf"""
+
+    def test_percentile_interpolates(self):
+        values = [10, 20, 30, 40]
+        self.assertEqual(benchmark.percentile(values, 0), 10)
+        self.assertEqual(benchmark.percentile(values, 50), 25)
+        self.assertEqual(benchmark.percentile(values, 100), 40)
+        self.assertIsNone(benchmark.percentile([], 95))
+
+    def test_parse_mix(self):
+        self.assertEqual(benchmark.parse_mix('portal=2,admin'), {'portal': 2.0, 'admin': 1.0})
+        with self.assertRaises(ValueError):
+            benchmark.parse_mix('visitors=1')
+
+    def test_run_reports_every_role(self):
+        report = benchmark.run(
+            benchmark.ClientTransport(), {'portal': 1, 'staff': 1, 'admin': 1},
+            concurrency=1, duration=1, warmup=0, password=PASSWORD, writes=False,
+        )
+        summary = report['summary']
+        self.assertGreater(summary['requests'], 0)
+        self.assertEqual(summary['errors'], 0, report['endpoints'])
+        self.assertIsNotNone(summary['latency_ms']['p99'])
+        self.assertIsNotNone(summary['queries']['mean'])
+        self.assertEqual(report['meta']['skipped_roles'], [])
+        self.assertNotIn('book', report['endpoints'])
+
+
+@skipUnless('replica' in settings.DATABASES, 'no replica database configured')
+class ReplicaRoutingTests(TransactionTestCase):
+    """Opted-in reads use the replica (a mirror of the test database) unless the user just wrote"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        clinic = seed_clinic(doctors=1, nurses=1, patients=2, appointments_per_patient=3)
+        self.doctor = clinic['doctors'][0]
+        self.record = MedicalRecord.objects.filter(staff=self.doctor).first()
+        token = AuthToken.objects.create(user=self.doctor.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def test_router(self):
+        self.assertEqual(Patient.objects.all().db, 'default')
+        with read_from_replica():
+            self.assertEqual(Patient.objects.all().db, 'replica')
+            self.assertEqual(router.db_for_write(Patient), 'default')
+            with transaction.atomic():
+                self.assertEqual(Patient.objects.all().db, 'default')
+        self.assertEqual(Patient.objects.all().db, 'default')
+
+    def get_patients(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get('/api/staff/patients/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return len(replica_queries)
+
+    def test_list_reads_replica_until_the_user_writes(self):
+        self.assertGreater(self.get_patients(), 0)
+
+        response = self.client.post(
+            '/api/staff/diagnoses/bulk/', [{'record': str(self.record.record_id), 'icd10_code': 'K02.1'}],
+            content_type='application/json', **self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_patients(), 0)
+
+        # The pin expires
+        caches['shared'].clear()
+        self.assertGreater(self.get_patients(), 0)
+
+    def test_function_view_reads_replica(self):
+        pin_to_primary(self.doctor.user)
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.client.get('/api/staff/dashboard/stats/', **self.auth)
+        self.assertEqual(len(replica_queries), 0)
+
+        caches['shared'].clear()
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.assertEqual(self.client.get('/api/staff/dashboard/stats/', **self.auth).status_code, 200)
+        self.assertGreater(len(replica_queries), 0)
+
+
+class ConcurrentFanOutTests(TransactionTestCase):
+    """Dashboard queries run on worker threads, each over its own connection"""
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = seed_clinic(doctors=1, nurses=1, patients=3, appointments_per_patient=3)['doctors'][0]
+        token = AuthToken.objects.create(user=self.doctor.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def thread_name(self):
+        Patient.objects.count()
+        return threading.current_thread().name
+
+    def test_runs_on_worker_threads(self):
+        results = run_concurrently({'a': self.thread_name, 'b': self.thread_name, 'c': self.thread_name})
+        # The caller keeps the first task and hands the others to workers
+        self.assertEqual(results['a'], threading.current_thread().name)
+        self.assertTrue(results['b'].startswith('db-fanout') and results['c'].startswith('db-fanout'), results)
+
+    def test_serial_inside_a_transaction(self):
+        with transaction.atomic():
+            results = run_concurrently({'a': self.thread_name, 'b': self.thread_name})
+        self.assertEqual(set(results.values()), {threading.current_thread().name})
+
+    def test_caller_runs_tasks_while_workers_are_busy(self):
+        _, slots = concurrency._get_executor()
+        held = 0
+        while slots.acquire(blocking=False):
+            held += 1
+        try:
+            # e.g. every worker is serving another request's fan-out
+            results = run_concurrently({'a': self.thread_name, 'b': self.thread_name, 'c': self.thread_name})
+        finally:
+            for _ in range(held):
+                slots.release()
+        self.assertEqual(set(results.values()), {threading.current_thread().name})
+
+    def test_workers_close_their_connections(self):
+        closed_on = []
+        close_all = connections.close_all
+
+        def record_close_all():
+            closed_on.append(threading.current_thread().name)
+            close_all()
+
+        with mock.patch.object(concurrency.connections, 'close_all', side_effect=record_close_all):
+            results = run_concurrently({'a': self.thread_name, 'b': self.thread_name})
+        self.assertEqual(closed_on, [results['b']])
+
+    def test_nested_calls_run_serially(self):
+        def outer():
+            inner = run_concurrently({'a': self.thread_name, 'b': self.thread_name})
+            return threading.current_thread().name, set(inner.values())
+
+        for name, inner_names in run_concurrently({'x': outer, 'y': outer}).values():
+            self.assertEqual(inner_names, {name})
+
+    def dashboard(self):
+        cache.clear()
+        response = self.client.get('/api/staff/dashboard/stats/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        queries = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        return response.json(), queries
+
+    def test_dashboard_matches_serial_run(self):
+        concurrent, concurrent_queries = self.dashboard()
+        with override_settings(DB_FANOUT_CONCURRENCY=1):
+            serial, serial_queries = self.dashboard()
+        self.assertEqual(concurrent, serial)
+        # Queries on worker threads are counted by the instrumentation middleware
+        self.assertEqual(concurrent_queries, serial_queries)
+
+
+class LRUCacheBackendTests(SimpleTestCase):
+    """Both cache backends evict the least recently read entry and count hits and misses"""
+
+    def fill_and_evict(self, backend, age=None):
+        for key in 'abc':
+            backend.set(key, key.upper())
+        if age:
+            age()
+        self.assertEqual(backend.get('a'), 'A')
+        self.assertIsNone(backend.get('missing'))
+        backend.set('d', 'D')
+
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual([backend.get(key) for key in 'acd'], ['A', 'C', 'D'])
+        stats = backend.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (4, 2, 1))
+        self.assertEqual(stats['entries'], 3)
+
+    def test_locmem(self):
+        backend = LRULocMemCache('lru-test', {'OPTIONS': {'MAX_ENTRIES': 3}})
+        backend.clear()
+        backend.reset_stats()
+        self.fill_and_evict(backend)
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = LRUFileBasedCache(directory, {'OPTIONS': {'MAX_ENTRIES': 3}})
+            backend.reset_stats()
+
+            def age():
+                # Files written within the same clock tick: order them explicitly
+                for offset, key in enumerate('abc'):
+                    os.utime(backend._key_to_file(key), (1000 + offset, 1000 + offset))
+
+            self.fill_and_evict(backend, age)
+
+
+class ResponseCacheTests(ClinicTestCase):
+    """Cached responses are per user and invalidated by changes to the models they read"""
+
+    def get(self, path, user):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.token_for(user)}')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_function_view(self):
+        path = '/api/staff/dashboard/stats/'
+        first, first_queries = self.get(path, self.doctor.user)
+        second, second_queries = self.get(path, self.doctor.user)
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.json(), second.json())
+        self.assertLess(second_queries, first_queries)
+
+        other_doctor = self.clinic['doctors'][1].user
+        self.assertEqual(self.get(path, other_doctor)[0]['X-Cache'], 'MISS')
+
+        appointment = Appointment.objects.filter(staff=self.doctor).first()
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.assertEqual(self.get(path, self.doctor.user)[0]['X-Cache'], 'MISS')
+
+    def test_generic_view_and_query_params(self):
+        path = '/api/staff/appointments/'
+        self.assertEqual(self.get(path, self.doctor.user)[0]['X-Cache'], 'MISS')
+        self.assertEqual(self.get(path, self.doctor.user)[0]['X-Cache'], 'HIT')
+        self.assertEqual(self.get(path + '?status=completed', self.doctor.user)[0]['X-Cache'], 'MISS')
+
+        # bulk_create sends no signals; the bulk endpoint bumps the versions itself
+        record = MedicalRecord.objects.filter(staff=self.doctor).first()
+        response = self.client.post(
+            '/api/staff/diagnoses/bulk/', [{'record': str(record.record_id), 'icd10_code': 'K02.1'}],
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get('/api/staff/diagnoses/', self.doctor.user)[0]['X-Cache'], 'MISS')
+        self.assertEqual(self.get('/api/staff/diagnoses/', self.doctor.user)[0]['X-Cache'], 'HIT')
+        self.client.post(
+            '/api/staff/diagnoses/bulk/', [{'record': str(record.record_id), 'icd10_code': 'K02.2'}],
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}',
+        )
+        response, _ = self.get('/api/staff/diagnoses/', self.doctor.user)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+
+    @skipUnless(settings.SHARED_CACHE_BACKEND != 'locmem', 'the shared cache is per process')
+    def test_write_in_another_process_invalidates(self):
+        # The test caches are per process: share a file cache in a scratch directory instead
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {'BACKEND': 'backend.cache_backends.LRUFileBasedCache', 'LOCATION': directory}
+            with override_settings(CACHES=dict(settings.CACHES, shared=shared)):
+                path = '/api/staff/appointments/'
+                self.assertEqual(self.get(path, self.doctor.user)[0]['X-Cache'], 'MISS')
+                self.assertEqual(self.get(path, self.doctor.user)[0]['X-Cache'], 'HIT')
+
+                # e.g. another web worker, or run_worker, saving an appointment
+                subprocess.run(
+                    [sys.executable, '-c', (
+                        'import django; django.setup(); '
+                        'from backend.response_cache import bump_model_versions; '
+                        'from staff.models import Appointment; bump_model_versions(Appointment)'
+                    )],
+                    cwd=settings.BASE_DIR, check=True,
+                    env=dict(
+                        os.environ, DATABASE_URL=f'sqlite:///{directory}/unused.sqlite3',
+                        SHARED_CACHE_BACKEND='file', SHARED_CACHE_LOCATION=directory,
+                    ),
+                )
+                self.assertEqual(self.get(path, self.doctor.user)[0]['X-Cache'], 'MISS')
+
+    def test_stamps_and_pins_are_in_the_shared_cache(self):
+        self.get('/api/staff/appointments/', self.doctor.user)
+        self.assertIsNotNone(caches['shared'].get('model-version:staff.appointment'))
+        self.assertIsNone(cache.get('model-version:staff.appointment'))
+
+        pin_to_primary(self.doctor.user)
+        self.assertTrue(caches['shared'].get(f'replica-pin:{self.doctor.user.pk}'))
+
+    def test_dashboard_keeps_its_short_timeout(self):
+        with mock.patch.object(response_cache.cache, 'set', wraps=response_cache.cache.set) as cache_set:
+            self.get('/api/staff/dashboard/stats/', self.doctor.user)
+        self.assertEqual(cache_set.call_args.args[2], settings.STAFF_DASHBOARD_CACHE_SECONDS)
+
+class ConditionalGetTests(ClinicTestCase):
+    """List and detail views answer 304 while the rows they read are unchanged"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.appointment = Appointment.objects.filter(staff=cls.doctor, status='completed').first()
+        cls.invoice = Invoice.objects.filter(appointment=cls.appointment).first()
+
+    def get(self, path, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                path, HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}', **headers
+            )
+        return response, len(queries)
+
+    def test_list(self):
+        path = '/api/staff/invoices/'
+        first, first_queries = self.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        not_modified, queries = self.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        self.assertEqual(not_modified.content, b'')
+        self.assertLess(queries, first_queries)
+
+        self.assertEqual(self.get(path, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])[0].status_code, 304)
+        # Other query parameters are another representation
+        self.assertEqual(self.get(path + '?status=paid', HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, 200)
+
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+        invoice.status = 'paid'
+        invoice.save()
+        changed, _ = self.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_detail_and_related_change(self):
+        path = f'/api/staff/appointments/{self.appointment.appointment_id}/'
+        first, _ = self.get(path)
+        self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, 304)
+
+        # The payload embeds the patient's name
+        patient = self.appointment.patient
+        patient.last_name = 'Renamed'
+        patient.save()
+        self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, 200)
+        self.assertEqual(self.get('/api/staff/appointments/not-a-uuid/')[0].status_code, 404)
+
+
+    def test_patient_detail(self):
+        path = f'/api/staff/patients/{self.appointment.patient_id}/'
+        first, _ = self.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, 304)
+
+    def backdate(self, view):
+        # Last-Modified has one-second resolution: date the current state a minute back
+        # so a change made now is later than it
+        past = timezone.now() - timedelta(minutes=1)
+        for model in view.cache_models:
+            if any(field.name == 'updated_at' for field in model._meta.get_fields()):
+                model.objects.update(updated_at=past)
+        caches['shared'].set_many(
+            {f'model-version:{model._meta.label_lower}': f'{past.timestamp()}:old' for model in view.cache_models}
+        )
+
+    def test_last_modified_follows_deletes_and_related_changes(self):
+        path = f'/api/staff/patients/{self.appointment.patient_id}/'
+        self.backdate(PatientDetailView)
+        first, _ = self.get(path)
+        self.assertEqual(self.get(path, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])[0].status_code, 304)
+        # An invoice under the patient changes; the patient row does not
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+        invoice.status = 'paid'
+        invoice.save()
+        self.assertEqual(self.get(path, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])[0].status_code, 200)
+
+        path = '/api/staff/invoices/'
+        self.backdate(InvoiceListView)
+        first, _ = self.get(path)
+        self.assertEqual(self.get(path, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])[0].status_code, 304)
+        Invoice.objects.filter(pk=self.invoice.pk).delete()
+        self.assertEqual(self.get(path, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])[0].status_code, 200)
+
+class FastJSONRendererTests(SimpleTestCase):
+    """The default renderer encodes model values natively, like DRF's encoder"""
+
+    data = {
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'date': date(2025, 3, 1),
+        'price': Decimal('12.50'),
+        'name': 'Zoë',
+        'rows': [{'count': 2}],
+    }
+
+    def test_matches_drf_encoding(self):
+        fast = json.loads(FastJSONRenderer().render(self.data))
+        self.assertEqual(fast, json.loads(JSONRenderer().render(self.data)))
+        self.assertEqual(fast['price'], 12.5)
+
+    def test_indented_output_uses_drf(self):
+        rendered = FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        self.assertEqual(rendered, JSONRenderer().render(self.data, 'application/json; indent=2'))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class QueryInstrumentationTests(ClinicTestCase):
+    """Responses report their SQL in Server-Timing; repeated statement shapes are flagged"""
+
+    def setUp(self):
+        super().setUp()
+        middleware.clear_samples()
+
+    def test_server_timing_header(self):
+        token = self.token_for(self.doctor.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/staff/patients/', HTTP_AUTHORIZATION=f'Token {token}')
+        match = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+', response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(int(match.group(1)), len(queries))
+
+    @override_settings(QUERY_INSPECTION_REPEAT_THRESHOLD=5, QUERY_INSPECTION_SLOW_REQUEST_MS=60000)
+    def test_repeated_queries_are_flagged(self):
+        patient_ids = [patient.pk for patient in self.clinic['patients'][:6]]
+
+        def n_plus_one(request):
+            for patient_id in patient_ids:
+                Appointment.objects.filter(patient_id=patient_id).count()
+            return HttpResponse()
+
+        instrumented = middleware.QueryInstrumentationMiddleware(n_plus_one)
+        with self.assertLogs('backend.queries', 'WARNING') as logs:
+            response = instrumented(RequestFactory().get('/loop/'))
+
+        self.assertIn('desc="6 queries"', response['Server-Timing'])
+        self.assertEqual(json.loads(logs.records[0].getMessage())['repeated'], 1)
+        sample = middleware.recent_samples()[0]
+        self.assertEqual(sample['path'], '/loop/')
+        self.assertEqual([shape['count'] for shape in sample['repeated']], [6])
+        self.assertIn('appointments', sample['repeated'][0]['fingerprint'])
+
+    @override_settings(QUERY_INSPECTION_SLOW_REQUEST_MS=60000)
+    def test_distinct_queries_are_not_flagged(self):
+        def few_queries(request):
+            Patient.objects.count()
+            Appointment.objects.count()
+            return HttpResponse()
+
+        with self.assertLogs('backend.queries', 'INFO') as logs:
+            middleware.QueryInstrumentationMiddleware(few_queries)(RequestFactory().get('/few/'))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(middleware.recent_samples(), [])
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            middleware.fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x''y' AND pk IN (%s, %s, %s)"),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)',
+        )
+
+
+class AppointmentCalendarTests(ClinicTestCase):
+    """The calendar returns parallel columns indexing deduplicated lookup tables"""
+
+    def calendar(self, start, end, **params):
+        return self.client.get(
+            '/api/staff/appointments/calendar/', {'start': str(start), 'end': str(end), **params},
+            HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}',
+        )
+
+    def test_columnar_payload(self):
+        today = timezone.localdate()
+        start, end = today - timedelta(days=20), today + timedelta(days=20)
+        response = self.calendar(start, end)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        columns = data['appointments']
+        self.assertEqual({len(column) for column in columns.values()}, {len(columns['ids'])})
+        self.assertEqual(len(set(data['patients']['ids'])), len(data['patients']['ids']))
+        self.assertEqual(len(data['patients']['ids']), len(data['patients']['names']))
+
+        origin = datetime.fromisoformat(data['origin'].replace('Z', '+00:00'))
+        expected = Appointment.objects.filter(
+            staff=self.doctor, start_time__date__gte=start, start_time__date__lte=end,
+        ).select_related('patient', 'nurse__user').order_by('start_time')
+        self.assertEqual(columns['ids'], [str(appointment.pk) for appointment in expected])
+        self.assertGreater(len(columns['ids']), 0)
+        for index, appointment in enumerate(expected):
+            self.assertEqual(origin + timedelta(seconds=columns['start'][index]), appointment.start_time)
+            self.assertEqual(
+                columns['duration'][index], (appointment.end_time - appointment.start_time).total_seconds(),
+            )
+            self.assertEqual(data['statuses'][columns['status'][index]], appointment.status)
+            patient = columns['patient'][index]
+            self.assertEqual(data['patients']['ids'][patient], str(appointment.patient_id))
+            self.assertEqual(data['patients']['names'][patient], appointment.patient.full_name)
+            nurse = columns['nurse'][index]
+            if appointment.nurse_id is None:
+                self.assertIsNone(nurse)
+            else:
+                self.assertEqual(data['nurses']['names'][nurse], appointment.nurse.user.full_name)
+
+    def test_invalid_ranges_are_rejected(self):
+        today = timezone.localdate()
+        too_long = self.calendar(today, today + timedelta(days=CALENDAR_MAX_DAYS))
+        self.assertEqual(too_long.status_code, 400)
+        self.assertEqual(self.calendar(today, today + timedelta(days=CALENDAR_MAX_DAYS - 1)).status_code, 200)
+        self.assertEqual(self.calendar(today, today - timedelta(days=1)).status_code, 400)
+        self.assertEqual(self.calendar('yesterday', today).status_code, 400)
+        self.assertEqual(self.calendar(today, today, staff='not-a-uuid').status_code, 400)
+
+
+class VisitCompletionTests(ClinicTestCase):
+    """A visit is completed whole or not at all"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.upcoming = Appointment.objects.filter(staff=cls.doctor, status='scheduled').first()
+        cls.completed = Appointment.objects.filter(staff=cls.doctor, status='completed').first()
+        cls.service = cls.clinic['services'][2]
+        # Issued up front, so a failed completion must leave its total alone
+        Invoice.objects.create(
+            patient=cls.upcoming.patient, appointment=cls.upcoming, total_amount=Decimal('0'),
+            due_date=timezone.localdate() + timedelta(days=30),
+        )
+
+    def complete(self, appointment, data, user=None):
+        return self.client.post(
+            f'/api/staff/appointments/{appointment.pk}/complete/', data, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token_for(user or self.doctor.user)}',
+        )
+
+    def snapshot(self, appointment):
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        return (
+            appointment.status, appointment.medical_record_id,
+            MedicalRecord.objects.filter(appointment=appointment).count(),
+            Treatment.objects.filter(appointment=appointment).count(),
+            list(Invoice.objects.filter(appointment=appointment).values_list('total_amount', flat=True)),
+        )
+
+    def assertRejected(self, appointment, data, status_code, message, user=None):
+        before = self.snapshot(appointment)
+        response = self.complete(appointment, data, user)
+        self.assertEqual(response.status_code, status_code, response.content)
+        if message:
+            self.assertIn(message, response.json()['error'])
+        self.assertEqual(self.snapshot(appointment), before)
+
+    def test_completed_visit_is_rejected(self):
+        self.assertRejected(self.completed, {'record': {'notes': 'Again'}}, 400, 'already been completed')
+
+    def test_other_doctor_is_rejected(self):
+        other = self.clinic['doctors'][1]
+        self.assertRejected(self.upcoming, {'record': {'notes': 'Not mine'}}, 403, "appointment's doctor", other.user)
+
+    def test_bad_treatments_are_rejected(self):
+        self.assertRejected(
+            self.upcoming, {'treatments': [{'service': str(self.service.pk)}, {'service': str(uuid.uuid4())}]},
+            400, 'Unknown service',
+        )
+        self.assertRejected(self.upcoming, {'treatments': [{'actual_cost': 'free'}]}, 400, None)
+
+    def test_failure_midway_rolls_back_the_whole_visit(self):
+        before = self.snapshot(self.upcoming)
+        with mock.patch.object(visits, 'recalculate_invoice_totals', side_effect=RuntimeError('invoice')):
+            with self.assertRaises(RuntimeError):
+                visits.complete_visit(
+                    self.upcoming.pk, record={'chief_complaint': 'Pain'},
+                    treatments=[{'service': self.service.pk}], diagnoses=[{'notes': 'Caries'}],
+                )
+        self.assertEqual(self.snapshot(self.upcoming), before)
+
+
+class BulkCreateTests(ClinicTestCase):
+    """A bulk create saves every item or none, reporting errors per item index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.appointment = Appointment.objects.filter(patient=cls.patient, status='completed').first()
+
+    def post(self, path, items):
+        return self.client.post(
+            path, items, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}',
+        )
+
+    def item(self, **fields):
+        return {'appointment': str(self.appointment.pk), 'service': str(self.clinic['services'][0].pk), **fields}
+
+    def test_invalid_item_rejects_the_batch(self):
+        before = Treatment.objects.count()
+        response = self.post('/api/staff/treatments/bulk/', [self.item(), self.item(actual_cost='lots'), self.item()])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'1': {'actual_cost': ['A valid number is required.']}})
+        self.assertEqual(Treatment.objects.count(), before)
+
+    def test_unknown_related_pks_are_reported_per_item(self):
+        before = Treatment.objects.count()
+        missing_appointment, missing_service = uuid.uuid4(), uuid.uuid4()
+        response = self.post('/api/staff/treatments/bulk/', [
+            self.item(),
+            self.item(appointment=str(missing_appointment)),
+            self.item(service=str(missing_service)),
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            '1': {'appointment': [f'Invalid pk "{missing_appointment}" - object does not exist.']},
+            '2': {'service': [f'Invalid pk "{missing_service}" - object does not exist.']},
+        })
+        self.assertEqual(Treatment.objects.count(), before)
+
+    def test_batch_shape_is_checked(self):
+        for items in [[], {'record': 'x'}, [self.item()] * 101]:
+            response = self.post('/api/staff/treatments/bulk/', items)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('non_field_errors', response.json())
+
+
+class InvoiceTotalTests(ClinicTestCase):
+    """Treatment changes recalculate their invoices once, at commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.first, cls.second = Invoice.objects.filter(appointment__isnull=False).order_by('pk')[:2]
+        cls.service = cls.clinic['services'][3]
+
+    def setUp(self):
+        super().setUp()
+        # setUpTestData's transaction never commits, so its batch would stay pending
+        connection.invoice_recalculation_batch = None
+
+    def committed(self):
+        connection.invoice_recalculation_batch = None
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def total(self, invoice):
+        return Invoice.objects.get(pk=invoice.pk).total_amount
+
+    def treatment_sum(self, invoice):
+        return sum(
+            (t.actual_cost if t.actual_cost is not None else t.service.price
+             for t in Treatment.objects.filter(appointment_id=invoice.appointment_id).select_related('service')),
+            Decimal('0'),
+        )
+
+    def test_create_update_and_delete(self):
+        before = self.total(self.first)
+        with self.committed():
+            treatment = Treatment.objects.create(appointment_id=self.first.appointment_id, service=self.service)
+        self.assertEqual(self.total(self.first), before + self.service.price)
+
+        with self.committed():
+            treatment.actual_cost = Decimal('10.00')
+            treatment.save()
+        self.assertEqual(self.total(self.first), before + Decimal('10.00'))
+
+        with self.committed():
+            treatment.delete()
+        self.assertEqual(self.total(self.first), before)
+
+    def test_moving_a_treatment_recalculates_both_invoices(self):
+        treatment = Treatment.objects.filter(appointment_id=self.first.appointment_id).first()
+        with self.committed():
+            treatment = Treatment.objects.get(pk=treatment.pk)
+            treatment.appointment_id = self.second.appointment_id
+            treatment.save()
+        self.assertEqual(self.total(self.first), self.treatment_sum(self.first))
+        self.assertEqual(self.total(self.second), self.treatment_sum(self.second))
+
+    def test_changes_in_one_transaction_share_one_recalculation(self):
+        with self.committed() as callbacks:
+            Treatment.objects.create(appointment_id=self.first.appointment_id, service=self.service)
+            Treatment.objects.create(appointment_id=self.second.appointment_id, service=self.service)
+            Treatment.objects.create(appointment_id=self.second.appointment_id, actual_cost=Decimal('5.00'))
+        self.assertEqual(sum(isinstance(callback, billing._RecalculationBatch) for callback in callbacks), 1)
+        self.assertEqual(self.total(self.first), self.treatment_sum(self.first))
+        self.assertEqual(self.total(self.second), self.treatment_sum(self.second))
+
+    def test_rolled_back_changes_leave_totals_alone(self):
+        before = self.total(self.first)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Treatment.objects.create(appointment_id=self.first.appointment_id, service=self.service)
+                raise RuntimeError
+        self.assertEqual(self.total(self.first), before)
+
+        # The rolled-back batch is not reused: the next change gets its own
+        with self.captureOnCommitCallbacks(execute=True):
+            Treatment.objects.create(appointment_id=self.first.appointment_id, actual_cost=Decimal('7.00'))
+        self.assertEqual(self.total(self.first), before + Decimal('7.00'))
+
+
+class OverdueSweepTests(ClinicTestCase):
+    """Open invoices past their due date are marked overdue in bulk; overdue filters read the status"""
+
+    def set_invoice(self, invoice, status, due_in_days, paid_amount=0):
+        Invoice.objects.filter(pk=invoice.pk).update(
+            status=status, due_date=timezone.localdate() + timedelta(days=due_in_days), paid_amount=paid_amount,
+        )
+
+    def test_sweep(self):
+        invoices = list(Invoice.objects.order_by('pk')[:8])
+        self.set_invoice(invoices[0], 'pending', -1)
+        self.set_invoice(invoices[1], 'partially_paid', -3, paid_amount=10)
+        self.set_invoice(invoices[2], 'pending', 0)
+        self.set_invoice(invoices[3], 'paid', -5)
+        self.set_invoice(invoices[4], 'overdue', 7, paid_amount=10)
+        self.set_invoice(invoices[5], 'overdue', -2)
+        self.set_invoice(invoices[6], 'unpaid', -4)
+        # Paid in full but not yet marked paid
+        self.set_invoice(invoices[7], 'pending', -4, paid_amount=invoices[7].total_amount)
+        Invoice.objects.exclude(pk__in=[invoice.pk for invoice in invoices]).update(status='paid')
+        self.assertEqual(
+            [invoice.is_overdue for invoice in Invoice.objects.filter(pk__in=[i.pk for i in invoices]).order_by('pk')],
+            [True, True, False, False, True, True, True, False],
+        )
+
+        with self.assertNumQueries(2):
+            self.assertEqual(billing.sweep_overdue_invoices(), (3, 1))
+
+        self.assertEqual(
+            self.statuses(invoices),
+            ['overdue', 'overdue', 'pending', 'paid', 'partially_paid', 'overdue', 'overdue', 'pending'],
+        )
+        self.assertEqual(billing.sweep_overdue_invoices(), (0, 0))
+
+        response = self.client.get(
+            '/api/staff/invoices/', {'overdue': 'true'},
+            HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}',
+        )
+        self.assertEqual(
+            sorted(row['invoice_id'] for row in response.json()['results']),
+            sorted(str(invoice.pk) for invoice in (invoices[0], invoices[1], invoices[5], invoices[6])),
+        )
+        self.assertTrue(all(row['is_overdue'] for row in response.json()['results']))
+
+        # Moving the due date out reopens each invoice with the status it had before
+        Invoice.objects.filter(pk__in=[invoices[1].pk, invoices[6].pk]).update(
+            due_date=timezone.localdate() + timedelta(days=14),
+        )
+        self.assertEqual(billing.sweep_overdue_invoices(), (0, 2))
+        self.assertEqual(
+            self.statuses(invoices),
+            ['overdue', 'partially_paid', 'pending', 'paid', 'partially_paid', 'overdue', 'unpaid', 'pending'],
+        )
+        self.assertFalse(
+            Invoice.objects.filter(pk__in=[invoices[1].pk, invoices[6].pk], status_before_overdue__isnull=False).exists()
+        )
+
+    def statuses(self, invoices):
+        statuses = dict(Invoice.objects.filter(pk__in=[i.pk for i in invoices]).values_list('pk', 'status'))
+        return [statuses[invoice.pk] for invoice in invoices]
+
+    def test_overdue_filter_uses_status_due_index(self):
+        queryset = Invoice.objects.filter(status=Invoice.OVERDUE).order_by('due_date')
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan TO off')
+        self.assertIn('invoices_status_due_idx', queryset.explain())
+
+    def test_sweep_is_scheduled(self):
+        self.assertEqual(str(queue.get_job('staff.tasks.sweep_overdue_invoices').cron), '0 * * * *')
+
+
+class PatientSummaryTests(ClinicTestCase):
+    """patient_summary rows follow the patient's appointments, invoices, allergies and records"""
+
+    def setUp(self):
+        super().setUp()
+        self.forget_pending_refresh()
+
+    def forget_pending_refresh(self):
+        # Test transactions never commit, so an earlier refresh stays pending
+        # (and would absorb new changes) past captureOnCommitCallbacks
+        connection.patient_summary_batch = None
+
+    def assertSummaryCurrent(self, patient):
+        summary = PatientSummary.objects.get(pk=patient.pk)
+        completed = patient.appointments.filter(status='completed')
+        upcoming = patient.appointments.filter(
+            status__in=summaries.UPCOMING_APPOINTMENT_STATUSES, start_time__gte=timezone.now(),
+        ).order_by('start_time').first()
+        open_invoices = Invoice.objects.filter(patient=patient, status__in=summaries.OPEN_INVOICE_STATUSES)
+        self.assertEqual(summary.visit_count, completed.count())
+        self.assertEqual(summary.last_visit_at, max((a.start_time for a in completed), default=None))
+        self.assertEqual(summary.next_appointment_at, upcoming.start_time if upcoming else None)
+        self.assertEqual(summary.open_invoice_count, open_invoices.count())
+        self.assertEqual(
+            summary.outstanding_balance,
+            sum((invoice.total_amount - invoice.paid_amount for invoice in open_invoices), Decimal('0')),
+        )
+        self.assertEqual(summary.allergy_count, patient.allergies.count())
+        self.assertEqual(summary.record_count, MedicalRecord.objects.filter(patient=patient).count())
+        return summary
+
+    def test_seeded_summaries_are_current(self):
+        self.assertEqual(PatientSummary.objects.count(), Patient.objects.count())
+        for patient in self.clinic['patients'][:3]:
+            self.assertSummaryCurrent(patient)
+
+    def test_new_patient_gets_a_summary(self):
+        patient = Patient.objects.create(first_name='New', last_name='Patient')
+        summary = PatientSummary.objects.get(pk=patient.pk)
+        self.assertEqual((summary.visit_count, summary.outstanding_balance), (0, 0))
+
+    def test_changes_refresh_once_at_commit(self):
+        patient = self.clinic['patients'][1]
+        self.assertFalse(PatientSummary.objects.get(pk=patient.pk).has_severe_allergy)
+        start = timezone.now() + timedelta(hours=2)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            appointment = Appointment.objects.create(
+                patient=patient, staff=self.doctor, start_time=start, end_time=start + timedelta(minutes=30),
+            )
+            Allergy.objects.create(allergy_id=uuid.uuid4(), patient=patient, allergen_name='Latex', severity='severe')
+            Invoice.objects.filter(patient=patient).first().save()
+        # One refresh for the three changes
+        self.assertEqual(sum(isinstance(callback, summaries._RefreshBatch) for callback in callbacks), 1)
+
+        summary = self.assertSummaryCurrent(patient)
+        self.assertEqual(summary.next_appointment_at, appointment.start_time)
+        self.assertTrue(summary.has_severe_allergy)
+
+        self.forget_pending_refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.delete()
+        self.assertSummaryCurrent(patient)
+
+    def test_moving_a_row_refreshes_both_patients(self):
+        old_patient, new_patient = self.clinic['patients'][1], self.clinic['patients'][2]
+        invoice = Invoice.objects.filter(patient=old_patient, status__in=summaries.OPEN_INVOICE_STATUSES).first()
+        self.assertIsNotNone(invoice)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = Invoice.objects.get(pk=invoice.pk)
+            invoice.patient = new_patient
+            invoice.save()
+
+        self.assertSummaryCurrent(old_patient)
+        self.assertSummaryCurrent(new_patient)
+
+    def test_started_appointments_are_refreshed(self):
+        # A next appointment that has started since the last refresh
+        PatientSummary.objects.filter(pk=self.patient.pk).update(next_appointment_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(summaries.refresh_started_appointments(), 1)
+
+        self.assertSummaryCurrent(self.patient)
+        self.assertEqual(summaries.refresh_started_appointments(), 0)
+        self.assertEqual(str(queue.get_job('staff.tasks.refresh_started_appointments').cron), '*/15 * * * *')
+
+    def test_rebuild_command(self):
+        PatientSummary.objects.filter(pk=self.patient.pk).delete()
+        PatientSummary.objects.update(visit_count=0)
+
+        call_command('rebuild_patient_summaries', stdout=StringIO())
+
+        self.assertEqual(PatientSummary.objects.count(), Patient.objects.count())
+        self.assertSummaryCurrent(self.patient)
+        self.assertSummaryCurrent(self.clinic['patients'][1])
+
+    def test_lists_read_the_summary(self):
+        summary = PatientSummary.objects.get(pk=self.patient.pk)
+        response = self.client.get('/api/admin/patients/', HTTP_AUTHORIZATION=f'Token {self.token_for(self.admin)}')
+        row = next(row for row in response.json()['patients'] if row['patient_id'] == str(self.patient.pk))
+        self.assertEqual(row['visit_count'], summary.visit_count)
+        self.assertEqual(row['open_invoices'], summary.open_invoice_count)
+
+
+@override_settings(SYNC_CURSOR_LAG_SECONDS=0)
+class SyncFeedTests(ClinicTestCase):
+    """The changes feed returns what changed or was deleted after the client's cursor"""
+
+    def sync(self, user, since=None):
+        response = self.client.get(
+            '/api/staff/sync/' if user == self.doctor.user else '/api/patients/sync/',
+            {'since': since} if since is not None else {},
+            HTTP_AUTHORIZATION=f'Token {self.token_for(user)}',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_and_deletes_after_the_cursor(self):
+        full = self.sync(self.doctor.user)
+        self.assertFalse(full['has_more'])
+        self.assertEqual(len(full['changes']['appointments']), Appointment.objects.count())
+        self.assertEqual(len(full['changes']['treatments']), Treatment.objects.count())
+
+        nothing = self.sync(self.doctor.user, full['cursor'])
+        self.assertEqual(sum(map(len, nothing['changes'].values())), 0)
+
+        appointment = Appointment.objects.filter(patient=self.patient).first()
+        appointment.reason = 'Follow-up'
+        appointment.save()
+        treatment = Treatment.objects.exclude(appointment__patient=self.patient).first()
+        treatment_id = treatment.pk
+        treatment.delete()
+
+        changed = self.sync(self.doctor.user, nothing['cursor'])
+        self.assertEqual(
+            [row['appointment_id'] for row in changed['changes']['appointments']], [str(appointment.pk)]
+        )
+        self.assertEqual(changed['deleted']['treatments'], [str(treatment_id)])
+
+        # A patient only sees their own rows and deletes
+        mine = self.sync(self.patient.user, nothing['cursor'])
+        self.assertEqual(len(mine['changes']['appointments']), 1)
+        self.assertEqual(mine['deleted']['treatments'], [])
+        full_mine = self.sync(self.patient.user)
+        self.assertEqual(
+            len(full_mine['changes']['appointments']), Appointment.objects.filter(patient=self.patient).count()
+        )
+
+    def test_cascade_deletes_are_recorded(self):
+        appointment = Appointment.objects.filter(patient=self.patient, treatments__isnull=False).first()
+        appointment_id = appointment.pk
+        treatment_ids = set(appointment.treatments.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            appointment.delete()
+        # The treatments' patient comes from the appointment being deleted, not a lookup each
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT "appointments"."patient_id"')])
+        tombstones = Tombstone.objects.filter(patient_id=self.patient.pk)
+        self.assertEqual(
+            set(tombstones.filter(collection='treatments').values_list('object_id', flat=True)), treatment_ids
+        )
+        self.assertTrue(tombstones.filter(collection='appointments', object_id=appointment_id).exists())
+
+    @override_settings(SYNC_PAGE_SIZE=7)
+    def test_pages_until_drained(self):
+        seen, cursor, calls = set(), None, 0
+        while True:
+            page = self.sync(self.doctor.user, cursor)
+            seen |= {row['appointment_id'] for row in page['changes']['appointments']}
+            cursor, calls = page['cursor'], calls + 1
+            if not page['has_more']:
+                break
+        self.assertGreater(calls, 2)
+        self.assertEqual(seen, {str(pk) for pk in Appointment.objects.values_list('pk', flat=True)})
+
+    @override_settings(SYNC_PAGE_SIZE=5)
+    def test_pages_through_rows_sharing_a_timestamp(self):
+        # A bulk UPDATE (invoice recalculation, the overdue sweep) stamps every row alike
+        moment = timezone.now() - timedelta(minutes=1)
+        Invoice.objects.update(updated_at=moment)
+        tombstone_ids = {uuid.uuid4() for _ in range(12)}
+        Tombstone.objects.bulk_create([
+            Tombstone(collection='appointments', object_id=object_id, deleted_at=moment) for object_id in tombstone_ids
+        ])
+
+        invoices, deleted, cursor = [], [], sync.encode_cursor(moment - timedelta(seconds=1))
+        for _ in range(50):
+            page = self.sync(self.doctor.user, cursor)
+            invoices += [row['invoice_id'] for row in page['changes']['invoices']]
+            deleted += page['deleted']['appointments']
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertFalse(page['has_more'], 'the feed never drained')
+
+        self.assertEqual(sorted(invoices), sorted(str(pk) for pk in Invoice.objects.values_list('pk', flat=True)))
+        self.assertEqual(sorted(deleted), sorted(str(object_id) for object_id in tombstone_ids))
+        self.assertEqual(self.sync(self.doctor.user, cursor)['changes']['invoices'], [])
+
+    def test_expired_and_invalid_cursors(self):
+        old = sync.encode_cursor(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1))
+        reset = self.sync(self.doctor.user, old)
+        self.assertTrue(reset['reset'])
+        self.assertEqual(len(reset['changes']['appointments']), Appointment.objects.count())
+
+        for cursor in ['yesterday', '1700000000000000,unknown:1', '1700000000000000,invoices:not-a-uuid']:
+            response = self.client.get(
+                '/api/staff/sync/', {'since': cursor}, HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}'
+            )
+            self.assertEqual(response.status_code, 400, cursor)
+
+    def test_prune(self):
+        Tombstone.objects.create(
+            collection='appointments', object_id=uuid.uuid4(),
+            deleted_at=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1),
+        )
+        kept = Tombstone.objects.create(collection='appointments', object_id=uuid.uuid4())
+        self.assertEqual(sync.prune_tombstones(), 1)
+        self.assertEqual(list(Tombstone.objects.all()), [kept])
+
+
+class AppointmentEventTests(ClinicTestCase):
+    """Appointment changes are pushed to the live board as server-sent events"""
+
+    async def next_chunk(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 2)
+        return chunk.decode() if isinstance(chunk, bytes) else chunk
+
+    async def test_broker_replays_missed_events(self):
+        broker = events.Broker(backlog=3, queue_size=2)
+        first = broker.publish('ping', {'n': 1})
+        for n in range(2, 5):
+            broker.publish('ping', {'n': n})
+
+        replay = broker.subscribe(broker.publish('ping', {'n': 5}).id.replace(':5', ':3'))
+        self.assertEqual([(await replay.get()).data['n'] for _ in range(2)], [4, 5])
+        # Older than the backlog, or from another process: refetch
+        self.assertEqual((await broker.subscribe(first.id).get()).type, 'resync')
+        self.assertEqual((await broker.subscribe('other:1').get()).type, 'resync')
+
+        # Published from another thread; a subscriber that falls behind is told to resync
+        await asyncio.gather(*[asyncio.to_thread(broker.publish, 'ping', {'n': n}) for n in range(3)])
+        await asyncio.sleep(0)
+        self.assertEqual((await replay.get()).type, 'resync')
+        replay.close()
+
+    async def test_stream(self):
+        token = await sync_to_async(self.token_for)(self.doctor.user)
+        response = await AsyncClient().get('/api/staff/appointments/events/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await self.next_chunk(stream)).startswith('retry:'))
+
+        def start_visit():
+            appointment = Appointment.objects.filter(staff=self.doctor, status='scheduled').first()
+            with self.captureOnCommitCallbacks(execute=True):
+                appointment.status = 'in_progress'
+                appointment.save()
+            return appointment
+
+        appointment = await sync_to_async(start_visit)()
+        chunk = await self.next_chunk(stream)
+        self.assertIn('event: appointment.updated', chunk)
+        data = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(data['appointment_id'], str(appointment.pk))
+        self.assertEqual((data['status'], data['previous_status'], data['changed']), ('in_progress', 'scheduled', ['status']))
+        await response.streaming_content.aclose()
+
+    def test_payload_is_built_from_the_saved_row(self):
+        appointment = Appointment.objects.select_related('patient', 'staff').filter(
+            staff=self.doctor, status='scheduled',
+        ).first()
+        with mock.patch.object(events, 'publish') as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                appointment.status = 'in_progress'
+                appointment.save()
+            [publish_callback] = [c for c in callbacks if 'publish_appointment_change' in c.__qualname__]
+            # The patient and staff are loaded: publishing reads nothing
+            with self.assertNumQueries(0):
+                publish_callback()
+        event_type, data = publish.call_args.args
+        self.assertEqual(event_type, 'appointment.updated')
+        self.assertEqual(data['status'], 'in_progress')
+        self.assertEqual(data['patient_name'], f'{appointment.patient.first_name} {appointment.patient.last_name}')
+        self.assertEqual(data['staff_name'], f'Dr. {self.doctor.first_name} {self.doctor.last_name}')
+
+    async def test_access(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get('/api/staff/appointments/events/')).status_code, 401)
+        self.assertEqual((await client.get('/api/staff/appointments/events/', {'token': 'nope'})).status_code, 401)
+        token = await sync_to_async(self.token_for)(self.patient.user)
+        self.assertEqual(
+            (await client.get('/api/staff/appointments/events/', headers={'Authorization': f'Token {token}'})).status_code,
+            403,
+        )
+
+    def test_requires_asgi(self):
+        response = self.client.get(
+            '/api/staff/appointments/events/', HTTP_AUTHORIZATION=f'Token {self.token_for(self.doctor.user)}'
+        )
+        self.assertEqual(response.status_code, 501)
@@ -12,27 +12,38 @@ urlpatterns = [
     
     # Staff reports
     path('reports/', views.staff_reports, name='staff_reports'),
+
+    # Recent expensive requests recorded by the query instrumentation middleware
+    path('diagnostics/queries/', views.query_samples, name='query_samples'),
     
     # Patient endpoints
     path('patients/', views.PatientListView.as_view(), name='patient_list'),
     path('patients/<uuid:patient_id>/', views.PatientDetailView.as_view(), name='patient_detail'),
     path('patients/search/', views.patient_search, name='patient_search'),
+
+    # Changes feed
+    path('sync/', views.sync_changes, name='sync_changes'),
     
     # Nurses
     path('nurses/', views.NursesListView.as_view(), name='nurses_list'),
     
     # Appointment endpoints
     path('appointments/', views.AppointmentListView.as_view(), name='appointment_list'),
+    path('appointments/calendar/', views.appointment_calendar, name='appointment_calendar'),
+    path('appointments/events/', views.appointment_events, name='appointment_events'),
     path('appointments/<uuid:appointment_id>/', views.AppointmentDetailView.as_view(), name='appointment_detail'),
+    path('appointments/<uuid:appointment_id>/complete/', views.complete_appointment, name='appointment_complete'),
     
     # Treatment endpoints
     path('treatments/', views.TreatmentListView.as_view(), name='treatment_list'),
+    path('treatments/bulk/', views.TreatmentBulkCreateView.as_view(), name='treatment_bulk_create'),
     
     # Medical record endpoints
     path('medical-records/', views.MedicalRecordListView.as_view(), name='medical_record_list'),
     
     # Diagnosis endpoints
     path('diagnoses/', views.DiagnosisListView.as_view(), name='diagnosis_list'),
+    path('diagnoses/bulk/', views.DiagnosisBulkCreateView.as_view(), name='diagnosis_bulk_create'),
     
     # Invoice endpoints
     path('invoices/', views.InvoiceListView.as_view(), name='invoice_list'),
@@ -47,9 +58,9 @@ urlpatterns = [
     
     # Medical History endpoints
     path('chronic-conditions/', views.ChronicConditionListView.as_view(), name='chronic_condition_list'),
-    path('chronic-conditions/<int:id>/', views.ChronicConditionDetailView.as_view(), name='chronic_condition_detail'),
+    path('chronic-conditions/<uuid:id>/', views.ChronicConditionDetailView.as_view(), name='chronic_condition_detail'),
     path('allergies/', views.AllergyListView.as_view(), name='allergy_list'),
-    path('allergies/<int:id>/', views.AllergyDetailView.as_view(), name='allergy_detail'),
+    path('allergies/<uuid:id>/', views.AllergyDetailView.as_view(), name='allergy_detail'),
     path('past-surgeries/', views.PastSurgeryListView.as_view(), name='past_surgery_list'),
-    path('past-surgeries/<int:id>/', views.PastSurgeryDetailView.as_view(), name='past_surgery_detail'),
+    path('past-surgeries/<uuid:id>/', views.PastSurgeryDetailView.as_view(), name='past_surgery_detail'),
 ]
\ No newline at end of file
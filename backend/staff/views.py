@@ -2,20 +2,42 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Q
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from django.db.models import Sum, Count, Q, Exists, OuterRef, Prefetch
 from django.utils import timezone
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from datetime import datetime, timedelta
 
-from .permissions import IsDoctorOnly, IsDoctorOrStaff
+from backend import events
+from backend.concurrency import run_concurrently
+from backend.conditional import ConditionalGetMixin
+from backend.db_routers import ReplicaReadMixin, use_replica
+from backend.middleware import recent_samples
+from backend.response_cache import CachedResponseMixin, cache_response
+from accounts.authentication import CustomTokenAuthentication
+from accounts.models import User
 
-from .models import Patient, Staff, Appointment, MedicalRecord, Treatment, Diagnosis, Invoice, Payment, Service, ChronicCondition, Allergy, PastSurgery
+from .permissions import IsDoctorOnly, IsDoctorOrStaff
+from .mixins import EagerLoadingMixin, BulkCreateMixin
+from .filters import on_date, date_range, start_of_day
+from . import sync
+from .search import search_patients
+from .billing import recalculate_invoice_totals, mark_invoice_dirty
+from .visits import complete_visit, PhaseTimer, VisitError, VisitForbidden
+
+from .models import Patient, PatientSummary, Staff, Appointment, MedicalRecord, Treatment, Diagnosis, Invoice, Payment, Service, ChronicCondition, Allergy, PastSurgery
 from .serializers import (
     PatientSerializer, PatientListSerializer,
     StaffSerializer,
     AppointmentSerializer, AppointmentListSerializer,
     MedicalRecordSerializer,
-    TreatmentSerializer, TreatmentSummarySerializer,
-    DiagnosisSerializer,
+    TreatmentSerializer, TreatmentSummarySerializer, TreatmentBulkItemSerializer,
+    DiagnosisSerializer, DiagnosisBulkItemSerializer,
+    VisitCompletionSerializer,
     InvoiceSerializer, InvoiceSummarySerializer,
     PaymentSerializer,
     ServiceSerializer,
@@ -23,10 +45,11 @@ from .serializers import (
 )
 
 
-class PatientListView(generics.ListAPIView):
+class PatientListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, generics.ListAPIView):
     """List all patients for staff dashboard"""
     serializer_class = PatientListSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Patient, PatientSummary, Staff, Appointment]
 
     def get_queryset(self):
         # Get the current staff member
@@ -38,89 +61,121 @@ class PatientListView(generics.ListAPIView):
         
         # Only return patients that have had appointments with this staff member
         queryset = Patient.objects.filter(
-            appointments__staff=current_staff
-        ).distinct()
+            Exists(Appointment.objects.filter(patient=OuterRef('pk'), staff=current_staff))
+        ).with_list_annotations()
         
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(phone__icontains=search)
-            )
+            # Ranked results, best match first
+            return search_patients(search, queryset)
         return queryset.order_by('last_name', 'first_name')
 
+    def conditional_queryset(self):
+        # Skip the list annotations and search ranking: the probe only needs the rows
+        return Patient.objects.filter(
+            Exists(Appointment.objects.filter(patient=OuterRef('pk'), staff__user=self.request.user))
+        )
+
+
+class PatientDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """
+    Get patient details with related data.
 
-class PatientDetailView(generics.RetrieveAPIView):
-    """Get patient details with related data"""
+    Sections can be selected with ?include=appointments,invoices (default: all);
+    each section costs one query regardless of how many rows it returns.
+    """
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'patient_id'
+    cache_models = [Patient, Staff, User, Appointment, MedicalRecord, Treatment, Service, Invoice, Diagnosis]
 
-    def get(self, request, *args, **kwargs):
+    sections = ('appointments', 'medical_records', 'treatments', 'invoices', 'diagnoses')
+
+    def get_sections(self):
+        include = self.request.query_params.get('include', None)
+        if include is None:
+            return list(self.sections)
+
+        requested = [name.strip() for name in include.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in self.sections]
+        if unknown:
+            raise ValidationError({
+                'include': f"Unknown section(s): {', '.join(unknown)}. Valid sections: {', '.join(self.sections)}"
+            })
+        return requested
+
+    def get_queryset(self):
+        # Sections reachable from the patient are loaded as sliced prefetches
+        prefetches = {
+            'appointments': Prefetch(
+                'appointments',
+                queryset=Appointment.objects.select_related(
+                    'staff__user', 'nurse__user', 'medical_record'
+                ).order_by('-start_time')[:10],
+                to_attr='recent_appointments',
+            ),
+            'medical_records': Prefetch(
+                'medical_records',
+                queryset=MedicalRecord.objects.select_related('staff__user').order_by('-record_date')[:5],
+                to_attr='recent_medical_records',
+            ),
+            'invoices': Prefetch(
+                'invoices',
+                queryset=Invoice.objects.order_by('-issued_date')[:10],
+                to_attr='recent_invoices',
+            ),
+        }
+        included = self.get_sections()
+        queryset = super().get_queryset()
+        return queryset.prefetch_related(
+            *[prefetch for name, prefetch in prefetches.items() if name in included]
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        # RetrieveAPIView.get() calls this, so ConditionalGetMixin.get() still wraps it
+        included = self.get_sections()
         patient = self.get_object()
-        serializer = self.get_serializer(patient)
-        
-        # Add related data with error handling
-        data = serializer.data
-        
-        try:
-            data['appointments'] = AppointmentListSerializer(
-                patient.appointments.order_by('-start_time')[:10], 
-                many=True
-            ).data
-        except Exception:
-            data['appointments'] = []
-        
-        try:
-            # Check if medical_records relationship exists
-            if hasattr(patient, 'medical_records'):
-                data['medical_records'] = MedicalRecordSerializer(
-                    patient.medical_records.order_by('-record_date')[:5], 
-                    many=True
-                ).data
-            else:
-                data['medical_records'] = []
-        except Exception:
-            data['medical_records'] = []
-            
-        try:
-            data['treatments'] = TreatmentSummarySerializer(
-                Treatment.objects.filter(appointment__patient=patient).order_by('-created_at')[:10],
-                many=True
-            ).data
-        except Exception:
-            data['treatments'] = []
-        
-        try:
-            # Check if invoices relationship exists  
-            if hasattr(patient, 'invoices'):
-                data['invoices'] = InvoiceSummarySerializer(
-                    patient.invoices.order_by('-issued_date')[:10],
-                    many=True
-                ).data
-            else:
-                data['invoices'] = []
-        except Exception:
-            data['invoices'] = []
-        
+        data = self.get_serializer(patient).data
+
+        if 'appointments' in included:
+            data['appointments'] = AppointmentListSerializer(patient.recent_appointments, many=True).data
+
+        if 'medical_records' in included:
+            data['medical_records'] = MedicalRecordSerializer(patient.recent_medical_records, many=True).data
+
+        if 'treatments' in included:
+            treatments = Treatment.objects.filter(
+                appointment__patient=patient
+            ).select_related('appointment__patient', 'service').order_by('-created_at')[:10]
+            data['treatments'] = TreatmentSummarySerializer(treatments, many=True).data
+
+        if 'invoices' in included:
+            data['invoices'] = InvoiceSummarySerializer(patient.recent_invoices, many=True).data
+
+        if 'diagnoses' in included:
+            diagnoses = Diagnosis.objects.filter(
+                record__patient=patient
+            ).select_related('record__patient').order_by('-diagnosed_at')[:10]
+            data['diagnoses'] = DiagnosisSerializer(diagnoses, many=True).data
+
         return Response(data)
 
 
-class NursesListView(generics.ListAPIView):
+class NursesListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, generics.ListAPIView):
     """List active nurses for selection"""
     queryset = Staff.objects.filter(role_title='Nurse', is_active=True)
     serializer_class = StaffSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Staff, User]
 
 
-class AppointmentListView(generics.ListAPIView):
+class AppointmentListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, EagerLoadingMixin, generics.ListAPIView):
     """List appointments for staff"""
     queryset = Appointment.objects.all()
     serializer_class = AppointmentListSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Appointment, Patient, Staff, User, MedicalRecord]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -135,21 +190,21 @@ class AppointmentListView(generics.ListAPIView):
         if date:
             try:
                 filter_date = datetime.strptime(date, '%Y-%m-%d').date()
-                queryset = queryset.filter(start_time__date=filter_date)
+                queryset = queryset.filter(on_date('start_time', filter_date))
             except ValueError:
                 pass
 
         if date_gte:
             try:
                 start_date = datetime.strptime(date_gte, '%Y-%m-%d').date()
-                queryset = queryset.filter(start_time__date__gte=start_date)
+                queryset = queryset.filter(date_range('start_time', start=start_date))
             except ValueError:
                 pass
 
         if date_lte:
             try:
                 end_date = datetime.strptime(date_lte, '%Y-%m-%d').date()
-                queryset = queryset.filter(start_time__date__lte=end_date)
+                queryset = queryset.filter(date_range('start_time', end=end_date))
             except ValueError:
                 pass
 
@@ -191,19 +246,170 @@ class AppointmentListView(generics.ListAPIView):
         return queryset.order_by('start_time')
 
 
-class AppointmentDetailView(generics.RetrieveUpdateAPIView):
+class AppointmentDetailView(ConditionalGetMixin, EagerLoadingMixin, generics.RetrieveUpdateAPIView):
     """Retrieve and update appointment details"""
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'appointment_id'
+    cache_models = [Appointment, Patient, Staff, User, MedicalRecord]
+
+
+@api_view(['GET'])
+@permission_classes([IsDoctorOrStaff])
+def query_samples(request):
+    """Expensive requests recently seen by this server process, with their slowest and repeated SQL"""
+    samples = recent_samples()
+    path = request.query_params.get('path')
+    if path:
+        samples = [sample for sample in samples if sample['path'].startswith(path)]
+    return Response({'count': len(samples), 'results': samples})
+
+
+# Longest range the calendar endpoint serves in one request
+CALENDAR_MAX_DAYS = 62
+
+
+@api_view(['GET'])
+@permission_classes([IsDoctorOrStaff])
+@use_replica
+@cache_response([Patient, Staff, User, Appointment])
+def appointment_calendar(request):
+    """
+    Appointments of one staff member between `start` and `end` (inclusive
+    YYYY-MM-DD dates, at most CALENDAR_MAX_DAYS) in a columnar layout for
+    the week and month views.
+
+    `appointments` holds parallel arrays: `start` is seconds from `origin`
+    (midnight of `start` in the clinic time zone), `duration` is seconds,
+    `status` indexes `statuses`, and `patient` / `nurse` index the
+    deduplicated `patients` / `nurses` tables (nurse is null when unset).
+    `staff` defaults to the requesting staff member.
+    """
+    try:
+        start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.query_params['end'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        raise ValidationError({'error': 'start and end are required as YYYY-MM-DD'})
+    if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+        raise ValidationError({'error': f'end must be on or after start and at most {CALENDAR_MAX_DAYS} days later'})
+
+    staff_id = request.query_params.get('staff')
+    if staff_id is None:
+        staff_id = Staff.objects.filter(user=request.user).values_list('staff_id', flat=True).first()
+        if staff_id is None:
+            return Response({'error': 'Staff profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        rows = list(Appointment.objects.filter(
+            date_range('start_time', start, end), staff_id=staff_id
+        ).order_by('start_time').values_list(
+            'appointment_id', 'start_time', 'end_time', 'status',
+            'patient_id', 'patient__first_name', 'patient__last_name',
+            'nurse_id', 'nurse__user__full_name',
+        ))
+    except DjangoValidationError:
+        raise ValidationError({'error': 'staff must be a valid staff id'})
+
+    origin = start_of_day(start)
+    statuses = [code for code, _ in Appointment.STATUS_CHOICES]
+    status_index = {code: index for index, code in enumerate(statuses)}
+
+    columns = {'ids': [], 'start': [], 'duration': [], 'status': [], 'patient': [], 'nurse': []}
+    patients = {'ids': [], 'names': []}
+    nurses = {'ids': [], 'names': []}
+    patient_index, nurse_index = {}, {}
+
+    for (appointment_id, start_time, end_time, status_code,
+         patient_id, first_name, last_name, nurse_id, nurse_name) in rows:
+        if patient_id not in patient_index:
+            patient_index[patient_id] = len(patients['ids'])
+            patients['ids'].append(patient_id)
+            patients['names'].append(f"{first_name} {last_name}")
+        if nurse_id is not None and nurse_id not in nurse_index:
+            nurse_index[nurse_id] = len(nurses['ids'])
+            nurses['ids'].append(nurse_id)
+            nurses['names'].append(nurse_name)
+
+        columns['ids'].append(appointment_id)
+        columns['start'].append(int((start_time - origin).total_seconds()))
+        columns['duration'].append(int((end_time - start_time).total_seconds()))
+        columns['status'].append(status_index.get(status_code, -1))
+        columns['patient'].append(patient_index[patient_id])
+        columns['nurse'].append(nurse_index.get(nurse_id))
+
+    return Response({
+        'staff': staff_id,
+        'start': start,
+        'end': end,
+        'origin': origin,
+        'statuses': statuses,
+        'appointments': columns,
+        'patients': patients,
+        'nurses': nurses,
+    })
+
 
+@api_view(['POST'])
+@permission_classes([IsDoctorOrStaff])
+def complete_appointment(request, appointment_id):
+    """
+    Finalize a visit: create the medical record, treatments and diagnoses,
+    link the record and nurse to the appointment, mark it completed and
+    update the invoice, all in one transaction. Per-phase timings (ms) are
+    returned in the body and the Server-Timing header.
+    """
+    timer = PhaseTimer()
+    with timer.phase('validate'):
+        serializer = VisitCompletionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-class TreatmentListView(generics.ListCreateAPIView):
+    try:
+        result = complete_visit(
+            appointment_id,
+            record=data.get('record'),
+            treatments=data.get('treatments', []),
+            diagnoses=data.get('diagnoses', []),
+            nurse_id=data.get('nurse'),
+            end_time=data.get('end_time'),
+            timer=timer,
+            user=request.user,
+        )
+    except Appointment.DoesNotExist:
+        return Response({'error': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
+    except VisitForbidden as e:
+        return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+    except VisitError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with timer.phase('serialize'):
+        invoice = result['invoice']
+        payload = {
+            'appointment': AppointmentSerializer(result['appointment']).data,
+            'medical_record': MedicalRecordSerializer(result['medical_record']).data,
+            'treatments': TreatmentSerializer(result['treatments'], many=True).data,
+            'diagnoses': DiagnosisSerializer(result['diagnoses'], many=True).data,
+            'invoice': {
+                'invoice_id': invoice.invoice_id,
+                'total_amount': str(invoice.total_amount),
+                'balance_due': str(invoice.balance_due),
+                'status': invoice.status,
+            } if invoice else None,
+        }
+    payload['timings'] = timer.finish()
+
+    response = Response(payload, status=status.HTTP_201_CREATED)
+    response['Server-Timing'] = timer.server_timing()
+    return response
+
+
+class TreatmentListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, EagerLoadingMixin, generics.ListCreateAPIView):
     """List and create treatments"""
     queryset = Treatment.objects.all()
     serializer_class = TreatmentSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Treatment, Appointment, Patient, Staff, User, Service]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -218,11 +424,29 @@ class TreatmentListView(generics.ListCreateAPIView):
         return queryset.order_by('-created_at')
 
 
-class MedicalRecordListView(generics.ListCreateAPIView):
+class TreatmentBulkCreateView(BulkCreateMixin, generics.GenericAPIView):
+    """Create the treatments of a visit from a list in one request"""
+    serializer_class = TreatmentSerializer
+    bulk_serializer_class = TreatmentBulkItemSerializer
+    bulk_relations = {
+        'appointment': Appointment.objects.select_related('patient', 'staff__user'),
+        'service': Service.objects.all(),
+    }
+    permission_classes = [IsAuthenticated]
+
+    def perform_bulk_create(self, instances):
+        super().perform_bulk_create(instances)
+        # bulk_create sends no post_save, so schedule the invoice update here
+        for appointment_id in {treatment.appointment_id for treatment in instances}:
+            mark_invoice_dirty(appointment_id)
+
+
+class MedicalRecordListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, EagerLoadingMixin, generics.ListCreateAPIView):
     """List and create medical records"""
     queryset = MedicalRecord.objects.all()
     serializer_class = MedicalRecordSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [MedicalRecord, Patient, Staff, User]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -237,11 +461,12 @@ class MedicalRecordListView(generics.ListCreateAPIView):
         return queryset.order_by('-record_date')
 
 
-class DiagnosisListView(generics.ListCreateAPIView):
+class DiagnosisListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, EagerLoadingMixin, generics.ListCreateAPIView):
     """List and create diagnoses"""
     queryset = Diagnosis.objects.all()
     serializer_class = DiagnosisSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Diagnosis, MedicalRecord, Patient, Staff]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -256,11 +481,22 @@ class DiagnosisListView(generics.ListCreateAPIView):
         return queryset.order_by('-diagnosed_at')
 
 
-class InvoiceListView(generics.ListCreateAPIView):
+class DiagnosisBulkCreateView(BulkCreateMixin, generics.GenericAPIView):
+    """Create several diagnoses from a list in one request"""
+    serializer_class = DiagnosisSerializer
+    bulk_serializer_class = DiagnosisBulkItemSerializer
+    bulk_relations = {
+        'record': MedicalRecord.objects.select_related('patient'),
+    }
+    permission_classes = [IsAuthenticated]
+
+
+class InvoiceListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, EagerLoadingMixin, generics.ListCreateAPIView):
     """List and create invoices"""
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Invoice, Patient, Appointment, Staff]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -276,24 +512,26 @@ class InvoiceListView(generics.ListCreateAPIView):
         if appointment_id:
             queryset = queryset.filter(appointment__appointment_id=appointment_id)
         if overdue == 'true':
-            queryset = queryset.filter(due_date__lt=timezone.now().date(), status__in=['pending', 'partially_paid'])
+            queryset = queryset.filter(status=Invoice.OVERDUE)
 
         return queryset.order_by('-issued_date')
 
 
-class InvoiceDetailView(generics.RetrieveUpdateAPIView):
+class InvoiceDetailView(ConditionalGetMixin, EagerLoadingMixin, generics.RetrieveUpdateAPIView):
     """Retrieve and update invoice details"""
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'invoice_id'
+    cache_models = [Invoice, Patient, Appointment]
 
 
-class PaymentListView(generics.ListCreateAPIView):
+class PaymentListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, EagerLoadingMixin, generics.ListCreateAPIView):
     """List and create payments"""
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Payment, Invoice, Patient, Appointment, Staff]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -308,15 +546,21 @@ class PaymentListView(generics.ListCreateAPIView):
         return queryset.order_by('-paid_at')
 
 
-class ServiceListView(generics.ListAPIView):
+class ServiceListView(ConditionalGetMixin, CachedResponseMixin, ReplicaReadMixin, generics.ListAPIView):
     """List available services"""
     queryset = Service.objects.filter(is_active=True)
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Service]
 
 
 @api_view(['GET'])
 @permission_classes([IsDoctorOnly])
+@use_replica
+@cache_response(
+    [Patient, Staff, User, Appointment, MedicalRecord, Treatment, Invoice, Service],
+    timeout=settings.STAFF_DASHBOARD_CACHE_SECONDS,
+)
 def dashboard_stats(request):
     """Get dashboard statistics for staff - DOCTOR ONLY"""
     # No need to check is_authenticated since IsDoctorOnly already checks it
@@ -328,69 +572,86 @@ def dashboard_stats(request):
         current_staff = Staff.objects.get(user=request.user)
     except Staff.DoesNotExist:
         return Response({'error': 'Staff profile not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Get patients that have had appointments with this staff member
-    patients_with_appointments = Patient.objects.filter(
-        appointments__staff=current_staff
-    ).distinct()
-    
+
+    # Kept current by the overdue sweep (staff/billing.py)
+    overdue_invoice = Q(status=Invoice.OVERDUE)
+    open_invoice = Q(status__in=Invoice.OPEN_STATUSES) | overdue_invoice
+
+    # One conditional aggregate per table; the independent queries run concurrently
+    results = run_concurrently({
+        'patients': lambda: Patient.objects.filter(
+            Exists(Appointment.objects.filter(patient=OuterRef('pk'), staff=current_staff))
+        ).aggregate(
+            total=Count('pk'),
+            new_this_month=Count('pk', filter=date_range('created_at', start=this_month)),
+        ),
+        'appointments': lambda: Appointment.objects.filter(staff=current_staff).aggregate(
+            today=Count('pk', filter=on_date('start_time', today)),
+            this_week=Count('pk', filter=date_range('start_time', start=today - timedelta(days=7))),
+            pending=Count('pk', filter=Q(status='scheduled')),
+        ),
+        'treatments': lambda: Treatment.objects.filter(
+            date_range('created_at', start=this_month),
+            appointment__staff=current_staff
+        ).aggregate(
+            this_month=Count('pk'),
+            total_revenue=Sum('actual_cost'),
+        ),
+        'invoices': lambda: Invoice.objects.filter(appointment__staff=current_staff).aggregate(
+            pending=Count('pk', filter=Q(status='pending')),
+            overdue=Count('pk', filter=overdue_invoice),
+            total_outstanding=Sum('total_amount', filter=open_invoice),
+        ),
+        'recent_appointments': lambda: AppointmentListSerializer(
+            Appointment.objects.filter(
+                on_date('start_time', today), staff=current_staff
+            ).select_related(
+                'patient', 'staff__user', 'nurse__user', 'medical_record'
+            ).order_by('start_time')[:5],
+            many=True
+        ).data,
+        'recent_treatments': lambda: TreatmentSummarySerializer(
+            Treatment.objects.filter(
+                on_date('created_at', today), appointment__staff=current_staff
+            ).select_related('appointment__patient', 'service').order_by('-created_at')[:5],
+            many=True
+        ).data,
+        'overdue_invoices': lambda: InvoiceSummarySerializer(
+            Invoice.objects.filter(
+                overdue_invoice, appointment__staff=current_staff
+            ).select_related('patient').order_by('due_date')[:5],
+            many=True
+        ).data,
+    })
+    treatment_totals = results['treatments']
+    invoice_totals = results['invoices']
+
     stats = {
-        'patients': {
-            'total': patients_with_appointments.count(),
-            'new_this_month': patients_with_appointments.filter(created_at__date__gte=this_month).count(),
-        },
-        'appointments': {
-            'today': Appointment.objects.filter(staff=current_staff, start_time__date=today).count(),
-            'this_week': Appointment.objects.filter(
-                staff=current_staff,
-                start_time__date__gte=today - timedelta(days=7)
-            ).count(),
-            'pending': Appointment.objects.filter(staff=current_staff, status='scheduled').count(),
-        },
+        'patients': results['patients'],
+        'appointments': results['appointments'],
         'treatments': {
-            'this_month': Treatment.objects.filter(appointment__staff=current_staff, created_at__date__gte=this_month).count(),
-            'total_revenue': Treatment.objects.filter(
-                appointment__staff=current_staff,
-                created_at__date__gte=this_month
-            ).aggregate(total=Sum('actual_cost'))['total'] or 0,
+            'this_month': treatment_totals['this_month'],
+            'total_revenue': treatment_totals['total_revenue'] or 0,
         },
         'invoices': {
-            'pending': Invoice.objects.filter(appointment__staff=current_staff, status='pending').count(),
-            'overdue': Invoice.objects.filter(
-                appointment__staff=current_staff,
-                due_date__lt=today, 
-                status__in=['pending', 'partially_paid']
-            ).count(),
-            'total_outstanding': Invoice.objects.filter(
-                appointment__staff=current_staff,
-                status__in=['pending', 'partially_paid']
-            ).aggregate(total=Sum('total_amount'))['total'] or 0,
+            'pending': invoice_totals['pending'],
+            'overdue': invoice_totals['overdue'],
+            'total_outstanding': invoice_totals['total_outstanding'] or 0,
         },
         'recent_activities': {
-            'recent_appointments': AppointmentListSerializer(
-                Appointment.objects.filter(staff=current_staff, start_time__date=today).order_by('start_time')[:5],
-                many=True
-            ).data,
-            'recent_treatments': TreatmentSummarySerializer(
-                Treatment.objects.filter(appointment__staff=current_staff, created_at__date=today).order_by('-created_at')[:5],
-                many=True
-            ).data,
-            'overdue_invoices': InvoiceSummarySerializer(
-                Invoice.objects.filter(
-                    appointment__staff=current_staff,
-                    due_date__lt=today,
-                    status__in=['pending', 'partially_paid']
-                ).order_by('due_date')[:5],
-                many=True
-            ).data,
+            'recent_appointments': results['recent_appointments'],
+            'recent_treatments': results['recent_treatments'],
+            'overdue_invoices': results['overdue_invoices'],
         }
     }
-    
+
     return Response(stats)
 
 
 @api_view(['GET'])
 @permission_classes([IsDoctorOnly])
+@use_replica
+@cache_response([Staff, Appointment, Treatment, Service])
 def staff_reports(request):
     """Get reports and metrics for the current doctor"""
     try:
@@ -405,9 +666,8 @@ def staff_reports(request):
         
         # 2. Appointments this month
         appointments_this_month = Appointment.objects.filter(
-            staff=staff,
-            start_time__date__gte=current_month,
-            start_time__date__lte=today
+            date_range('start_time', current_month, today),
+            staff=staff
         ).count()
         
         # 3. Completed appointments
@@ -434,9 +694,8 @@ def staff_reports(request):
             month_end = (month_date.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
             
             appointments_count = Appointment.objects.filter(
-                staff=staff,
-                start_time__date__gte=month_start,
-                start_time__date__lte=month_end
+                date_range('start_time', month_start, month_end),
+                staff=staff
             ).count()
             
             monthly_data.append({
@@ -469,18 +728,71 @@ def staff_reports(request):
 
 
 @api_view(['GET'])
+@permission_classes([IsDoctorOrStaff])
+def sync_changes(request):
+    """
+    Changes feed: appointments, invoices, records and treatments changed or
+    deleted since ?since=<cursor> (see staff/sync.py). Reads the primary, so
+    a lagging replica cannot make the cursor skip rows.
+    """
+    try:
+        return Response(sync.changes_since(request.query_params.get('since')))
+    except sync.InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Roles that may follow the live appointment board
+BOARD_ROLES = ('Doctor', 'Nurse', 'Dental Assistant', 'Admin')
+
+
+def _board_user_error(request):
+    """(status, message) when the request may not follow the board, else None"""
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    # EventSource cannot send headers, so browsers pass the token as ?token=
+    key = header[1] if len(header) == 2 and header[0].lower() == 'token' else request.GET.get('token')
+    if not key:
+        return 401, 'Authentication credentials were not provided.'
+    try:
+        user, _ = CustomTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed as e:
+        return 401, str(e.detail)
+    if not user.role or user.role.name not in BOARD_ROLES:
+        return 403, 'You do not have permission to perform this action.'
+    return None
+
+
+async def appointment_events(request):
+    """
+    Server-sent events for the live appointment board: appointment.created,
+    appointment.updated (status, time or staff changes) and
+    appointment.deleted, published by the Appointment signals. Resumes
+    from the Last-Event-ID header (see backend/events.py).
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The event stream is only served under ASGI (backend/asgi.py).'}, status=501)
+    if request.method != 'GET':
+        return JsonResponse({'error': f'Method "{request.method}" not allowed.'}, status=405)
+    error = await sync_to_async(_board_user_error)(request)
+    if error:
+        return JsonResponse({'detail': error[1]}, status=error[0])
+
+    response = StreamingHttpResponse(
+        events.stream(request.headers.get('Last-Event-ID')), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass each event through unbuffered
+    return response
+
+
+@api_view(['GET'])
+@use_replica
 def patient_search(request):
-    """Search patients by name, email, or phone"""
+    """Search patients by name, email, or phone (ranked, tolerates typos)"""
     query = request.query_params.get('q', '')
     if len(query) < 2:
         return Response({'results': []})
     
-    patients = Patient.objects.filter(
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query) |
-        Q(phone__icontains=query)
-    ).order_by('last_name', 'first_name')[:10]
+    patients = search_patients(query, Patient.objects.with_list_annotations())[:10]
     
     serializer = PatientListSerializer(patients, many=True)
     return Response({'results': serializer.data})
@@ -557,7 +869,10 @@ def staff_profile(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def recalculate_invoice_total(request, appointment_id):
-    """Recalculate the total amount for an invoice based on actual treatments performed"""
+    """
+    Recalculate the total amount for an invoice based on actual treatments performed.
+    Totals are also kept up to date automatically whenever treatments change.
+    """
     try:
         # Get the appointment
         appointment = Appointment.objects.get(appointment_id=appointment_id)
@@ -571,18 +886,14 @@ def recalculate_invoice_total(request, appointment_id):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Calculate total from treatments
-        treatments = Treatment.objects.filter(appointment=appointment)
-        total_amount = sum(treatment.cost for treatment in treatments)
-        
-        # Update the invoice
-        invoice.total_amount = total_amount
-        invoice.save()
+        # Sum the treatment costs in the database and update the invoice in one statement
+        recalculate_invoice_totals([appointment.appointment_id])
+        invoice.refresh_from_db(fields=['total_amount'])
         
         return Response({
             'message': 'Invoice total updated successfully',
-            'total_amount': float(total_amount),
-            'treatment_count': treatments.count()
+            'total_amount': float(invoice.total_amount),
+            'treatment_count': Treatment.objects.filter(appointment=appointment).count()
         }, status=status.HTTP_200_OK)
         
     except Appointment.DoesNotExist:
@@ -594,7 +905,7 @@ def recalculate_invoice_total(request, appointment_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class ChronicConditionListView(generics.ListCreateAPIView):
+class ChronicConditionListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create chronic conditions for a patient"""
     serializer_class = ChronicConditionSerializer
     permission_classes = [IsAuthenticated]
@@ -612,15 +923,16 @@ class ChronicConditionListView(generics.ListCreateAPIView):
         serializer.save(patient=patient)
 
 
-class ChronicConditionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ChronicConditionDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete chronic condition"""
     queryset = ChronicCondition.objects.all()
     serializer_class = ChronicConditionSerializer
     permission_classes = [IsAuthenticated]
-    lookup_field = 'id'
+    lookup_field = 'condition_id'
+    lookup_url_kwarg = 'id'
 
 
-class AllergyListView(generics.ListCreateAPIView):
+class AllergyListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create allergies for a patient"""
     serializer_class = AllergySerializer
     permission_classes = [IsAuthenticated]
@@ -638,15 +950,16 @@ class AllergyListView(generics.ListCreateAPIView):
         serializer.save(patient=patient)
 
 
-class AllergyDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AllergyDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete allergy"""
     queryset = Allergy.objects.all()
     serializer_class = AllergySerializer
     permission_classes = [IsAuthenticated]
-    lookup_field = 'id'
+    lookup_field = 'allergy_id'
+    lookup_url_kwarg = 'id'
 
 
-class PastSurgeryListView(generics.ListCreateAPIView):
+class PastSurgeryListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create past surgeries for a patient"""
     serializer_class = PastSurgerySerializer
     permission_classes = [IsAuthenticated]
@@ -664,9 +977,10 @@ class PastSurgeryListView(generics.ListCreateAPIView):
         serializer.save(patient=patient)
 
 
-class PastSurgeryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PastSurgeryDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete past surgery"""
     queryset = PastSurgery.objects.all()
     serializer_class = PastSurgerySerializer
     permission_classes = [IsAuthenticated]
-    lookup_field = 'id'
+    lookup_field = 'surgery_id'
+    lookup_url_kwarg = 'id'
@@ -0,0 +1,148 @@
+"""
+Visit completion.
+
+Finishing a visit writes the medical record, the treatments and diagnoses,
+links the record (and nurse) to the appointment and updates the invoice.
+complete_visit() does all of it in one transaction with a fixed number of
+statements, and records how long each phase took.
+"""
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.db import transaction
+
+from backend.response_cache import bump_model_versions
+
+from .billing import recalculate_invoice_totals
+from .models import Appointment, MedicalRecord, Treatment, Diagnosis, Invoice, Service, Staff
+
+
+class VisitError(Exception):
+    """The visit cannot be completed; the message is safe to show to the user"""
+
+
+class VisitForbidden(VisitError):
+    """The user may not complete this visit"""
+
+
+class PhaseTimer:
+    """Wall-clock milliseconds spent in each named phase"""
+
+    def __init__(self):
+        self.timings = {}
+        self.started = perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def record(self, name, start):
+        self.timings[name] = round((perf_counter() - start) * 1000, 2)
+
+    def finish(self):
+        self.timings['total'] = round((perf_counter() - self.started) * 1000, 2)
+        return self.timings
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        return ', '.join(f'{name};dur={duration}' for name, duration in self.timings.items())
+
+
+def complete_visit(appointment_id, record=None, treatments=(), diagnoses=(), nurse_id=None,
+                   end_time=None, timer=None, user=None):
+    """
+    Finalize the visit of `appointment_id`; the record is written by the
+    appointment's doctor. When `user` is a doctor, it must be that doctor.
+
+    `record` holds MedicalRecord field values, `treatments` and `diagnoses`
+    are lists of field dicts whose `service` is a primary key. Returns a
+    dict with the appointment, medical record, treatments, diagnoses and
+    invoice (or None). Raises Appointment.DoesNotExist or VisitError
+    (VisitForbidden for another doctor).
+    """
+    timer = timer or PhaseTimer()
+    record = record or {}
+
+    with transaction.atomic():
+        with timer.phase('load'):
+            appointment = Appointment.objects.select_related(
+                'patient', 'staff__user'
+            ).select_for_update(of=('self',)).get(appointment_id=appointment_id)
+            if user is not None and user.role.name == 'Doctor' and appointment.staff.user_id != user.pk:
+                raise VisitForbidden("Only the appointment's doctor can complete this visit.")
+            if appointment.medical_record_id is not None:
+                raise VisitError('This visit has already been completed.')
+            if appointment.status in ('cancelled', 'no_show'):
+                raise VisitError(f'Cannot complete a visit with status "{appointment.status}".')
+
+            service_ids = {item['service'] for item in treatments if item.get('service') is not None}
+            services = Service.objects.in_bulk(service_ids) if service_ids else {}
+            missing = service_ids - set(services)
+            if missing:
+                raise VisitError(f'Unknown service: {", ".join(sorted(str(pk) for pk in missing))}.')
+
+            nurse = None
+            if nurse_id is not None:
+                nurse = Staff.objects.select_related('user').filter(staff_id=nurse_id).first()
+                if nurse is None:
+                    raise VisitError(f'Unknown nurse: {nurse_id}.')
+
+        with timer.phase('record'):
+            medical_record = MedicalRecord.objects.create(
+                patient=appointment.patient,
+                staff=appointment.staff,
+                created_by=appointment.staff,
+                appointment=appointment,
+                **record,
+            )
+
+        with timer.phase('treatments'):
+            created_treatments = Treatment.objects.bulk_create([
+                Treatment(
+                    appointment=appointment,
+                    service=services.get(item.get('service')),
+                    actual_cost=item.get('actual_cost'),
+                )
+                for item in treatments
+            ])
+
+        with timer.phase('diagnoses'):
+            created_diagnoses = Diagnosis.objects.bulk_create([
+                Diagnosis(record=medical_record, **item) for item in diagnoses
+            ])
+        bump_model_versions(Treatment, Diagnosis)
+
+        with timer.phase('appointment'):
+            appointment.status = 'completed'
+            appointment.medical_record = medical_record
+            update_fields = ['status', 'medical_record', 'updated_at']
+            if nurse_id is not None:
+                appointment.nurse = nurse
+                update_fields.append('nurse')
+            if end_time is not None:
+                appointment.end_time = end_time
+                update_fields.append('end_time')
+            appointment.save(update_fields=update_fields)
+
+        with timer.phase('invoice'):
+            # Within the transaction, so the response reports the new total
+            if created_treatments:
+                recalculate_invoice_totals([appointment.appointment_id])
+            invoice = Invoice.objects.filter(appointment=appointment).only(
+                'invoice_id', 'total_amount', 'paid_amount', 'status'
+            ).first()
+
+        commit_started = perf_counter()
+    timer.record('commit', commit_started)
+
+    return {
+        'appointment': appointment,
+        'medical_record': medical_record,
+        'treatments': created_treatments,
+        'diagnoses': created_diagnoses,
+        'invoice': invoice,
+    }
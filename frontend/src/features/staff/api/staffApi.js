@@ -137,6 +137,19 @@ export const staffApi = {
     }
   },
 
+  // Columnar calendar data for week/month views: { start, end, staff? }
+  getCalendar: async (params = {}) => {
+    const cleanParams = Object.fromEntries(Object.entries(params).filter(([, v]) => v !== null && v !== undefined && v !== ''));
+    const queryString = new URLSearchParams(cleanParams).toString();
+
+    try {
+      return await makeAuthenticatedRequest(`/appointments/calendar/?${queryString}`);
+    } catch (error) {
+      console.error('Failed to fetch calendar:', error);
+      throw error;
+    }
+  },
+
   updateAppointment: async (appointmentId, updateData) => {
     try {
       return await makeAuthenticatedRequest(`/appointments/${appointmentId}/`, {
@@ -149,6 +162,19 @@ export const staffApi = {
     }
   },
 
+  // Finalize a visit: medical record, treatments, diagnoses and invoice in one request
+  completeVisit: async (appointmentId, visitData) => {
+    try {
+      return await makeAuthenticatedRequest(`/appointments/${appointmentId}/complete/`, {
+        method: 'POST',
+        body: JSON.stringify(visitData),
+      });
+    } catch (error) {
+      console.error('Failed to complete visit:', error);
+      throw error;
+    }
+  },
+
   // Get nurses list
   getNurses: async () => {
     try {
@@ -184,6 +210,18 @@ export const staffApi = {
     }
   },
 
+  createTreatments: async (treatments) => {
+    try {
+      return await makeAuthenticatedRequest('/treatments/bulk/', {
+        method: 'POST',
+        body: JSON.stringify(treatments),
+      });
+    } catch (error) {
+      console.error('Failed to create treatments:', error);
+      throw error;
+    }
+  },
+
   // Medical record APIs
   createMedicalRecord: async (recordData) => {
     try {
@@ -222,6 +260,18 @@ export const staffApi = {
     }
   },
 
+  createDiagnoses: async (diagnoses) => {
+    try {
+      return await makeAuthenticatedRequest('/diagnoses/bulk/', {
+        method: 'POST',
+        body: JSON.stringify(diagnoses),
+      });
+    } catch (error) {
+      console.error('Failed to create diagnoses:', error);
+      throw error;
+    }
+  },
+
   // Medical record APIs
   createMedicalRecord: async (recordData) => {
     try {
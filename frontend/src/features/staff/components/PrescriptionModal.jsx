@@ -41,47 +41,23 @@ export default function PrescriptionModal({ patient, duration, onClose }) {
 
   const submit = async () => {
     try {
-      // 1. Create treatments for selected services
-      for (const serviceId of selectedServices) {
-        await staffApi.createTreatment({
-          appointment: patient.raw.appointment_id,
+      // Medical record, treatments, diagnoses, nurse and invoice total are saved together
+      await staffApi.completeVisit(patient.raw.appointment_id, {
+        record: {
+          notes: notes,
+          radiology_needed: radiologyNeeded,
+          outcome: outcome,
+        },
+        treatments: selectedServices.map((serviceId) => ({
           service: serviceId,
           actual_cost: null, // Use default price
-        });
-      }
-
-      // 1.5. Recalculate invoice total based on actual treatments
-      await staffApi.recalculateInvoiceTotal(patient.raw.appointment_id);
-
-      // 2. Create medical record
-      const medicalRecordData = {
-        patient: patient.raw.patient,
-        staff: patient.raw.staff,
-        created_by: patient.raw.staff,
-        appointment: patient.raw.appointment_id,
-        notes: notes,
-        radiology_needed: radiologyNeeded,
-        outcome: outcome,
-      };
-      
-      console.log('Creating medical record with data:', medicalRecordData);
-      
-      const medicalRecord = await staffApi.createMedicalRecord(medicalRecordData);
-
-      // 3. Update appointment to link the medical record and nurse
-      await staffApi.updateAppointment(patient.raw.appointment_id, {
-        medical_record: medicalRecord.record_id,
+        })),
+        diagnoses: medications
+          .filter(m => m.trim())
+          .map((medication) => ({ notes: medication })),
         nurse: selectedNurse || null,
       });
 
-      // 4. Create diagnoses for medications
-      for (const medication of medications.filter(m => m.trim())) {
-        await staffApi.createDiagnosis({
-          record: medicalRecord.record_id,
-          notes: medication,
-        });
-      }
-
       console.log('Prescription saved successfully');
       onClose();
     } catch (error) {